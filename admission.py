@@ -0,0 +1,254 @@
+"""Memory-aware admission control for image payloads.
+
+A request carrying an image holds several copies of it at once (the base64
+string, the decoded bytes, the upload body, the Foundry response and the
+decoded output), so a few large uploads at the same time can exhaust the
+process's memory. Every such request reserves its estimated peak footprint
+from one :class:`MemoryBudget` before it starts and returns it when done.
+
+When a reservation does not fit, the ``queue`` policy waits (first come,
+first served, up to a timeout) for running requests to release memory; the
+``reject`` policy fails the request right away. A request larger than the
+whole budget is still admitted once nothing else is in flight, so it can
+never wait forever.
+
+Reservations may be taken from event loops (``reserve``) and from worker
+threads (``reserve_blocking``) against the same budget. Work that needs more
+memory part way through a request (``extend``) waits for its reservation
+and the extra bytes together, so it never waits on its own reservation.
+"""
+
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+POLICIES = ("queue", "reject")
+
+
+class PayloadTooLarge(ValueError):
+    """An input is above the per-request size cap."""
+
+
+class AdmissionRejected(RuntimeError):
+    """A request did not fit in the memory budget (right away or within the queue timeout)."""
+
+
+class _Waiter:
+    __slots__ = ("nbytes", "granted", "wake")
+
+    def __init__(self, nbytes: int, wake: Callable[[], None]):
+        self.nbytes = nbytes
+        self.granted = False
+        self.wake = wake
+
+
+class _Held:
+    """The reservation of the request running in the current context."""
+
+    __slots__ = ("budget", "nbytes", "active")
+
+    def __init__(self, budget: "MemoryBudget", nbytes: int):
+        self.budget = budget
+        self.nbytes = nbytes
+        self.active = True
+
+
+_held: ContextVar[Optional[_Held]] = ContextVar("admission_held", default=None)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class MemoryBudget:
+    """Bytes reserved by in-flight requests against a fixed budget (0 = unlimited, only counted)."""
+
+    def __init__(self, budget: int = 0, policy: str = "queue", timeout: float = 30.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown admission policy '{policy}'. Use one of: {', '.join(POLICIES)}")
+        self.budget = budget
+        self.policy = policy
+        self.timeout = timeout
+        self.in_use = 0
+        self.peak = 0
+        self.inflight = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.too_large = 0
+        self.largest = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+
+    def _fits(self, nbytes: int) -> bool:
+        return not self.budget or self.in_use + nbytes <= self.budget or self.in_use == 0
+
+    def _take(self, nbytes: int) -> None:
+        self.in_use += nbytes
+        self.inflight += 1
+        self.admitted += 1
+        self.peak = max(self.peak, self.in_use)
+        self.largest = max(self.largest, nbytes)
+
+    def _grant_waiters(self) -> None:
+        """Admit queued requests in order while they fit. Call with the lock held."""
+        while self._waiters and self._fits(self._waiters[0].nbytes):
+            waiter = self._waiters.popleft()
+            self._take(waiter.nbytes)
+            waiter.granted = True
+            waiter.wake()
+
+    def _try_admit(self, nbytes: int, wake: Callable[[], None], queue: bool = False) -> Optional[_Waiter]:
+        """Admit now (returns None) or enqueue a waiter; raises under the reject policy unless ``queue``."""
+        with self._lock:
+            if not self._waiters and self._fits(nbytes):
+                self._take(nbytes)
+                return None
+            if self.policy == "reject" and not queue:
+                self.rejected += 1
+                raise AdmissionRejected(self._rejection(nbytes))
+            self.queued += 1
+            waiter = _Waiter(nbytes, wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Withdraw a waiter that stopped waiting; returns whether it was granted meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            # requests queued behind it may fit now
+            self._grant_waiters()
+            return False
+
+    def _rejection(self, nbytes: int) -> str:
+        return (
+            f"Server is busy: the request needs about {nbytes / 1e6:.1f} MB but {self.in_use / 1e6:.1f} MB "
+            f"of the {self.budget / 1e6:.0f} MB memory budget (IMAGE_MEMORY_BUDGET) is in use; retry later"
+        )
+
+    def release(self, nbytes: int) -> None:
+        with self._lock:
+            self.in_use -= nbytes
+            self.inflight -= 1
+            self._grant_waiters()
+
+    async def _admit(self, nbytes: int, timeout: Optional[float] = None) -> None:
+        """Take ``nbytes``, waiting up to ``timeout`` (default ``self.timeout``) for room."""
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[None]" = loop.create_future()
+        waiter = self._try_admit(nbytes, lambda: loop.call_soon_threadsafe(_resolve, future))
+        if waiter is not None:
+            limit = self.timeout if timeout is None else timeout
+            try:
+                await asyncio.wait_for(future, limit)
+            except asyncio.TimeoutError:
+                if not self._abandon(waiter):
+                    self._count_rejection()
+                    raise AdmissionRejected(self._rejection(nbytes) + f" (waited {limit:g}s)") from None
+            except BaseException:
+                if self._abandon(waiter):
+                    self.release(nbytes)
+                raise
+
+    @contextmanager
+    def _holding(self, nbytes: int) -> Iterator[_Held]:
+        """Publish an admitted reservation to :meth:`extend` and release it on exit."""
+        held = _Held(self, nbytes)
+        token = _held.set(held)
+        try:
+            yield held
+        finally:
+            _held.reset(token)
+            if held.active:
+                self.release(held.nbytes)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold ``nbytes`` of the budget, waiting up to ``timeout`` (default ``self.timeout``) for room."""
+        await self._admit(nbytes, timeout)
+        with self._holding(nbytes):
+            yield
+
+    @asynccontextmanager
+    async def extend(self, nbytes: int, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold ``nbytes`` more on top of the reservation of the current request.
+
+        The request's reservation is handed back while it waits for both
+        together, so it is admitted by the same rules as a fresh request and
+        two requests that grow at once cannot block each other. Without a
+        reservation in this context it behaves like :meth:`reserve`.
+        """
+        held = _held.get()
+        if held is None or held.budget is not self or not held.active:
+            async with self.reserve(nbytes, timeout):
+                yield
+            return
+        base = held.nbytes
+        held.active = False
+        self.release(base)
+        await self._admit(base + nbytes, timeout)
+        with self._lock:
+            # the request was counted when it was first admitted
+            self.admitted -= 1
+        held.nbytes = base + nbytes
+        held.active = True
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_use -= nbytes
+                held.nbytes = base
+                self._grant_waiters()
+
+    @contextmanager
+    def reserve_blocking(self, nbytes: int, timeout: Optional[float] = None, queue: bool = False) -> Iterator[None]:
+        """Thread variant of :meth:`reserve`; ``timeout=None`` waits as long as it takes.
+
+        With ``queue`` the caller waits for room even under the reject policy
+        (for work that was already accepted, such as a queued job).
+        """
+        event = threading.Event()
+        waiter = self._try_admit(nbytes, event.set, queue)
+        if waiter is not None and not event.wait(timeout):
+            if not self._abandon(waiter):
+                self._count_rejection()
+                raise AdmissionRejected(self._rejection(nbytes) + f" (waited {timeout:g}s)")
+        with self._holding(nbytes):
+            yield
+
+    def _count_rejection(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def check_size(self, size: int, limit: int) -> None:
+        """Raise :class:`PayloadTooLarge` if an input of ``size`` bytes is over ``limit`` (0 = no cap)."""
+        if not limit or size <= limit:
+            return
+        with self._lock:
+            self.too_large += 1
+        raise PayloadTooLarge(
+            f"Input image is {size / 1e6:.1f} MB; the limit is {limit / 1e6:.1f} MB (IMAGE_MAX_INPUT_BYTES)"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "budget_bytes": self.budget,
+                "policy": self.policy,
+                "in_use_bytes": self.in_use,
+                "peak_bytes": self.peak,
+                "inflight": self.inflight,
+                "waiting": len(self._waiters),
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "too_large": self.too_large,
+                "largest_request_bytes": self.largest,
+                "utilization": round(self.in_use / self.budget, 4) if self.budget else None,
+            }
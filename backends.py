@@ -0,0 +1,376 @@
+"""Pools of Foundry endpoints/deployments behind each logical model.
+
+``FOUNDRY_BACKENDS`` maps a logical model (``gpt``, ``flux``) to a list of
+backends, each an endpoint + deployment with optional credentials::
+
+    {"gpt": [
+        {"name": "east", "endpoint": "https://east.example.com/", "deployment": "gpt-image-1"},
+        {"name": "west", "endpoint": "https://west.example.com/", "deployment": "gpt-image-1",
+         "api_key_env": "FOUNDRY_WEST_KEY", "weight": 2}
+    ]}
+
+Missing ``endpoint``, ``api_key`` and ``api_version`` fall back to the
+single-endpoint settings. Without ``FOUNDRY_BACKENDS`` every model has one
+backend built from those settings, as before.
+
+Each request attempt is routed by a ``BackendPool``:
+
+- ``least_outstanding``: fewest requests in flight relative to ``weight``.
+- ``latency``: lowest smoothed latency times (in flight + 1), relative to
+  ``weight``; backends without samples are tried first.
+
+Health is checked passively from real traffic. ``failure_threshold``
+consecutive 5xx responses or transport errors open a backend's circuit; it
+gets no traffic for ``cooldown`` seconds, then a single probe request
+decides whether it closes again. A 429 only parks the backend for its
+``Retry-After``. If every backend is unavailable, the one that becomes
+available first is used anyway so that requests are never refused outright.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from rate_limit import Attempt, DeploymentLimiter
+
+logger = logging.getLogger("mcp.image2image.backends")
+
+ROUTING_STRATEGIES = ("least_outstanding", "latency")
+
+
+class Backend:
+    """One Foundry endpoint + deployment with its health and traffic counters."""
+
+    def __init__(
+        self,
+        name: str,
+        endpoint: str,
+        deployment: str,
+        api_key: str,
+        api_version: str,
+        weight: float = 1.0,
+    ):
+        self.name = name
+        self.endpoint = endpoint if endpoint.endswith("/") else endpoint + "/"
+        self.deployment = deployment
+        self.api_key = api_key
+        self.api_version = api_version
+        self.weight = max(weight, 1e-6)
+
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.throttled_until = 0.0
+        self.probing = False
+        self.consecutive_failures = 0
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.throttled = 0
+        self.circuit_opens = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def edit_url(self) -> str:
+        return f"{self.endpoint}openai/deployments/{self.deployment}/images/edits?api-version={self.api_version}"
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Api-Key": self.api_key or "", "x-ms-model-mesh-model-name": self.deployment}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "deployment": self.deployment,
+            "weight": self.weight,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "throttled": self.throttled,
+            "circuit_opens": self.circuit_opens,
+            "consecutive_failures": self.consecutive_failures,
+            "ewma_latency_seconds": round(self.ewma_latency, 4) if self.ewma_latency is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class BackendPool:
+    """Routes attempts for one logical model across its backends."""
+
+    def __init__(
+        self,
+        model: str,
+        backends: List[Backend],
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        ewma_alpha: float = 0.3,
+    ):
+        if not backends:
+            raise ValueError(f"No backends configured for model '{model}'")
+        if strategy not in ROUTING_STRATEGIES:
+            raise ValueError(f"Unknown routing strategy '{strategy}'. Use one of: {', '.join(ROUTING_STRATEGIES)}")
+        self.model = model
+        self.backends = backends
+        self.strategy = strategy
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+
+    def _available_at(self, backend: Backend, now: float) -> float:
+        """Monotonic time from which ``backend`` may take a request."""
+        ready = backend.throttled_until
+        if backend.state == "open":
+            ready = max(ready, backend.opened_at + self.cooldown)
+        elif backend.state == "half_open" and backend.probing:
+            ready = max(ready, now + self.cooldown)
+        return ready
+
+    def _score(self, backend: Backend) -> float:
+        if self.strategy == "latency":
+            if backend.ewma_latency is None:
+                return -1.0 / backend.weight
+            return backend.ewma_latency * (backend.outstanding + 1) / backend.weight
+        return backend.outstanding / backend.weight
+
+    def has_alternative(self, avoid: Iterable[str]) -> bool:
+        """True if a backend not in ``avoid`` can take a request right now."""
+        avoid = set(avoid)
+        now = time.monotonic()
+        with self._lock:
+            return any(b.name not in avoid and self._available_at(b, now) <= now for b in self.backends)
+
+    def acquire(self, avoid: Iterable[str] = ()) -> Backend:
+        """Pick a backend for one attempt and count it as outstanding.
+
+        Backends named in ``avoid`` (e.g. ones that just failed this request)
+        are only used when nothing else is available.
+        """
+        avoid = set(avoid)
+        now = time.monotonic()
+        with self._lock:
+            ready = [b for b in self.backends if self._available_at(b, now) <= now]
+            candidates = [b for b in ready if b.name not in avoid] or ready
+            if candidates:
+                best = min(self._score(b) for b in candidates)
+                backend = self._rng.choice([b for b in candidates if self._score(b) == best])
+            else:
+                backend = min(self.backends, key=lambda b: self._available_at(b, now))
+                logger.warning("%s: no healthy backend; using %s anyway", self.model, backend.name)
+            if backend.state == "open" and backend.opened_at + self.cooldown <= now:
+                backend.state = "half_open"
+            if backend.state == "half_open":
+                backend.probing = True
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def release(
+        self,
+        backend: Backend,
+        status: Optional[int],
+        elapsed: float,
+        retry_after: Optional[float] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record the outcome of an attempt.
+
+        ``status`` is the HTTP status, or ``None`` for a transport error.
+        5xx and transport errors count against the backend's health; 429
+        parks it for ``retry_after`` seconds; anything else is healthy.
+        """
+        now = time.monotonic()
+        with self._lock:
+            backend.outstanding -= 1
+            probe = backend.state == "half_open"
+            backend.probing = False
+            if status == 429:
+                backend.throttled += 1
+                backend.throttled_until = now + (retry_after if retry_after is not None else 1.0)
+                if probe:
+                    backend.state = "open"
+                    backend.opened_at = now
+                return
+            if status is None or status >= 500:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                backend.last_error = error or f"HTTP {status}"
+                if probe or backend.consecutive_failures >= self.failure_threshold:
+                    if backend.state != "open":
+                        backend.circuit_opens += 1
+                        logger.warning("%s: circuit opened for backend %s after %d failures (%s)", self.model, backend.name, backend.consecutive_failures, backend.last_error)
+                    backend.state = "open"
+                    backend.opened_at = now
+                return
+            backend.successes += 1
+            backend.consecutive_failures = 0
+            if backend.state != "closed":
+                logger.info("%s: backend %s is healthy again", self.model, backend.name)
+                backend.state = "closed"
+            if status < 400:
+                previous = backend.ewma_latency
+                backend.ewma_latency = elapsed if previous is None else previous + self.ewma_alpha * (elapsed - previous)
+
+    def abandon(self, backend: Backend) -> None:
+        """Forget an attempt that was cancelled before it finished."""
+        with self._lock:
+            backend.outstanding -= 1
+            backend.probing = False
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {b.name: b.stats() for b in self.backends}
+
+
+def _backend_from_config(model: str, index: int, entry: Dict[str, Any], defaults: Dict[str, Optional[str]]) -> Backend:
+    deployment = entry.get("deployment") or defaults.get("deployment")
+    endpoint = entry.get("endpoint") or defaults.get("endpoint")
+    if not deployment or not endpoint:
+        raise ValueError(f"FOUNDRY_BACKENDS entry {index} for '{model}' needs an endpoint and a deployment")
+    api_key = entry.get("api_key") or (os.getenv(entry["api_key_env"]) if entry.get("api_key_env") else None) or defaults.get("api_key")
+    return Backend(
+        name=entry.get("name") or f"{model}-{index}",
+        endpoint=endpoint,
+        deployment=deployment,
+        api_key=api_key or "",
+        api_version=entry.get("api_version") or defaults.get("api_version") or "",
+        weight=float(entry.get("weight", 1.0)),
+    )
+
+
+def load_backends(spec: Optional[str], defaults: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, List[Backend]]:
+    """Build the backend lists per model.
+
+    ``spec`` is the ``FOUNDRY_BACKENDS`` value: inline JSON or a path to a
+    JSON file. ``defaults`` holds the single-endpoint settings per model
+    (``endpoint``, ``deployment``, ``api_key``, ``api_version``); a model not
+    listed in ``spec`` gets one backend from them, named after its deployment.
+    """
+    config: Dict[str, Any] = {}
+    if spec and spec.strip():
+        text = spec.strip()
+        if not text.startswith("{"):
+            with open(os.path.expanduser(text), "r", encoding="utf-8") as fh:
+                text = fh.read()
+        config = {str(k).lower(): v for k, v in json.loads(text).items()}
+
+    result: Dict[str, List[Backend]] = {}
+    for model in set(defaults) | set(config):
+        model_defaults = defaults.get(model, {})
+        entries = config.get(model)
+        if entries:
+            result[model] = [_backend_from_config(model, i, e, model_defaults) for i, e in enumerate(entries)]
+        elif model_defaults.get("deployment"):
+            result[model] = [_backend_from_config(model, 0, {"name": model_defaults["deployment"]}, model_defaults)]
+    return result
+
+
+class _AttemptClock:
+    """Times the request itself, leaving out waits in the rate limiter."""
+
+    def __init__(self, send: Callable[[Backend], Any], backend: Backend):
+        self._send = send
+        self._backend = backend
+        self._started: Optional[float] = None
+
+    def send(self) -> Any:
+        self._started = time.monotonic()
+        return self._send(self._backend)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started if self._started is not None else 0.0
+
+
+def _finish_attempt(pool: BackendPool, backend: Backend, result: Attempt, elapsed: float) -> None:
+    status = result.response.status_code if result.response is not None else None
+    pool.release(backend, status, elapsed, result.retry_after, str(result.error) if result.error else None)
+
+
+def call_with_failover(
+    pool: BackendPool,
+    limiter_for: Callable[[Backend], DeploymentLimiter],
+    send: Callable[[Backend], Any],
+    retry_exceptions: Tuple[Type[BaseException], ...] = (),
+) -> Any:
+    """Send a request through ``pool``, retrying on another backend when one fails.
+
+    Each attempt goes through that backend's limiter. A retryable failure
+    is retried at once on another available backend; when none is left,
+    the limiter's backoff is applied first. Returns the final response.
+    """
+    attempt = 0
+    tried: List[str] = []
+    while True:
+        backend = pool.acquire(avoid=tried)
+        limiter = limiter_for(backend)
+        clock = _AttemptClock(send, backend)
+        try:
+            result = limiter.attempt(clock.send, attempt, retry_exceptions)
+        except Exception as exc:
+            pool.release(backend, None, clock.elapsed(), error=str(exc))
+            raise
+        except BaseException:
+            pool.abandon(backend)
+            raise
+        _finish_attempt(pool, backend, result, clock.elapsed())
+        if result.backoff is None:
+            return result.unwrap()
+        tried.append(backend.name)
+        backoff = 0.0 if pool.has_alternative(tried) else result.backoff
+        if limiter.gives_up(backoff):
+            return result.unwrap()
+        limiter.note_retry(result, backoff)
+        if result.response is not None:
+            result.response.close()
+        if backoff:
+            time.sleep(backoff)
+            tried.clear()
+        attempt += 1
+
+
+async def call_with_failover_async(
+    pool: BackendPool,
+    limiter_for: Callable[[Backend], DeploymentLimiter],
+    send: Callable[[Backend], Awaitable[Any]],
+    retry_exceptions: Tuple[Type[BaseException], ...] = (),
+) -> Any:
+    """Async variant of :func:`call_with_failover`."""
+    attempt = 0
+    tried: List[str] = []
+    while True:
+        backend = pool.acquire(avoid=tried)
+        limiter = limiter_for(backend)
+        clock = _AttemptClock(send, backend)
+        try:
+            result = await limiter.attempt_async(clock.send, attempt, retry_exceptions)
+        except Exception as exc:
+            pool.release(backend, None, clock.elapsed(), error=str(exc))
+            raise
+        except BaseException:
+            pool.abandon(backend)
+            raise
+        _finish_attempt(pool, backend, result, clock.elapsed())
+        if result.backoff is None:
+            return result.unwrap()
+        tried.append(backend.name)
+        backoff = 0.0 if pool.has_alternative(tried) else result.backoff
+        if limiter.gives_up(backoff):
+            return result.unwrap()
+        limiter.note_retry(result, backoff)
+        if result.response is not None:
+            await result.response.aclose()
+        if backoff:
+            await asyncio.sleep(backoff)
+            tried.clear()
+        attempt += 1
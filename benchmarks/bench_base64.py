@@ -0,0 +1,100 @@
+"""Peak RSS and throughput of the base64 image tools across file sizes.
+
+For every size, ``convert_local_image_to_base64`` and ``base64_to_image``
+are run in a fresh subprocess (so peak RSS is not polluted by earlier runs)
+next to the previous one-shot implementation, and the outputs are checked
+to be byte-identical.
+
+Usage::
+
+    python benchmarks/bench_base64.py --sizes 1 8 40
+"""
+
+import argparse
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _one_shot_encode(path: Path) -> str:
+    data = path.read_bytes()
+    return f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def _one_shot_decode(b64_string: str, out: Path) -> None:
+    b64_string = b64_string[b64_string.find(",") + 1 :]
+    out.write_bytes(base64.b64decode(b64_string))
+
+
+def _child(op: str, impl: str, src: str, dest: str) -> None:
+    """Run one operation and print its timing and peak RSS as JSON."""
+    sys.path.insert(0, str(ROOT))
+    import mcp_server_image_tools as tools
+
+    src_path = Path(src)
+    payload = src_path.read_text() if op == "decode" else None
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if op == "encode":
+        result = tools.convert_local_image_to_base64(src) if impl == "streaming" else _one_shot_encode(src_path)
+        Path(dest).write_text(result)
+        nbytes = src_path.stat().st_size
+    else:
+        if impl == "streaming":
+            tools.base64_to_image(payload, dest)
+        else:
+            _one_shot_decode(payload, Path(dest))
+        nbytes = Path(dest).stat().st_size
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(json.dumps({"seconds": elapsed, "mb_per_sec": nbytes / elapsed / 1e6, "peak_rss_delta_mb": (peak - baseline) * scale / 1e6}))
+
+
+def _run(op: str, impl: str, src: Path, dest: Path) -> dict:
+    env = dict(os.environ, MCP_SERVER_LOGLEVEL="WARNING")
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", op, impl, str(src), str(dest)],
+        check=True, capture_output=True, text=True, env=env,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 40], help="File sizes in MB")
+    parser.add_argument("--child", nargs=4, metavar=("OP", "IMPL", "SRC", "DEST"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*args.child)
+        return
+
+    print(f"{'size_mb':>7} {'op':<7} {'impl':<10} {'MB/s':>8} {'peak_rss_delta_mb':>18}")
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        for size in args.sizes:
+            src = tmp_dir / f"input_{size}.png"
+            src.write_bytes(os.urandom(size * 1024 * 1024))
+            outputs = {}
+            for op in ("encode", "decode"):
+                for impl in ("one-shot", "streaming"):
+                    source = src if op == "encode" else tmp_dir / f"encode_{size}_{impl}.txt"
+                    dest = tmp_dir / f"{op}_{size}_{impl}.{'txt' if op == 'encode' else 'bin'}"
+                    row = _run(op, impl, source, dest)
+                    outputs[(op, impl)] = dest.read_bytes()
+                    print(f"{size:>7} {op:<7} {impl:<10} {row['mb_per_sec']:>8.1f} {row['peak_rss_delta_mb']:>18.1f}")
+                if outputs[(op, "one-shot")] != outputs[(op, "streaming")]:
+                    raise SystemExit(f"{op} output differs for {size} MB input")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Throughput of one server process shared by many clients over streamable HTTP.
+
+A mock Foundry endpoint (``mock_foundry.py``) runs in this process. The
+server under test is started once with ``--transport streamable-http``.
+For every client count in ``--clients``, that many MCP client sessions
+connect to it. Each session keeps ``--per-client`` tool calls in flight
+for ``--duration`` seconds. The script reports completed calls per
+second, latency percentiles, errors and rejections by the per-client
+limit, and the server's transport counters.
+
+Servers:
+
+- ``image2image``: ``image2image`` on ``mcp_server_image2image.py``
+- ``async``: ``image2image_sync`` on ``labs/mcp_server_async.py``
+- ``image_tools``: ``convert_local_image_to_base64`` on ``mcp_server_image_tools.py``
+
+Every call uses a distinct prompt and the result cache is disabled, so
+each image2image call reaches the mock. While the server is not saturated,
+throughput should grow about linearly with the number of clients.
+
+Usage::
+
+    python benchmarks/bench_http.py --clients 1 2 4 8 16 32 --duration 10 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_foundry import add_mock_arguments, make_image, mock_options, start_mock_foundry  # noqa: E402
+
+SERVERS = ("image2image", "async", "image_tools")
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _command(server: str, port: int) -> List[str]:
+    transport = ["--transport", "streamable-http", "--port", str(port)]
+    if server == "image2image":
+        return [sys.executable, str(ROOT / "mcp_server_image2image.py")] + transport
+    if server == "image_tools":
+        return [sys.executable, str(ROOT / "mcp_server_image_tools.py"), "serve"] + transport
+    # labs/ imports the main server module under the name ``mcp_server``
+    launcher = (
+        "import runpy, sys; import mcp_server_image2image as m; sys.modules.setdefault('mcp_server', m); "
+        f"sys.argv = [{str(ROOT / 'labs' / 'mcp_server_async.py')!r}] + {transport!r}; "
+        f"runpy.run_path(sys.argv[0], run_name='__main__')"
+    )
+    return [sys.executable, "-c", launcher]
+
+
+def _tool_call(server: str, image: Path, index: int) -> Tuple[str, Dict[str, Any]]:
+    if server == "image_tools":
+        return "convert_local_image_to_base64", {"image_path": str(image)}
+    name = "image2image" if server == "image2image" else "image2image_sync"
+    return name, {"image_path": str(image), "prompt": f"benchmark request {index}"}
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with code {process.returncode}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise TimeoutError(f"server did not start listening on {url}")
+
+
+async def _load(url: str, server: str, image: Path, clients: int, per_client: int, duration: float) -> Dict[str, Any]:
+    """Run ``clients`` sessions with ``per_client`` calls in flight each for ``duration`` seconds."""
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    counter = iter(range(10**9))
+    ready = asyncio.Event()
+    connected = 0
+    started = 0.0
+
+    async def session() -> None:
+        nonlocal connected, started
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as client:
+                await client.initialize()
+                connected += 1
+                if connected == clients:
+                    started = time.perf_counter()
+                    ready.set()
+                await ready.wait()
+                deadline = started + duration
+
+                async def caller() -> None:
+                    while time.perf_counter() < deadline:
+                        name, args = _tool_call(server, image, next(counter))
+                        t0 = time.perf_counter()
+                        result = await client.call_tool(name, args)
+                        if result.isError:
+                            errors.append(result.content[0].text if result.content else "error")
+                        else:
+                            latencies.append(time.perf_counter() - t0)
+
+                await asyncio.gather(*(caller() for _ in range(per_client)))
+
+    await asyncio.gather(*(session() for _ in range(clients)))
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    rejected = sum(1 for e in errors if "MCP_CLIENT_MAX_INFLIGHT" in e)
+    return {
+        "clients": clients,
+        "ok": len(latencies),
+        "errors": len(errors) - rejected,
+        "rejected": rejected,
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p95_ms": _percentile(ordered, 0.95) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+    }
+
+
+async def _server_stats(url: str) -> Dict[str, Any]:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as client:
+            await client.initialize()
+            result = await client.call_tool("server_stats", {})
+    payload = result.structuredContent or json.loads(result.content[0].text)
+    return payload.get("result", payload).get("transport", {})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", default="image2image", choices=SERVERS)
+    parser.add_argument("--clients", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32], help="Client counts to run")
+    parser.add_argument("--per-client", type=int, default=1, help="Calls each client keeps in flight")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per client count")
+    parser.add_argument("--input-size", type=int, default=512, help="Edge length in pixels of the input image")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = start_mock_foundry(**mock_options(args))
+    peak = max(args.clients) * args.per_client
+    env = dict(
+        os.environ,
+        MCP_SERVER_LOGLEVEL="WARNING",
+        PYTHONPATH=os.pathsep.join([str(ROOT), str(ROOT / "labs")]),
+        FOUNDRY_ENDPOINT=mock.url,
+        FOUNDRY_API_KEY="benchmark",
+        FOUNDRY_API_VERSION="2025-04-01-preview",
+        GPT_DEPLOYMENT_NAME="gpt-image-1",
+        FLUX_DEPLOYMENT_NAME="flux",
+        IMAGE_CACHE_ENABLED="0",
+    )
+    # size the upstream pool and the labs workers for the largest run unless configured explicitly
+    env.setdefault("FOUNDRY_POOL_SIZE", str(max(10, peak)))
+    env.setdefault("IMAGE_JOB_WORKERS", str(max(4, peak)))
+    env.setdefault("MCP_MAX_INFLIGHT", str(max(64, peak)))
+
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/mcp"
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(tmp) / "input.png"
+        image.write_bytes(make_image(args.input_size, "png"))
+        with open(Path(tmp) / "server.log", "w") as log:
+            process = subprocess.Popen(_command(args.server, port), env=env, cwd=tmp, stdout=log, stderr=subprocess.STDOUT)
+        try:
+            asyncio.run(_wait_ready(url, process))
+            if not args.json:
+                print(f"server: {args.server} at {url}; mock: {mock.url} latency={args.latency}; "
+                      f"{args.per_client} call(s) in flight per client for {args.duration:g}s")
+                print(f"{'clients':>7} {'ok':>6} {'err':>4} {'rej':>4} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+            for clients in args.clients:
+                row = asyncio.run(_load(url, args.server, image, clients, args.per_client, args.duration))
+                if args.json:
+                    print(json.dumps(row))
+                    continue
+                print(f"{clients:>7} {row['ok']:>6} {row['errors']:>4} {row['rejected']:>4} {row['throughput']:>8.1f} "
+                      f"{row['p50_ms']:>8.0f} {row['p95_ms']:>8.0f} {row['p99_ms']:>8.0f}")
+                if row["first_error"]:
+                    print(f"  first error: {row['first_error'][:200]}")
+            if args.server != "image_tools":
+                stats = asyncio.run(_server_stats(url))
+                print(json.dumps({"transport": stats}) if args.json else f"server transport counters: {stats}")
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+            mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""End-to-end throughput and latency of the image2image MCP tools.
+
+A mock Foundry endpoint (``mock_foundry.py``) runs in this process. Each mode
+is driven through an in-memory MCP client session in a fresh subprocess, so
+CPU time and peak RSS belong to that mode only:
+
+- ``image2image``: the main server's tool
+- ``image2image_sync``: the labs server's blocking tool
+- ``image2image_async``: labs ``image2image_async`` + ``image2image_status`` polling
+- ``image2image_wait``: labs ``image2image_async`` + ``image2image_wait``
+
+Every request uses a distinct prompt and the result cache is disabled
+(unless ``--cache``), so each one reaches the mock.
+
+Usage::
+
+    python benchmarks/bench_image2image.py --requests 200 --concurrency 16 \\
+        --latency lognormal:0.2,0.5 --throttle-rate 0.02
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_foundry import add_mock_arguments, make_image, mock_options, start_mock_foundry  # noqa: E402
+
+MODES = ("image2image", "image2image_sync", "image2image_async", "image2image_wait")
+
+
+def _payload(result: Any) -> Any:
+    """Return a tool result as plain data."""
+    structured = getattr(result, "structuredContent", None)
+    if structured is not None:
+        return structured.get("result", structured)
+    text = result.content[0].text if result.content else "null"
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+async def _drive(mode: str, requests: int, concurrency: int, image_args: Dict[str, str], poll_interval: float) -> Dict[str, Any]:
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    if mode == "image2image":
+        import mcp_server_image2image as server
+    else:
+        import mcp_server_async as server
+
+    latencies: List[float] = []
+    errors: List[str] = []
+    pending = iter(range(requests))
+
+    async with create_connected_server_and_client_session(server.mcp._mcp_server) as client:
+
+        async def one(index: int) -> None:
+            args = dict(image_args, prompt=f"benchmark request {index}")
+            start = time.perf_counter()
+            if mode in ("image2image_async", "image2image_wait"):
+                submitted = await client.call_tool("image2image_async", args)
+                if submitted.isError:
+                    errors.append(str(_payload(submitted)))
+                    return
+                job_id = _payload(submitted)["job_id"]
+                while True:
+                    if mode == "image2image_wait":
+                        status = _payload(await client.call_tool("image2image_wait", {"job_id": job_id, "timeout": 60}))
+                    else:
+                        await asyncio.sleep(poll_interval)
+                        status = _payload(await client.call_tool("image2image_status", {"job_id": job_id}))
+                    if status["status"] != "working":
+                        break
+                if status["status"] != "completed":
+                    errors.append(str(status.get("error")))
+                    return
+            else:
+                result = await client.call_tool(mode, args)
+                if result.isError:
+                    errors.append(str(_payload(result)))
+                    return
+            latencies.append(time.perf_counter() - start)
+
+        async def worker() -> None:
+            for index in pending:
+                await one(index)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    ordered = sorted(latencies)
+    return {
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p95_ms": _percentile(ordered, 0.95) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+        "max_ms": (ordered[-1] if ordered else float("nan")) * 1000,
+    }
+
+
+def _child(mode: str, requests: int, concurrency: int, image: str, use_base64: bool, poll_interval: float) -> None:
+    """Run one mode and print its results as JSON."""
+    sys.path[:0] = [str(ROOT), str(ROOT / "labs")]
+    import mcp_server_image2image
+
+    # labs/ imports the main server module under the name ``mcp_server``
+    sys.modules.setdefault("mcp_server", mcp_server_image2image)
+
+    if use_base64:
+        image_args = {"image_base64": base64.b64encode(Path(image).read_bytes()).decode("ascii")}
+    else:
+        image_args = {"image_path": image}
+
+    def cpu() -> float:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+    cpu_start = cpu()
+    row = asyncio.run(_drive(mode, requests, concurrency, image_args, poll_interval))
+    row["cpu_seconds"] = cpu() - cpu_start
+    row["cpu_percent"] = 100 * row["cpu_seconds"] / row["wall_seconds"] if row["wall_seconds"] else 0.0
+    row["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+    row["import_rss_mb"] = baseline_rss
+    print(json.dumps(row))
+
+
+def _run(mode: str, args: argparse.Namespace, endpoint: str, image: Path, work_dir: Path) -> Dict[str, Any]:
+    env = dict(
+        os.environ,
+        MCP_SERVER_LOGLEVEL="WARNING",
+        FOUNDRY_ENDPOINT=endpoint,
+        FOUNDRY_API_KEY="benchmark",
+        FOUNDRY_API_VERSION="2025-04-01-preview",
+        GPT_DEPLOYMENT_NAME="gpt-image-1",
+        FLUX_DEPLOYMENT_NAME="flux",
+        IMAGE_CACHE_ENABLED="1" if args.cache else "0",
+    )
+    # give the labs worker pool room for the whole run unless configured explicitly
+    env.setdefault("IMAGE_JOB_WORKERS", str(args.concurrency))
+    env.setdefault("IMAGE_JOB_QUEUE_SIZE", str(max(100, args.requests)))
+    env.setdefault("FOUNDRY_POOL_SIZE", str(max(10, args.concurrency)))
+    out = subprocess.run(
+        [
+            sys.executable, __file__, "--child", mode,
+            "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+            "--poll-interval", str(args.poll_interval), "--image", str(image),
+        ] + (["--base64"] if args.base64 else []),
+        check=True, capture_output=True, text=True, env=env, cwd=work_dir,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at once")
+    parser.add_argument("--input-size", type=int, default=512, help="Edge length in pixels of the input image")
+    parser.add_argument("--base64", action="store_true", help="Send the input as image_base64 instead of image_path")
+    parser.add_argument("--cache", action="store_true", help="Leave the result cache enabled")
+    parser.add_argument("--poll-interval", type=float, default=0.05, help="image2image_status polling interval (async mode)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    parser.add_argument("--child", metavar="MODE", help=argparse.SUPPRESS)
+    parser.add_argument("--image", help=argparse.SUPPRESS)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    if args.child:
+        _child(args.child, args.requests, args.concurrency, args.image, args.base64, args.poll_interval)
+        return
+
+    mock = start_mock_foundry(**mock_options(args))
+    if not args.json:
+        print(f"mock: {mock.url} latency={args.latency} errors={args.error_rate} 429s={args.throttle_rate} "
+              f"response={len(mock.body) / 1e6:.2f} MB; {args.requests} requests at concurrency {args.concurrency}")
+        print(f"{'mode':<18} {'ok':>5} {'err':>4} {'req/s':>7} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'max_ms':>8} "
+              f"{'cpu_s':>6} {'cpu%':>5} {'rss_mb':>7} {'upstream':>8} {'429s':>5}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_dir = Path(tmp)
+            image = tmp_dir / "input.png"
+            image.write_bytes(make_image(args.input_size))
+            for mode in args.modes:
+                work_dir = tmp_dir / mode
+                work_dir.mkdir()
+                before = mock.stats()
+                row = _run(mode, args, mock.url, image, work_dir)
+                after = mock.stats()
+                row.update(mode=mode, upstream_requests=after["requests"] - before["requests"], upstream_throttled=after["throttled"] - before["throttled"])
+                if args.json:
+                    print(json.dumps(row))
+                    continue
+                print(f"{mode:<18} {row['ok']:>5} {row['errors']:>4} {row['throughput']:>7.1f} {row['p50_ms']:>8.1f} "
+                      f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} {row['cpu_seconds']:>6.2f} "
+                      f"{row['cpu_percent']:>5.0f} {row['peak_rss_mb']:>7.1f} {row['upstream_requests']:>8} {row['upstream_throttled']:>5}")
+                if row["first_error"]:
+                    print(f"  first error: {row['first_error'][:200]}")
+    finally:
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
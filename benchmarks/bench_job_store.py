@@ -0,0 +1,102 @@
+"""Compare submit/poll throughput of the file and SQLite job stores.
+
+Each store is exercised in a fresh temporary directory:
+
+- submit: save ``--jobs`` new queued jobs
+- poll: ``--threads`` threads load random jobs ``--polls`` times per job
+- transition: move every job queued -> running -> completed
+- list: filter by status and model
+
+Usage::
+
+    python benchmarks/bench_job_store.py --jobs 2000 --polls 5 --threads 4
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "labs"))
+
+from job_store import FileJobStore, SqliteJobStore  # noqa: E402
+
+
+def _make_job(payload: str) -> dict:
+    now = datetime.utcnow().isoformat()
+    return {
+        "job_id": str(uuid.uuid4()),
+        "created_at": now,
+        "updated_at": now,
+        "status": "queued",
+        "model": random.choice(("gpt", "flux")),
+        "prompt": "update this image to be set in a pirate era",
+        "image_base64": payload or None,
+        "image_path": None if payload else "02-bruno.jpg",
+        "result_paths": [],
+        "error": None,
+    }
+
+
+def _timed(label: str, ops: int, fn) -> dict:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"phase": label, "ops": ops, "seconds": elapsed, "ops_per_sec": ops / elapsed if elapsed else float("inf")}
+
+
+def run(store, args) -> list:
+    payload = "A" * (args.payload_kb * 1024)
+    jobs = [_make_job(payload) for _ in range(args.jobs)]
+    ids = [job["job_id"] for job in jobs]
+    results = []
+
+    results.append(_timed("submit", len(jobs), lambda: [store.save(job) for job in jobs]))
+
+    polls = len(ids) * args.polls
+
+    def _poll_chunk(count: int) -> None:
+        for _ in range(count):
+            store.load(random.choice(ids))
+
+    def _poll() -> None:
+        per_thread = polls // args.threads
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(_poll_chunk, [per_thread] * args.threads))
+
+    results.append(_timed("poll", polls, _poll))
+
+    def _transition() -> None:
+        for job_id in ids:
+            store.transition(job_id, "running", expected=("queued",))
+            store.transition(job_id, "completed", expected=("running",), result_paths=["generated/x.png"])
+
+    results.append(_timed("transition", len(ids) * 2, _transition))
+    results.append(_timed("list", 20, lambda: [store.list_jobs(status="completed", model="gpt", limit=50) for _ in range(20)]))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--polls", type=int, default=5, help="Polls per job")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent pollers")
+    parser.add_argument("--payload-kb", type=int, default=0, help="Size of an inline image_base64 field per job")
+    args = parser.parse_args()
+
+    print(f"{'store':<8} {'phase':<11} {'ops':>8} {'seconds':>9} {'ops/s':>11}")
+    for name in ("file", "sqlite"):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = FileJobStore(Path(tmp)) if name == "file" else SqliteJobStore(Path(tmp) / "jobs.sqlite3")
+            for row in run(store, args):
+                print(f"{name:<8} {row['phase']:<11} {row['ops']:>8} {row['seconds']:>9.3f} {row['ops_per_sec']:>11.0f}")
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""Offline pipeline benchmark that replays recorded Foundry responses.
+
+First record a cassette against the mock Foundry endpoint (or a real one,
+with ``--endpoint`` and the usual ``FOUNDRY_*`` variables)::
+
+    python benchmarks/bench_replay.py --record --cassette bench.cassette --requests 50
+
+Then replay it without any network access, as often as needed::
+
+    python benchmarks/bench_replay.py --cassette bench.cassette --requests 50 --repeat 5 --max-p95-ms 80
+
+Every call goes through ``call_foundry_edit_async`` with the result cache
+disabled, so reading the input, optional preprocessing, parsing, decoding
+and writing the outputs all run for real; only the upload is answered
+from the cassette. The input image is generated from ``--seed``, so a
+replay sends the same bytes as the recording. Replays answer at once
+unless ``--latency-scale`` is set, so the per-call time is the server's
+own overhead. With ``--max-p95-ms`` the script exits non-zero
+when the p95 call time is above it, for use as a CI regression gate.
+Record and replay with the same ``--input-size``, ``--preprocess`` and
+Pillow version, because preprocessing changes the uploaded bytes.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# phases reported in the table, in pipeline order
+PHASES = ("read_input", "preprocess", "foundry_request", "parse_response", "decode_output", "write_output", "edit_total")
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return float("nan")
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def _input_image(size: int, seed: int) -> bytes:
+    """A ``size`` x ``size`` noise PNG that is the same for the same seed."""
+    from PIL import Image
+
+    image = Image.frombytes("RGB", (size, size), random.Random(seed).randbytes(size * size * 3))
+    buf = BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+async def _drive(server: Any, image: bytes, requests: int, repeat: int, concurrency: int, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: List[str] = []
+    pending = iter(range(requests * repeat))
+
+    async def worker() -> None:
+        for index in pending:
+            start = time.perf_counter()
+            try:
+                await server.call_foundry_edit_async(
+                    image,
+                    f"replay request {index % requests}",
+                    model="gpt",
+                    preprocess=args.preprocess,
+                    output_format=args.output_format,
+                    output_quality=args.output_quality,
+                )
+            except Exception as exc:
+                errors.append(f"{type(exc).__name__}: {exc}")
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "ok": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": wall,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50_ms": _percentile(ordered, 0.50) * 1000,
+        "p95_ms": _percentile(ordered, 0.95) * 1000,
+        "p99_ms": _percentile(ordered, 0.99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cassette", default="bench.cassette", help="Cassette file to record to or replay from")
+    parser.add_argument("--record", action="store_true", help="Record the cassette instead of replaying it")
+    parser.add_argument("--endpoint", help="Record against this Foundry endpoint instead of the mock")
+    parser.add_argument("--requests", type=int, default=50, help="Distinct requests (prompts)")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each request is replayed")
+    parser.add_argument("--concurrency", type=int, default=1, help="Calls in flight at once")
+    parser.add_argument("--input-size", type=int, default=512, help="Edge length in pixels of the input image")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated input image")
+    parser.add_argument("--preprocess", action="store_true", help="Preprocess inputs before upload")
+    parser.add_argument("--output-format", default="png", choices=("png", "jpeg", "webp"))
+    parser.add_argument("--output-quality", type=int, default=None)
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="Share of the recorded Foundry latency to reproduce")
+    parser.add_argument("--mock-latency", default="0.2", help="Latency of the mock while recording")
+    parser.add_argument("--mock-image-size", type=int, default=1024, help="Edge length of the mock's returned image")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Exit non-zero when the p95 call time is above this")
+    parser.add_argument("--json", action="store_true", help="Print the result as one JSON line")
+    args = parser.parse_args()
+
+    cassette = Path(args.cassette).resolve()
+    mock = None
+    if args.record:
+        if not args.endpoint:
+            from mock_foundry import start_mock_foundry
+
+            mock = start_mock_foundry(latency=args.mock_latency, image_size=args.mock_image_size)
+        cassette.unlink(missing_ok=True)
+    repeat = 1 if args.record else args.repeat
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            MCP_SERVER_LOGLEVEL=os.environ.get("MCP_SERVER_LOGLEVEL", "WARNING"),
+            IMAGE_CACHE_ENABLED="0",
+            IMAGE_OUTPUT_DIR=str(Path(tmp) / "generated"),
+            FOUNDRY_CASSETTE_MODE="record" if args.record else "replay",
+            FOUNDRY_CASSETTE_PATH=str(cassette),
+            FOUNDRY_CASSETTE_LATENCY=str(args.latency_scale),
+        )
+        if mock is not None or args.endpoint:
+            os.environ["FOUNDRY_ENDPOINT"] = mock.url if mock is not None else args.endpoint
+        # replays never connect, but the backend pool still needs an endpoint and deployment names
+        for name, placeholder in (
+            ("FOUNDRY_ENDPOINT", "http://replay.invalid/"),
+            ("FOUNDRY_API_KEY", "replay"),
+            ("FOUNDRY_API_VERSION", "2025-04-01-preview"),
+            ("GPT_DEPLOYMENT_NAME", "gpt-image-1"),
+            ("FLUX_DEPLOYMENT_NAME", "flux"),
+        ):
+            os.environ.setdefault(name, placeholder)
+        sys.path.insert(0, str(ROOT))
+        import mcp_server_image2image as server
+
+        image = _input_image(args.input_size, args.seed)
+        try:
+            row = asyncio.run(_drive(server, image, args.requests, repeat, args.concurrency, args))
+        finally:
+            if mock is not None:
+                mock.shutdown()
+        stats = server.collect_server_stats()
+
+    phases: Dict[str, Optional[float]] = {}
+    for phase in PHASES:
+        summary = stats["latency_seconds"].get(phase, {}).get("gpt")
+        phases[phase] = summary["p50"] * 1000 if summary else None
+    row.update(mode="record" if args.record else "replay", phases_p50_ms=phases, cassette=stats["cassette"])
+    failed = bool(row["errors"]) or (args.max_p95_ms is not None and not args.record and row["p95_ms"] > args.max_p95_ms)
+
+    if args.json:
+        print(json.dumps(row))
+    else:
+        print(f"{row['mode']}: {row['ok']} ok, {row['errors']} errors, {row['throughput']:.1f} calls/s, "
+              f"p50 {row['p50_ms']:.1f} ms, p95 {row['p95_ms']:.1f} ms, p99 {row['p99_ms']:.1f} ms")
+        print("phase p50 (ms): " + ", ".join(f"{p}={v:.2f}" for p, v in phases.items() if v is not None))
+        print(f"cassette: {row['cassette']}")
+        if row["first_error"]:
+            print(f"first error: {row['first_error'][:200]}")
+        if failed and not row["errors"]:
+            print(f"p95 {row['p95_ms']:.1f} ms is above --max-p95-ms {args.max_p95_ms:g}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Startup cost of the MCP server entry points.
+
+For each server the script spawns a fresh process over stdio, the way MCP
+clients do, and measures the time until ``initialize`` and the first
+``tools/list`` are answered (median over ``--runs``). It then imports the
+module under ``python -X importtime`` and lists the most expensive imports.
+
+Servers:
+
+- ``image2image``: ``mcp_server_image2image.py``
+- ``image_tools``: ``mcp_server_image_tools`` (its ``mcp`` instance over stdio)
+- ``async``: ``labs/mcp_server_async.py``
+
+With ``--budget-ms`` the script exits non-zero when any server's median
+time-to-``tools/list`` exceeds the budget, so it can guard against startup
+regressions in CI.
+
+Usage::
+
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVERS = ("image2image", "image_tools", "async")
+
+# labs/ imports the main server module under the name ``mcp_server``
+_ASYNC_LAUNCHER = (
+    "import runpy, sys; sys.path[:0] = [{root!r}, {labs!r}]; import mcp_server_image2image as m; "
+    "sys.modules.setdefault('mcp_server', m); runpy.run_path({script!r}, run_name='__main__')"
+)
+_IMPORTS = {
+    "image2image": "import mcp_server_image2image",
+    "image_tools": "import mcp_server_image_tools",
+    "async": "import mcp_server_image2image as m, sys; sys.modules.setdefault('mcp_server', m); import mcp_server_async",
+}
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _command(server: str) -> List[str]:
+    if server == "image2image":
+        return [sys.executable, str(ROOT / "mcp_server_image2image.py")]
+    if server == "image_tools":
+        return [sys.executable, "-c", f"import sys; sys.path.insert(0, {str(ROOT)!r}); import mcp_server_image_tools as t; t.mcp.run()"]
+    launcher = _ASYNC_LAUNCHER.format(root=str(ROOT), labs=str(ROOT / "labs"), script=str(ROOT / "labs" / "mcp_server_async.py"))
+    return [sys.executable, "-c", launcher]
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ, MCP_SERVER_LOGLEVEL="WARNING", PYTHONPATH=os.pathsep.join([str(ROOT), str(ROOT / "labs")]))
+    for name, value in (
+        ("FOUNDRY_ENDPOINT", "http://127.0.0.1:9/"),
+        ("FOUNDRY_API_KEY", "benchmark"),
+        ("FOUNDRY_API_VERSION", "2025-04-01-preview"),
+        ("GPT_DEPLOYMENT_NAME", "gpt-image-1"),
+        ("FLUX_DEPLOYMENT_NAME", "flux"),
+    ):
+        env.setdefault(name, value)
+    return env
+
+
+async def _time_to_tools(server: str, work_dir: Path) -> Tuple[float, float, int]:
+    """Spawn one server; return seconds to ``initialize``, to ``tools/list`` and the tool count."""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    command = _command(server)
+    params = StdioServerParameters(command=command[0], args=command[1:], env=_env(), cwd=str(work_dir))
+    started = time.perf_counter()
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                initialized = time.perf_counter() - started
+                tools = await session.list_tools()
+                listed = time.perf_counter() - started
+    return initialized, listed, len(tools.tools)
+
+
+def _import_costs(server: str, top: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import time of a server module and its most expensive top-level imports (ms)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _IMPORTS[server]],
+        capture_output=True, text=True, env=_env(), cwd=ROOT, check=True,
+    )
+    total = 0.0
+    direct: List[Tuple[str, float]] = []
+    for line in out.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        # one space after the bar, then two per nesting level
+        cumulative, depth, name = int(match.group(2)) / 1000, (len(match.group(3)) - 1) // 2, match.group(4)
+        if depth == 0 and name.startswith("mcp_server"):
+            total += cumulative
+        elif depth == 1:
+            # imports made directly by the server module(s)
+            direct.append((name, cumulative))
+    direct.sort(key=lambda item: item[1], reverse=True)
+    return total, direct[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", nargs="+", default=list(SERVERS), choices=SERVERS)
+    parser.add_argument("--runs", type=int, default=5, help="Spawns per server")
+    parser.add_argument("--top", type=int, default=8, help="Imports listed per server")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if a median time-to-tools/list exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args()
+
+    over_budget = []
+    if not args.json:
+        print(f"{'server':<12} {'init_ms':>8} {'tools_ms':>9} {'min_ms':>7} {'tools':>5} {'import_ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for server in SERVERS:
+            if server not in args.servers:
+                continue
+            work_dir = Path(tmp) / server
+            work_dir.mkdir()
+            runs = [asyncio.run(_time_to_tools(server, work_dir)) for _ in range(args.runs)]
+            import_ms, imports = _import_costs(server, args.top)
+            row: Dict[str, Any] = {
+                "server": server,
+                "initialize_ms": statistics.median(r[0] for r in runs) * 1000,
+                "tools_list_ms": statistics.median(r[1] for r in runs) * 1000,
+                "tools_list_min_ms": min(r[1] for r in runs) * 1000,
+                "tools": runs[-1][2],
+                "import_ms": import_ms,
+                "top_imports_ms": dict(imports),
+            }
+            if args.budget_ms is not None and row["tools_list_ms"] > args.budget_ms:
+                over_budget.append(server)
+            if args.json:
+                print(json.dumps(row))
+                continue
+            print(f"{server:<12} {row['initialize_ms']:>8.0f} {row['tools_list_ms']:>9.0f} {row['tools_list_min_ms']:>7.0f} "
+                  f"{row['tools']:>5} {import_ms:>9.0f}")
+            print("  " + ", ".join(f"{name} {ms:.0f}" for name, ms in imports))
+    if over_budget:
+        print(f"over the {args.budget_ms:g} ms startup budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""Local stand-in for the Azure Foundry ``images/edits`` endpoint.
+
+Serves ``POST /openai/deployments/{deployment}/images/edits`` with a
+configurable latency distribution, error rate, 429 injection and response
+image size, so ``call_foundry_edit`` and the MCP tools can be exercised
+without a live endpoint. ``GET /stats`` returns request counters.
+
+Latency specs (seconds):
+
+- ``0.2``                  fixed delay
+- ``uniform:0.1,0.5``      uniform between the bounds
+- ``normal:0.3,0.05``      mean, standard deviation (clamped at 0)
+- ``lognormal:0.3,0.5``    median, sigma (long right tail, like real services)
+
+Usage::
+
+    python benchmarks/mock_foundry.py --port 8765 --latency lognormal:0.3,0.5 \\
+        --error-rate 0.01 --throttle-rate 0.05 --image-size 1024
+
+then point the server at it with ``FOUNDRY_ENDPOINT=http://127.0.0.1:8765/``.
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+EDIT_PATH = re.compile(r"^/openai/deployments/(?P<deployment>[^/]+)/images/edits$")
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Build a delay sampler from a latency spec (see module docstring)."""
+    kind, _, args = spec.partition(":")
+    if not args:
+        value = float(kind)
+        return lambda rng: value
+    params = [float(p) for p in args.split(",")]
+    if kind == "uniform":
+        low, high = params
+        return lambda rng: rng.uniform(low, high)
+    if kind == "normal":
+        mean, sd = params
+        return lambda rng: max(0.0, rng.gauss(mean, sd))
+    if kind == "lognormal":
+        median, sigma = params
+        return lambda rng: median * rng.lognormvariate(0.0, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def make_image(size: int, fmt: str = "png") -> bytes:
+    """A ``size`` x ``size`` noise image; noise keeps the encoded size realistic."""
+    image = Image.frombytes("RGB", (size, size), os.urandom(size * size * 3))
+    buf = BytesIO()
+    image.save(buf, format="JPEG" if fmt == "jpeg" else fmt.upper())
+    return buf.getvalue()
+
+
+class MockFoundry(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock's behaviour and counters."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        latency: str = "0.1",
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: float = 1.0,
+        image_size: int = 256,
+        images: int = 1,
+        image_format: str = "png",
+        seed: Optional[int] = None,
+    ):
+        super().__init__(address, _Handler)
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        payload = base64.b64encode(make_image(image_size, image_format)).decode("ascii")
+        self.body = json.dumps({"created": int(time.time()), "data": [{"b64_json": payload}] * images}).encode("utf-8")
+        self.counters_lock = threading.Lock()
+        self.counters = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "bytes_received": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def draw(self) -> Tuple[float, float]:
+        """Return (latency, outcome roll) for one request."""
+        with self.rng_lock:
+            return self.sample_latency(self.rng), self.rng.random()
+
+    def count(self, **deltas: int) -> None:
+        with self.counters_lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+            self.counters["max_in_flight"] = max(self.counters["max_in_flight"], self.counters["in_flight"])
+
+    def stats(self) -> Dict[str, Any]:
+        with self.counters_lock:
+            return dict(self.counters)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockFoundry
+
+    def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send(status, json.dumps({"error": {"code": str(status), "message": message}}).encode("utf-8"), headers)
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self._send(200, json.dumps(self.server.stats()).encode("utf-8"))
+        else:
+            self._error(404, "Not found")
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        remaining = length
+        while remaining:
+            chunk = self.rfile.read(min(remaining, 1 << 16))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+        if not EDIT_PATH.match(self.path.split("?", 1)[0]):
+            self._error(404, f"Unknown path {self.path}")
+            return
+
+        server = self.server
+        delay, roll = server.draw()
+        server.count(requests=1, bytes_received=length, in_flight=1)
+        try:
+            time.sleep(delay)
+            if roll < server.throttle_rate:
+                server.count(throttled=1)
+                self._error(429, "Rate limit exceeded", {
+                    "Retry-After": str(max(1, round(server.retry_after))),
+                    "retry-after-ms": str(int(server.retry_after * 1000)),
+                })
+            elif roll < server.throttle_rate + server.error_rate:
+                server.count(errors=1)
+                self._error(500, "Injected failure")
+            else:
+                server.count(ok=1)
+                self._send(200, server.body)
+        finally:
+            server.count(in_flight=-1)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def start_mock_foundry(host: str = "127.0.0.1", port: int = 0, **options: Any) -> MockFoundry:
+    """Start a mock server on a background thread; ``port=0`` picks a free port."""
+    server = MockFoundry((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True, name="mock-foundry").start()
+    return server
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", default="uniform:0.05,0.15", help="Latency distribution (see module docstring)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--image-size", type=int, default=256, help="Edge length in pixels of the returned image")
+    parser.add_argument("--images", type=int, default=1, help="Images per response")
+    parser.add_argument("--image-format", default="png", choices=("png", "jpeg", "webp"))
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def mock_options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "latency": args.latency,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "retry_after": args.retry_after,
+        "image_size": args.image_size,
+        "images": args.images,
+        "image_format": args.image_format,
+        "seed": args.seed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+    server = MockFoundry((args.host, args.port), **mock_options(args))
+    print(f"Mock Foundry listening on {server.url} ({len(server.body) / 1e6:.2f} MB responses)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
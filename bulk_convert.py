@@ -0,0 +1,274 @@
+"""Convert many local images at once on a process pool.
+
+Used by the ``convert_images_bulk`` tool and the ``bulk`` subcommand of
+``mcp_server_image_tools.py``. Re-encoding to JPEG is CPU-bound, so files
+are converted in worker processes (one per available core by default) and
+each result is yielded as soon as its file is done.
+
+Every conversion is recorded in ``.bulk-manifest.jsonl`` inside the output
+directory (source size, mtime and SHA-256, plus the settings used). A later
+run skips a file when its output still exists and either its size and mtime
+are unchanged (no read needed) or, after a touch or copy, its content hash
+is. The manifest is append-only while a run is in progress, so an
+interrupted run keeps what it finished, and is compacted at the end.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger("image.tools.bulk")
+
+FORMATS = {"jpg": ".jpg", "base64": ".b64"}
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+MANIFEST_NAME = ".bulk-manifest.jsonl"
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def mime_type(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix in (".jpg", ".jpeg"):
+        return "image/jpeg"
+    if suffix == ".png":
+        return "image/png"
+    return "application/octet-stream"
+
+
+def encode_jpeg(path: Path, quality: int = 95) -> bytes:
+    """Re-encode an image as JPEG, flattening transparency onto white."""
+    try:
+        from PIL import Image
+    except Exception as exc:
+        raise RuntimeError("Pillow (PIL) is required to convert images to JPEG. Install with 'pip install Pillow'") from exc
+
+    with Image.open(path) as img:
+        # Convert to RGB for JPEG if image has alpha or palette
+        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+            bg = Image.new("RGB", img.size, (255, 255, 255))
+            bg.paste(img, mask=img.split()[-1])
+            img = bg
+        else:
+            img = img.convert("RGB")
+
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on (respects affinity masks and cgroups cpusets)."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+class BulkItem(NamedTuple):
+    """One file to convert and where its output goes."""
+
+    source: Path
+    output: Path
+    key: str  # source path relative to the scanned root, used in the manifest
+
+
+def plan_conversion(source: str, output_dir: Path, pattern: str = "**/*", to: str = "jpg") -> List[BulkItem]:
+    """List the image files selected by ``source`` and their output paths.
+
+    ``source`` is a directory (searched with ``pattern``) or a glob such as
+    ``photos/**/*.png``. Outputs mirror the layout below the scanned root
+    inside ``output_dir``; files already under ``output_dir`` are ignored.
+    """
+    if to not in FORMATS:
+        raise ValueError(f"Unsupported bulk format '{to}'. Use one of: {', '.join(FORMATS)}")
+    root = Path(source)
+    if root.is_dir():
+        candidates = root.glob(pattern)
+    else:
+        # a glob: everything before the first wildcard is the root
+        parts = root.parts
+        fixed = next((i for i, part in enumerate(parts) if any(c in part for c in "*?[")), len(parts))
+        if fixed == len(parts):
+            raise FileNotFoundError(f"source not found: {root}")
+        root = Path(*parts[:fixed]) if fixed else Path(".")
+        candidates = root.glob(str(Path(*parts[fixed:])))
+    output_dir = output_dir.resolve()
+    root = root.resolve()
+
+    items: List[BulkItem] = []
+    seen: Dict[Path, Path] = {}
+    for path in sorted(candidates):
+        path = path.resolve()
+        if path.suffix.lower() not in IMAGE_SUFFIXES or not path.is_file() or output_dir in path.parents:
+            continue
+        rel = path.relative_to(root)
+        output = output_dir / (rel.with_suffix(".jpg") if to == "jpg" else rel.with_name(rel.name + FORMATS[to]))
+        if output in seen:
+            raise ValueError(f"{seen[output]} and {path} would both be written to {output}")
+        seen[output] = path
+        items.append(BulkItem(path, output, rel.as_posix()))
+    return items
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part = path.with_name(f"{path.name}.{os.getpid()}.part")
+    try:
+        part.write_bytes(data)
+        os.replace(part, path)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+
+
+def convert_file(source: str, output: str, to: str, quality: int, known_digest: Optional[str] = None) -> Dict[str, Any]:
+    """Convert one file (runs in a worker process).
+
+    When ``known_digest`` matches the source content and the output exists,
+    nothing is written and the status is ``skipped``.
+    """
+    src, dest = Path(source), Path(output)
+    digest = _file_digest(src)
+    if known_digest == digest and dest.exists():
+        return {"status": "skipped", "digest": digest, "bytes": dest.stat().st_size}
+    if to == "jpg":
+        data = encode_jpeg(src, quality)
+    else:
+        data = f"data:{mime_type(src)};base64,".encode("ascii") + base64.b64encode(src.read_bytes())
+    _write_atomic(dest, data)
+    return {"status": "converted", "digest": digest, "bytes": len(data)}
+
+
+class Manifest:
+    """What was converted into an output directory, and from which source state."""
+
+    def __init__(self, output_dir: Path):
+        self.path = output_dir / MANIFEST_NAME
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._log: Optional[io.TextIOWrapper] = None
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interrupted run
+                    self.entries[entry["source"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def check(self, item: BulkItem, to: str, quality: int) -> Tuple[bool, Optional[str]]:
+        """(up to date without reading the source, digest a worker may compare against)."""
+        entry = self.entries.get(item.key)
+        if entry is None or entry.get("to") != to or entry.get("quality") != quality or not item.output.exists():
+            return False, None
+        stat = item.source.stat()
+        return (stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]), entry["digest"]
+
+    def record(self, item: BulkItem, to: str, quality: int, digest: str) -> None:
+        stat = item.source.stat()
+        entry = {"source": item.key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": digest, "to": to, "quality": quality}
+        self.entries[item.key] = entry
+        if self._log is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._log = self.path.open("a", encoding="utf-8")
+        self._log.write(json.dumps(entry) + "\n")
+        self._log.flush()
+
+    def close(self) -> None:
+        """Rewrite the manifest with one line per source."""
+        if self._log is None:
+            return
+        self._log.close()
+        self._log = None
+        _write_atomic(self.path, "".join(json.dumps(e) + "\n" for e in self.entries.values()).encode("utf-8"))
+
+
+def convert_all(
+    items: List[BulkItem],
+    output_dir: Path,
+    to: str = "jpg",
+    quality: int = 95,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Convert ``items`` and yield one result per file as it finishes.
+
+    Results have ``path``, ``status`` ('converted', 'skipped' or 'failed'),
+    ``bytes`` (output size), ``output`` and ``error``. Files whose manifest
+    entry shows them unchanged are reported first, without touching a
+    worker. A failing file does not stop the others.
+    """
+    manifest = Manifest(output_dir)
+    pending: List[Tuple[BulkItem, Optional[str]]] = []
+    try:
+        for item in items:
+            fresh, digest = (False, None) if force else manifest.check(item, to, quality)
+            if fresh:
+                yield _result(item, "skipped", item.output.stat().st_size)
+            else:
+                pending.append((item, digest))
+        if not pending:
+            return
+
+        workers = max(1, min(workers or available_cores(), len(pending)))
+        logger.info("Converting %d files to %s with %d worker(s)", len(pending), to, workers)
+        if workers == 1:
+            for item, digest in pending:
+                try:
+                    outcome = convert_file(str(item.source), str(item.output), to, quality, digest)
+                except Exception as exc:
+                    yield _failed(item, exc)
+                    continue
+                manifest.record(item, to, quality, outcome["digest"])
+                yield _result(item, outcome["status"], outcome["bytes"])
+            return
+
+        # spawn, not fork: the MCP server is multi-threaded and a forked child can
+        # inherit a lock some other thread held at fork time
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            queue = iter(pending)
+            running: Dict[Future, BulkItem] = {}
+            while True:
+                # keep every worker busy without queueing thousands of futures at once
+                for item, digest in queue:
+                    running[pool.submit(convert_file, str(item.source), str(item.output), to, quality, digest)] = item
+                    if len(running) >= 2 * workers:
+                        break
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = running.pop(future)
+                    try:
+                        outcome = future.result()
+                    except Exception as exc:
+                        yield _failed(item, exc)
+                        continue
+                    manifest.record(item, to, quality, outcome["digest"])
+                    yield _result(item, outcome["status"], outcome["bytes"])
+    finally:
+        manifest.close()
+
+
+def _result(item: BulkItem, status: str, size: int) -> Dict[str, Any]:
+    return {"path": str(item.source), "status": status, "bytes": size, "output": str(item.output), "error": None}
+
+
+def _failed(item: BulkItem, exc: BaseException) -> Dict[str, Any]:
+    logger.warning("Bulk conversion of %s failed: %s", item.source, exc)
+    return {"path": str(item.source), "status": "failed", "bytes": 0, "output": None, "error": str(exc)}
@@ -0,0 +1,253 @@
+"""Record and replay Foundry responses.
+
+A cassette sits under the upload step of ``call_foundry_edit`` and its async
+variants. In ``record`` mode every images/edits response (including 429s
+and errors, so retries replay the same way) is appended to the cassette
+file together with the request's fingerprint and how long Foundry took.
+In ``replay`` mode no request leaves the process: each upload is answered
+from the cassette, optionally after sleeping for the recorded time. That
+makes load tests of the server's own pipeline (reading, preprocessing,
+decoding, writing) deterministic and free of Foundry cost and latency.
+
+The fingerprint is the SHA-256 of the model, the form fields and the
+uploaded bytes, so it does not depend on the endpoint, deployment or
+multipart boundary. A fingerprint recorded several times replays its
+responses in order and then starts over.
+
+File layout: an 8-byte magic followed by records of a fixed header
+(fingerprint, status, elapsed seconds, metadata and body lengths), JSON
+metadata with the response headers, and the zlib-compressed body. Records
+are appended with one write each, so an interrupted recording keeps every
+complete record. For replay the file is memory-mapped and only the headers
+are scanned to build the index; bodies are decompressed when served and
+stay in the page cache, shared with other processes replaying the same file.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, NamedTuple, Optional, Union
+
+logger = logging.getLogger("mcp.image2image.cassette")
+
+MODES = ("off", "record", "replay")
+MAGIC = b"I2ICAS01"
+# fingerprint, HTTP status, elapsed seconds, metadata length, compressed body length
+_HEADER = struct.Struct("<32sHdII")
+# response headers worth replaying: the content type and throttling hints
+_KEPT_HEADERS = ("content-type", "retry-after", "retry-after-ms")
+
+
+class CassetteMiss(LookupError):
+    """Replay mode got a request the cassette has no recording for."""
+
+
+class Recording(NamedTuple):
+    """One recorded response."""
+
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    elapsed: float
+
+
+class _Entry(NamedTuple):
+    status: int
+    elapsed: float
+    meta_offset: int
+    meta_length: int
+    body_length: int
+
+
+def fingerprint(model: str, fields: Mapping[str, Any], upload: Union[bytes, bytearray, memoryview]) -> bytes:
+    """Identify an images/edits request by what it sends, not where it goes."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps({"model": model, "fields": dict(fields)}, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(hashlib.sha256(upload).digest())
+    return digest.digest()
+
+
+class Cassette:
+    """A cassette file opened for recording or replaying.
+
+    ``latency_scale`` multiplies the recorded Foundry time before a replayed
+    response is returned (0 answers at once, 1 reproduces the original timing).
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str, latency_scale: float = 0.0, compress_level: int = 6):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use 'record' or 'replay'")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.compress_level = compress_level
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, List[_Entry]] = {}
+        self._next: Dict[bytes, int] = {}
+        self._map: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        if mode == "replay":
+            self._open_replay()
+        else:
+            self._open_record()
+
+    def _open_record(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, MAGIC)
+        else:
+            with self.path.open("rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise ValueError(f"{self.path} is not a Foundry cassette")
+        logger.info("Recording Foundry responses to %s", self.path)
+
+    def _open_replay(self) -> None:
+        try:
+            with self.path.open("rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError) as exc:
+            # ValueError: mmap of an empty file
+            raise FileNotFoundError(f"No cassette to replay at {self.path}; record one with FOUNDRY_CASSETTE_MODE=record") from exc
+        data = self._map
+        if data[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a Foundry cassette")
+        offset, size, records = len(MAGIC), len(data), 0
+        while offset + _HEADER.size <= size:
+            digest, status, elapsed, meta_length, body_length = _HEADER.unpack_from(data, offset)
+            meta_offset = offset + _HEADER.size
+            end = meta_offset + meta_length + body_length
+            if end > size:
+                break
+            self._index.setdefault(digest, []).append(_Entry(status, elapsed, meta_offset, meta_length, body_length))
+            self.stored_bytes += body_length
+            offset, records = end, records + 1
+        if offset != size:
+            logger.warning("Ignoring %d bytes of an incomplete record at the end of %s", size - offset, self.path)
+        logger.info("Replaying %d Foundry responses (%d requests) from %s", records, len(self._index), self.path)
+
+    def record(self, key: bytes, status: int, headers: Mapping[str, str], body: bytes, elapsed: float) -> None:
+        """Append one response for the request fingerprinted as ``key``."""
+        kept = {name: headers[name] for name in _KEPT_HEADERS if headers.get(name) is not None}
+        meta = json.dumps({"headers": kept}).encode("utf-8")
+        packed = zlib.compress(body, self.compress_level)
+        with self._lock:
+            if self._fd is None:
+                raise RuntimeError(f"Cassette {self.path} is closed")
+            os.write(self._fd, _HEADER.pack(key, status, elapsed, len(meta), len(packed)) + meta + packed)
+            self.recorded += 1
+            self.raw_bytes += len(body)
+            self.stored_bytes += len(packed)
+
+    def replay(self, key: bytes) -> Recording:
+        """Next recorded response for ``key``; raises :class:`CassetteMiss` if there is none."""
+        entries = self._index.get(key)
+        if not entries:
+            with self._lock:
+                self.misses += 1
+            raise CassetteMiss(
+                f"No recorded Foundry response in {self.path} for request {key.hex()[:12]}; "
+                "record it first with FOUNDRY_CASSETTE_MODE=record"
+            )
+        with self._lock:
+            position = self._next.get(key, 0)
+            self._next[key] = position + 1
+            self.replayed += 1
+        entry = entries[position % len(entries)]
+        body_offset = entry.meta_offset + entry.meta_length
+        meta = json.loads(self._map[entry.meta_offset:body_offset])
+        body = zlib.decompress(self._map[body_offset:body_offset + entry.body_length])
+        return Recording(entry.status, meta.get("headers", {}), body, entry.elapsed)
+
+    def send(self, key: bytes, url: str, post: Callable[[], Any]) -> Any:
+        """Answer a ``requests`` upload from the cassette, or make it and record the response."""
+        if self.mode == "replay":
+            recording = self.replay(key)
+            if self.latency_scale > 0:
+                time.sleep(recording.elapsed * self.latency_scale)
+            return _requests_response(recording, url)
+        started = time.perf_counter()
+        resp = post()
+        self.record(key, resp.status_code, resp.headers, resp.content, time.perf_counter() - started)
+        return resp
+
+    async def send_async(self, key: bytes, url: str, post: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of :meth:`send` for ``httpx`` uploads."""
+        import asyncio
+
+        if self.mode == "replay":
+            recording = self.replay(key)
+            if self.latency_scale > 0:
+                await asyncio.sleep(recording.elapsed * self.latency_scale)
+            return _httpx_response(recording, url)
+        started = time.perf_counter()
+        resp = await post()
+        self.record(key, resp.status_code, resp.headers, resp.content, time.perf_counter() - started)
+        return resp
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = {
+                "mode": self.mode,
+                "path": str(self.path),
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "misses": self.misses,
+                "stored_bytes": self.stored_bytes,
+            }
+            if self.mode == "replay":
+                stats["requests"] = len(self._index)
+                stats["responses"] = sum(len(entries) for entries in self._index.values())
+            elif self.raw_bytes:
+                stats["compression_ratio"] = round(self.stored_bytes / self.raw_bytes, 4)
+            return stats
+
+
+def _requests_response(recording: Recording, url: str) -> Any:
+    import requests
+    from requests.structures import CaseInsensitiveDict
+
+    resp = requests.Response()
+    resp.status_code = recording.status
+    resp.headers = CaseInsensitiveDict(recording.headers)
+    resp._content = recording.body
+    resp.url = url
+    resp.encoding = "utf-8"
+    resp.reason = "Replayed"
+    # the body is already in memory; there is no connection to release
+    resp._content_consumed = True
+    return resp
+
+
+def _httpx_response(recording: Recording, url: str) -> Any:
+    import httpx
+
+    return httpx.Response(
+        recording.status,
+        headers=recording.headers,
+        content=recording.body,
+        request=httpx.Request("POST", url),
+    )
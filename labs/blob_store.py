@@ -0,0 +1,135 @@
+"""Content-addressed store for job input images.
+
+``image2image_async`` decodes an uploaded ``image_base64`` once and keeps
+the bytes here under their SHA-256, so job records only carry a short
+``image_ref``. Identical inputs are stored once.
+
+Blobs are reclaimed with a mark-and-sweep ``gc``: after finished jobs are
+purged, every blob that no remaining job references is removed. Blobs
+written or re-used within ``min_age`` seconds are always kept so that a job
+whose record is not saved yet never loses its input. Re-using a blob and
+sweeping it are serialised by a lock on ``root/.lock`` (``flock`` where
+available), so a sweep never removes a blob another process just re-used.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialised
+    fcntl = None
+
+LOG = logging.getLogger("mcp.image2image.blobstore")
+
+
+class BlobStore:
+    """Immutable blobs under ``root/<sha256[:2]>/<sha256>``."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self.writes = 0
+        self.deduplicated = 0
+        self.collected = 0
+
+    def path(self, ref: str) -> Path:
+        if len(ref) != 64 or any(c not in "0123456789abcdef" for c in ref):
+            raise ValueError(f"Invalid blob reference: {ref!r}")
+        return self.root / ref[:2] / ref
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclude ``gc`` removals in this and other processes."""
+        with self._sweep_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.root / ".lock", "a+b") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` (if new) and return its reference."""
+        ref = hashlib.sha256(data).hexdigest()
+        target = self.path(ref)
+        with self._locked():
+            try:
+                # refresh the mtime so a later gc treats the blob as in use
+                os.utime(target)
+                reused = True
+            except FileNotFoundError:
+                reused = False
+        if reused:
+            with self._lock:
+                self.deduplicated += 1
+            return ref
+        target.parent.mkdir(parents=True, exist_ok=True)
+        part = target.with_name(f"{ref}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            part.write_bytes(data)
+            os.replace(part, target)
+        except BaseException:
+            part.unlink(missing_ok=True)
+            raise
+        with self._lock:
+            self.writes += 1
+        return ref
+
+    def get(self, ref: str) -> bytes:
+        try:
+            return self.path(ref).read_bytes()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Input blob {ref} is missing") from None
+
+    def gc(self, referenced: Iterable[str], min_age: float = 3600.0) -> int:
+        """Remove blobs not in ``referenced`` and untouched for ``min_age`` seconds."""
+        keep = set(referenced)
+        cutoff = time.time() - min_age
+        removed = 0
+        for path in self.root.glob("*/*"):
+            name = path.name
+            if name in keep:
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                with self._locked():
+                    # check again: a put may have re-used the blob since
+                    if path.stat().st_mtime > cutoff:
+                        continue
+                    path.unlink()
+            except FileNotFoundError:
+                continue
+            removed += 1
+        if removed:
+            LOG.info("Removed %d unreferenced input blobs", removed)
+        with self._lock:
+            self.collected += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        blobs = 0
+        total = 0
+        for path in self.root.glob("*/*"):
+            if path.suffix == ".part":
+                continue
+            try:
+                total += path.stat().st_size
+            except FileNotFoundError:
+                continue
+            blobs += 1
+        with self._lock:
+            return {"blobs": blobs, "bytes": total, "writes": self.writes, "deduplicated": self.deduplicated, "collected": self.collected}
@@ -0,0 +1,104 @@
+"""In-memory index of the jobs this process is queueing or running.
+
+Every state change made by the async server is mirrored here, so status
+lookups for live jobs never touch the job store, and ``image2image_wait``
+can block on a change notification instead of polling. A job leaves the
+index once it reaches a finished status; from then on the job store is the
+only source of truth.
+
+Updates come from worker threads while waiters live on the MCP server's
+event loop, so waiters are futures resolved with ``call_soon_threadsafe``.
+"""
+
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from job_store import FINISHED_STATUSES
+
+Snapshot = Tuple[int, Dict[str, Any]]
+
+
+def _resolve(future: "asyncio.Future[Optional[Snapshot]]", value: Optional[Snapshot]) -> None:
+    if not future.done():
+        future.set_result(value)
+
+
+class LiveJobIndex:
+    """Latest snapshot and a version counter per live job."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Snapshot] = {}
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[Optional[Snapshot]]"]]] = {}
+
+    def track(self, job: Dict[str, Any]) -> None:
+        """Start tracking a job that was just persisted."""
+        with self._lock:
+            self._jobs[job["job_id"]] = (1, dict(job))
+
+    def update(self, job: Dict[str, Any]) -> None:
+        """Record a new state of a tracked job and wake its waiters."""
+        job_id = job["job_id"]
+        with self._lock:
+            current = self._jobs.get(job_id)
+            if current is None:
+                return
+            entry = (current[0] + 1, dict(job))
+            if job.get("status") in FINISHED_STATUSES:
+                del self._jobs[job_id]
+            else:
+                self._jobs[job_id] = entry
+            waiters = self._waiters.pop(job_id, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, entry)
+
+    def discard(self, job_id: str) -> None:
+        """Stop tracking a job without a final state (e.g. it was never queued)."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            waiters = self._waiters.pop(job_id, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, None)
+
+    def job_ids(self, status: Optional[str] = None) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, (_, job) in self._jobs.items() if status is None or job.get("status") == status]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return dict(entry[1]) if entry else None
+
+    async def changed(self, job_id: str, version: int, timeout: float) -> Optional[Snapshot]:
+        """Wait up to ``timeout`` seconds for a state newer than ``version``.
+
+        Returns ``(version, job)`` -- unchanged if the timeout expired first --
+        or ``None`` if the job is not live in this process (finished, unknown
+        or owned by another process).
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[0] > version or timeout <= 0:
+                return (entry[0], dict(entry[1])) if entry else None
+            future: "asyncio.Future[Optional[Snapshot]]" = loop.create_future()
+            self._waiters.setdefault(job_id, []).append((loop, future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id, [])
+                if (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                    if not waiters:
+                        del self._waiters[job_id]
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return (entry[0], dict(entry[1])) if entry else None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"jobs": len(self._jobs), "waiters": sum(len(w) for w in self._waiters.values())}
@@ -0,0 +1,204 @@
+"""Bounded worker pool with a priority queue for image2image jobs.
+
+Jobs are queued per model and served by a fixed number of worker threads.
+A worker always takes the highest-priority job (ties are first-in,
+first-out) among the models that still have a free concurrency slot, so a
+saturated model never blocks jobs for another one.
+
+When the queue is full, ``submit`` either rejects the job immediately
+(``overflow="reject"``) or waits up to ``defer_timeout`` seconds for space
+(``overflow="defer"``) before rejecting it.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+LOG = logging.getLogger("mcp.image2image.scheduler")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job cannot be queued because the scheduler is at capacity."""
+
+
+def parse_model_limits(spec: str) -> Dict[str, int]:
+    """Parse a ``"gpt=2,flux=1"`` style string into a per-model limit mapping."""
+    limits: Dict[str, int] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        limits[name.strip().lower()] = int(value)
+    return limits
+
+
+class JobScheduler:
+    """Fixed-size worker pool fed by a bounded, per-model priority queue."""
+
+    def __init__(
+        self,
+        handler: Callable[[Dict[str, Any]], None],
+        workers: int = 4,
+        max_queue: int = 100,
+        model_limits: Optional[Dict[str, int]] = None,
+        overflow: str = "reject",
+        defer_timeout: float = 30.0,
+    ):
+        if overflow not in ("reject", "defer"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.model_limits = dict(model_limits or {})
+        self.overflow = overflow
+        self.defer_timeout = defer_timeout
+
+        self._cond = threading.Condition()
+        self._queues: Dict[str, List[Tuple[int, int, Dict[str, Any]]]] = {}
+        self._queued = 0
+        self._running: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+        self._started_at = time.monotonic()
+        self._busy_seconds = 0.0
+        self._busy_since: Dict[int, float] = {}
+        self.submitted = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.processed = 0
+        self.handler_errors = 0
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        for idx in range(self.workers):
+            t = threading.Thread(target=self._worker, daemon=True, name=f"mcp-job-worker-{idx}")
+            t.start()
+            self._threads.append(t)
+        LOG.info("Started %d job workers (queue size %d, model limits %s)", self.workers, self.max_queue, self.model_limits or "none")
+
+    def submit(self, job: Dict[str, Any], priority: int = 0) -> None:
+        """Queue ``job``; higher ``priority`` runs first.
+
+        Raises ``QueueFullError`` if the queue stays full under the overflow policy.
+        """
+        model = (job.get("model") or "gpt").lower()
+        with self._cond:
+            self._ensure_started()
+            if self._queued >= self.max_queue and self.overflow == "defer":
+                deadline = time.monotonic() + self.defer_timeout
+                while self._queued >= self.max_queue and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            if self._queued >= self.max_queue or self._stopping:
+                self.rejected += 1
+                raise QueueFullError(f"Job queue is full ({self.max_queue} jobs queued); try again later")
+            heapq.heappush(self._queues.setdefault(model, []), (-priority, next(self._seq), job))
+            self._queued += 1
+            self.submitted += 1
+            self._cond.notify_all()
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a queued job. Returns ``False`` if it is not (or no longer) queued."""
+        with self._cond:
+            for heap in self._queues.values():
+                for idx, entry in enumerate(heap):
+                    if entry[2].get("job_id") == job_id:
+                        heap[idx] = heap[-1]
+                        heap.pop()
+                        heapq.heapify(heap)
+                        self._queued -= 1
+                        self.cancelled += 1
+                        self._cond.notify_all()
+                        return True
+        return False
+
+    def _has_slot(self, model: str) -> bool:
+        limit = self.model_limits.get(model)
+        return limit is None or self._running.get(model, 0) < limit
+
+    def _next_job(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        best: Optional[Tuple[int, int]] = None
+        best_model: Optional[str] = None
+        for model, heap in self._queues.items():
+            if heap and self._has_slot(model) and (best is None or heap[0][:2] < best):
+                best = heap[0][:2]
+                best_model = model
+        if best_model is None:
+            return None
+        _, _, job = heapq.heappop(self._queues[best_model])
+        return best_model, job
+
+    def _worker(self) -> None:
+        ident = threading.get_ident()
+        while True:
+            with self._cond:
+                picked = self._next_job()
+                while picked is None:
+                    if self._stopping:
+                        return
+                    self._cond.wait()
+                    picked = self._next_job()
+                model, job = picked
+                self._queued -= 1
+                self._running[model] = self._running.get(model, 0) + 1
+                self._busy_since[ident] = time.monotonic()
+                # wake any submitter deferred on a full queue
+                self._cond.notify_all()
+
+            ok = False
+            try:
+                self.handler(job)
+                ok = True
+            except Exception:
+                LOG.exception("Job handler raised for job %s", job.get("job_id"))
+            finally:
+                with self._cond:
+                    self._running[model] -= 1
+                    self._busy_seconds += time.monotonic() - self._busy_since.pop(ident)
+                    self.processed += 1
+                    if not ok:
+                        self.handler_errors += 1
+                    # a model slot was freed; other workers may now be able to run
+                    self._cond.notify_all()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting jobs and let workers exit once idle."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and worker utilization figures for sizing the pool."""
+        with self._cond:
+            now = time.monotonic()
+            busy = len(self._busy_since)
+            busy_seconds = self._busy_seconds + sum(now - since for since in self._busy_since.values())
+            elapsed = max(now - self._started_at, 1e-9)
+            return {
+                "workers": self.workers,
+                "busy_workers": busy,
+                "utilization": busy / self.workers,
+                "average_utilization": busy_seconds / (elapsed * self.workers),
+                "queue_depth": self._queued,
+                "queue_depth_by_model": {m: len(h) for m, h in self._queues.items() if h},
+                "max_queue": self.max_queue,
+                "overflow": self.overflow,
+                "running_by_model": {m: n for m, n in self._running.items() if n},
+                "model_limits": dict(self.model_limits),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "processed": self.processed,
+                "handler_errors": self.handler_errors,
+            }
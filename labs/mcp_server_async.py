@@ -1,17 +1,38 @@
 import os
 import uuid
-import json
+import asyncio
+import socket
 import threading
 import time
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 import logging
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
 
 # Reuse helper functions from the existing sync server file.
-from mcp_server import call_foundry_edit, save_base64_to_file, validate_env
+from mcp_server import (
+    MAX_REQUEST_BODY_BYTES,
+    admit_request,
+    call_foundry_edit_async,
+    collect_server_stats,
+    decode_base64_image,
+    estimate_request_bytes,
+    input_size,
+    latency,
+    memory_budget,
+    server_lifespan,
+    server_stats_gauges,
+    validate_env,
+)
+from metrics import numeric_gauges
+from transport import serve
+from job_scheduler import JobScheduler, QueueFullError, parse_model_limits
+from job_index import LiveJobIndex
+from job_store import FINISHED_STATUSES, open_job_store
+from blob_store import BlobStore
 
 
 LOG = logging.getLogger("mcp.image2image.async")
@@ -25,116 +46,436 @@ if not logging.getLogger().handlers:
 JOBS_DIR = Path.cwd() / "jobs"
 JOBS_DIR.mkdir(parents=True, exist_ok=True)
 
-# Lock to protect job file writes
-_jobs_lock = threading.Lock()
+# Job store backend ("sqlite" or "file") and retention of finished jobs.
+JOB_STORE = os.getenv("IMAGE_JOB_STORE", "sqlite")
+JOB_TTL_SECONDS = float(os.getenv("IMAGE_JOB_TTL", str(7 * 24 * 3600)))
+JOB_PURGE_INTERVAL = float(os.getenv("IMAGE_JOB_PURGE_INTERVAL", "600"))
 
+# Deadline for the Foundry call of one job, and how long image2image_cancel
+# waits for a running job to stop.
+JOB_CALL_TIMEOUT = float(os.getenv("IMAGE_JOB_CALL_TIMEOUT", "60"))
+JOB_CANCEL_WAIT = float(os.getenv("IMAGE_JOB_CANCEL_WAIT", "10"))
 
-mcp = FastMCP("Image2ImageAsync")
+# Decoded job inputs, stored once per distinct image. Unreferenced blobs
+# younger than the grace period are never collected.
+JOB_BLOB_DIR = Path(os.getenv("IMAGE_JOB_BLOB_DIR", str(JOBS_DIR / "blobs")))
+JOB_BLOB_GRACE = float(os.getenv("IMAGE_JOB_BLOB_GRACE", "3600"))
 
+# Upper bound for image2image_wait's timeout, and how often it re-reads the
+# store for jobs that are not live in this process.
+JOB_WAIT_MAX = float(os.getenv("IMAGE_JOB_WAIT_MAX", "300"))
+JOB_WAIT_POLL_INTERVAL = float(os.getenv("IMAGE_JOB_WAIT_POLL_INTERVAL", "1"))
 
-def _job_path(job_id: str) -> Path:
-    return JOBS_DIR / f"{job_id}.json"
+# Jobs are claimed under a lease that the owning process renews every third
+# of IMAGE_JOB_LEASE seconds; once it runs out any server process sharing
+# jobs/ requeues the job, up to IMAGE_JOB_MAX_ATTEMPTS claims. Queued jobs
+# submitted to other processes are picked up every IMAGE_JOB_POLL_INTERVAL.
+JOB_LEASE_SECONDS = float(os.getenv("IMAGE_JOB_LEASE", "30"))
+JOB_MAX_ATTEMPTS = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.getenv("IMAGE_JOB_POLL_INTERVAL", "1"))
+
+# Lease owner id of this process: host, pid and a per-start token.
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_store = open_job_store(JOB_STORE, JOBS_DIR)
+_blobs = BlobStore(JOB_BLOB_DIR)
+_live = LiveJobIndex()
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+mcp = FastMCP("Image2ImageAsync", lifespan=server_lifespan)
 
 
 def _save_job(job: Dict[str, Any]) -> None:
-    path = _job_path(job["job_id"])
-    with _jobs_lock:
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(job, fh, ensure_ascii=False, indent=2, default=str)
+    _store.save(job)
 
 
 def _load_job(job_id: str) -> Optional[Dict[str, Any]]:
-    path = _job_path(job_id)
-    if not path.is_file():
-        return None
-    with open(path, "r", encoding="utf-8") as fh:
-        return json.load(fh)
+    return _store.load(job_id)
 
 
-def _start_job_thread(job: Dict[str, Any]) -> None:
-    """Persist job and start a background thread to process it immediately."""
-    _save_job(job)
-    t = threading.Thread(target=_process_job, args=(job,), daemon=True, name=f"mcp-job-{job['job_id']}")
-    t.start()
+def _get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Return a job from the live index, or from the store if it is not live here."""
+    return _live.get(job_id) or _load_job(job_id)
 
 
-def _process_job(job: Dict[str, Any]) -> None:
-    """Process a single job in its own thread. Updates job status on disk."""
-    job_id = job.get("job_id")
-    LOG.info("Starting processing job %s", job_id)
+def _update_job(job: Dict[str, Any], status: str, expected=None, owner: Optional[str] = None, **fields: Any) -> bool:
+    """Atomically transition ``job`` in the store and mirror the change locally."""
+    updated = _store.transition(job["job_id"], status, expected=expected, owner=owner, **fields)
+    if updated is None:
+        return False
+    job.update(updated)
+    _live.update(job)
+    return True
+
+
+def _maybe_purge_jobs() -> None:
+    """Drop finished jobs older than ``IMAGE_JOB_TTL`` at most every ``IMAGE_JOB_PURGE_INTERVAL`` seconds.
+
+    Runs from the job keeper thread, so an idle server still reclaims space.
+    Input blobs no longer referenced by any job are removed afterwards.
+    """
+    global _last_purge
+    with _purge_lock:
+        now = time.monotonic()
+        if _last_purge and now - _last_purge < JOB_PURGE_INTERVAL:
+            return
+        _last_purge = now
+    if JOB_TTL_SECONDS > 0:
+        removed = _store.purge(JOB_TTL_SECONDS)
+        if removed:
+            LOG.info("Purged %d finished jobs older than %ss", removed, JOB_TTL_SECONDS)
+    _blobs.gc(_store.image_refs(), min_age=JOB_BLOB_GRACE)
+
 
-    job["status"] = "running"
-    job["updated_at"] = datetime.utcnow().isoformat()
+def _store_input(image_base64: str, model: Optional[str]) -> str:
+    """Decode an uploaded image once and return its blob reference."""
+    with latency.timed("decode_input", model):
+        data = decode_base64_image(image_base64)
+    return _blobs.put(data)
+
+
+def _enqueue_job(job: Dict[str, Any], priority: int = 0, image_base64: Optional[str] = None) -> None:
+    """Store the job's input, persist the job and hand it to the worker pool.
+
+    If the scheduler rejects the job the record is removed again and
+    ``QueueFullError`` propagates to the caller.
+    """
+    if image_base64:
+        # decode once; the job record only keeps a reference to the stored bytes
+        job["image_ref"] = _store_input(image_base64, job.get("model"))
+        job["image_path"] = None
+    _ensure_job_keeper()
     _save_job(job)
+    _live.track(job)
+    try:
+        _scheduler.submit(job, priority=priority)
+    except QueueFullError:
+        _store.delete(job["job_id"])
+        _live.discard(job["job_id"])
+        raise
+
+
+class _RunningJob:
+    """Handle that lets ``image2image_cancel`` abort a job on its worker."""
+
+    def __init__(self) -> None:
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.task: Optional["asyncio.Task[List[str]]"] = None
+        self.cancel_requested = False
+        self.leased = False
+        self.done = threading.Event()
+
+
+_running: Dict[str, _RunningJob] = {}
+_running_lock = threading.Lock()
+_worker_local = threading.local()
+
+
+def _worker_loop() -> asyncio.AbstractEventLoop:
+    """Event loop owned by the current worker thread.
+
+    The loop is kept for the life of the worker so its pooled HTTP client
+    (one per loop) keeps its connections between jobs.
+    """
+    loop = getattr(_worker_local, "loop", None)
+    if loop is None:
+        loop = asyncio.new_event_loop()
+        _worker_local.loop = loop
+    return loop
+
+
+def _job_image(job: Dict[str, Any]) -> Any:
+    """Return the job's input bytes from the blob store, or its image_path."""
+    if job.get("image_ref"):
+        return _blobs.get(job["image_ref"])
+    # records written before inputs moved to the blob store
+    if job.get("image_base64"):
+        with latency.timed("decode_input", job.get("model")):
+            return decode_base64_image(job["image_base64"])
+    if job.get("image_path"):
+        candidate = Path(os.path.expanduser(job["image_path"]))
+        if not candidate.is_absolute():
+            candidate = Path.cwd() / candidate
+        if not candidate.is_file():
+            raise FileNotFoundError(f"image_path not found: {candidate}")
+        return str(candidate)
+    raise ValueError("No image provided")
 
-    tmp_created = False
-    img_path: Optional[str] = None
 
+def _job_input_size(job: Dict[str, Any]) -> int:
+    """Size in bytes of the job's input, read from its stored blob or file."""
     try:
-        # prepare image
+        if job.get("image_ref"):
+            return _blobs.path(job["image_ref"]).stat().st_size
         if job.get("image_base64"):
-            img_path = save_base64_to_file(job["image_base64"])
-            tmp_created = True
-        elif job.get("image_path"):
-            candidate = Path(os.path.expanduser(job["image_path"]))
-            if not candidate.is_absolute():
-                candidate = Path.cwd() / candidate
-            if not candidate.is_file():
-                raise FileNotFoundError(f"image_path not found: {candidate}")
-            img_path = str(candidate)
-        else:
-            raise ValueError("No image provided")
-
-        # call the existing Foundry edit function with a timeout so the worker doesn't hang
-        LOG.debug("Calling call_foundry_edit for job %s image=%s", job_id, img_path)
-        result_paths: List[str] = []
-
-        # Timeout in seconds (default 60)
-        timeout_seconds = int(os.getenv("IMAGE_JOB_CALL_TIMEOUT", "60"))
-
-        def _call_target():
-            nonlocal result_paths
-            result_paths = call_foundry_edit(img_path, job.get("prompt", ""), model=job.get("model", "gpt"))
-
-        call_thread = threading.Thread(target=_call_target, daemon=True)
-        call_thread.start()
-        call_thread.join(timeout=timeout_seconds)
-        if call_thread.is_alive():
-            raise TimeoutError(f"call_foundry_edit did not complete within {timeout_seconds}s")
-
-        job["status"] = "completed"
-        job["result_paths"] = result_paths
-        job["updated_at"] = datetime.utcnow().isoformat()
-        _save_job(job)
-        LOG.info("Job %s completed: %s", job_id, result_paths)
-
-    except Exception as exc:  # capture job failure
-        LOG.exception("Job %s failed", job_id)
-        job["status"] = "failed"
-        job["error"] = str(exc)
-        job["updated_at"] = datetime.utcnow().isoformat()
-        _save_job(job)
+            return len(job["image_base64"]) * 3 // 4
+        if job.get("image_path"):
+            return os.path.getsize(os.path.expanduser(job["image_path"]))
+    except OSError:
+        pass  # _job_image reports the missing input
+    return 0
+
+
+async def _run_job_call(job: Dict[str, Any], image: Any) -> List[str]:
+    # The deadline bounds the whole call (rate limiting, retries, upload and
+    # writes); each HTTP attempt also gets it as its socket timeout.
+    return await asyncio.wait_for(
+        call_foundry_edit_async(
+            image,
+            job.get("prompt", ""),
+            model=job.get("model", "gpt"),
+            timeout=JOB_CALL_TIMEOUT,
+            bypass_cache=job.get("bypass_cache", False),
+            preprocess=job.get("preprocess"),
+            output_format=job.get("output_format", "png"),
+            output_quality=job.get("output_quality"),
+        ),
+        JOB_CALL_TIMEOUT,
+    )
+
+
+def _process_job(job: Dict[str, Any]) -> None:
+    """Process a single job on a scheduler worker. Updates job status in the store.
 
+    The Foundry call runs as a task on the worker's event loop, so a deadline
+    or ``image2image_cancel`` really aborts it instead of abandoning it.
+    """
+    job_id = job.get("job_id")
+    LOG.info("Starting processing job %s", job_id)
+    model = job.get("model")
+    try:
+        queued_for = datetime.utcnow() - datetime.fromisoformat(job["created_at"])
+        latency.observe("queue_wait", model, max(0.0, queued_for.total_seconds()))
+    except (KeyError, TypeError, ValueError):
+        pass
+
+    handle = _RunningJob()
+    with _running_lock:
+        _running[job_id] = handle
+    try:
+        claimed = _store.claim(job_id, _OWNER, JOB_LEASE_SECONDS)
+        if claimed is None:
+            # cancelled, or claimed by another server process sharing the store
+            LOG.info("Job %s is no longer queued; skipping", job_id)
+            _live.discard(job_id)
+            return
+        job.update(claimed)
+        handle.leased = True
+        _live.update(job)
+
+        try:
+            # a queued job holds no memory; the worker waits for room in the budget before loading its input
+            started = time.perf_counter()
+            with memory_budget.reserve_blocking(estimate_request_bytes(_job_input_size(job)), queue=True):
+                latency.observe("admission_wait", model, time.perf_counter() - started)
+                image = _job_image(job)
+                loop = _worker_loop()
+                with _running_lock:
+                    cancelled = handle.cancel_requested
+                    if not cancelled:
+                        handle.loop, handle.task = loop, loop.create_task(_run_job_call(job, image))
+                if cancelled:
+                    raise asyncio.CancelledError()
+                LOG.debug("Calling call_foundry_edit_async for job %s", job_id)
+                with latency.timed("job_run", model):
+                    result_paths = loop.run_until_complete(handle.task)
+        except asyncio.CancelledError:
+            LOG.info("Job %s cancelled", job_id)
+            if not _update_job(job, "cancelled", expected=("running",), owner=_OWNER, error="Cancelled by request"):
+                _live.discard(job_id)
+        except asyncio.TimeoutError:
+            LOG.error("Job %s timed out after %ss", job_id, JOB_CALL_TIMEOUT)
+            _finish_job(job, "failed", error=f"call_foundry_edit did not complete within {JOB_CALL_TIMEOUT:g}s")
+        except Exception as exc:  # capture job failure
+            LOG.exception("Job %s failed", job_id)
+            _finish_job(job, "failed", error=str(exc))
+        else:
+            _finish_job(job, "completed", result_paths=result_paths)
+            LOG.info("Job %s completed: %s", job_id, result_paths)
     finally:
-        if tmp_created and img_path:
-            try:
-                Path(img_path).unlink()
-                LOG.debug("Removed temporary file for job %s: %s", job_id, img_path)
-            except Exception:
-                LOG.exception("Failed to remove temporary image file for job %s: %s", job_id, img_path)
+        with _running_lock:
+            _running.pop(job_id, None)
+        handle.done.set()
+        _keeper_wake.set()
 
 
-# Note: we start a dedicated thread for each job when `image2image_async` is called.
+def _finish_job(job: Dict[str, Any], status: str, **fields: Any) -> None:
+    """Record a job's outcome, unless its lease was lost to another process meanwhile."""
+    if not _update_job(job, status, expected=("running",), owner=_OWNER, **fields):
+        LOG.warning("Job %s lost its lease before finishing; its result (%s) is dropped", job["job_id"], status)
+        _live.discard(job["job_id"])
+
+
+def _cancel_job(job_id: str) -> Dict[str, Any]:
+    job = _get_job(job_id)
+    if not job:
+        raise FileNotFoundError(f"Job not found: {job_id}")
+
+    if job.get("status") == "queued":
+        _scheduler.cancel(job_id)
+        # a worker may have taken the job meanwhile; the store decides who wins
+        if _update_job(job, "cancelled", expected=("queued",), error="Cancelled by request"):
+            LOG.info("Cancelled queued job %s", job_id)
+            return {"job_id": job_id, "status": "cancelled"}
+
+    with _running_lock:
+        handle = _running.get(job_id)
+        if handle is not None:
+            _request_cancel(handle)
+    if handle is not None:
+        if not handle.done.wait(JOB_CANCEL_WAIT):
+            LOG.warning("Job %s did not stop within %ss of being cancelled", job_id, JOB_CANCEL_WAIT)
+    elif _store.transition(job_id, "running", expected=("running",), cancel_requested=True):
+        # running in another server process; its keeper aborts the job
+        deadline = time.monotonic() + JOB_CANCEL_WAIT
+        while _store.statuses([job_id]).get(job_id) == "running" and time.monotonic() < deadline:
+            time.sleep(min(0.1, JOB_POLL_INTERVAL))
+
+    job = _get_job(job_id) or job
+    return {"job_id": job_id, "status": job.get("status")}
+
+
+def _request_cancel(handle: _RunningJob) -> None:
+    """Abort a job running on this process. Call with ``_running_lock`` held."""
+    handle.cancel_requested = True
+    if handle.task is not None:
+        handle.loop.call_soon_threadsafe(handle.task.cancel)
+
+
+def _owner_dead(owner: str) -> bool:
+    """Whether a lease owner is a server process on this host that no longer runs."""
+    host, _, rest = owner.partition(":")
+    pid, _, _ = rest.partition(":")
+    if host != socket.gethostname() or owner == _OWNER or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        # an earlier run of this server that had the same pid (e.g. in a container)
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+_last_renewal = 0.0
+
+
+def _keep_jobs() -> None:
+    """One round of lease upkeep: renew, recover and pick up shared work."""
+    global _last_renewal
+    # renew our leases; abort jobs whose lease was lost or that were cancelled elsewhere
+    now = time.monotonic()
+    if now - _last_renewal >= JOB_LEASE_SECONDS / 3:
+        _last_renewal = now
+        with _running_lock:
+            leased = [job_id for job_id, handle in _running.items() if handle.leased]
+        held = _store.renew(_OWNER, leased, JOB_LEASE_SECONDS) if leased else {}
+        with _running_lock:
+            for job_id in leased:
+                handle = _running.get(job_id)
+                if handle is None or handle.cancel_requested:
+                    continue
+                if job_id not in held:
+                    LOG.warning("Job %s lost its lease; aborting it here", job_id)
+                elif not held[job_id].get("cancel_requested"):
+                    continue
+                _request_cancel(handle)
+
+    # return jobs of crashed processes (including an earlier run of this one) to the queue
+    for job in _store.requeue_expired(JOB_MAX_ATTEMPTS, owner_dead=_owner_dead):
+        LOG.warning("Recovered interrupted job %s (attempt %s): now %s", job["job_id"], job.get("attempts"), job["status"])
+
+    # jobs we queued that another process claimed are no longer answered from memory
+    queued_here = _live.job_ids(status="queued")
+    if queued_here:
+        for job_id, status in _store.statuses(queued_here).items():
+            if status != "queued":
+                _live.discard(job_id)
+
+    # take queued jobs from the shared store while workers are idle, keeping
+    # up to one job per worker waiting locally so no worker sits out a poll
+    sched = _scheduler.stats()
+    idle = 2 * sched["workers"] - sched["busy_workers"] - sched["queue_depth"]
+    if idle <= 0:
+        return
+    for job in _store.queued_jobs(limit=idle + len(queued_here)):
+        if idle <= 0:
+            break
+        if _live.get(job["job_id"]) is not None:
+            continue
+        _live.track(job)
+        try:
+            _scheduler.submit(job, priority=int(job.get("priority") or 0))
+        except QueueFullError:
+            _live.discard(job["job_id"])
+            break
+        idle -= 1
+
+
+_keeper: Optional[threading.Thread] = None
+_keeper_lock = threading.Lock()
+# set when a worker frees up, so shared work is picked up without waiting a full poll
+_keeper_wake = threading.Event()
+
+
+def _job_keeper() -> None:
+    while True:
+        try:
+            _keep_jobs()
+        except Exception:
+            LOG.exception("Job lease upkeep failed")
+        try:
+            _maybe_purge_jobs()
+        except Exception:
+            LOG.exception("Job purge failed")
+        _keeper_wake.wait(JOB_POLL_INTERVAL)
+        _keeper_wake.clear()
+
+
+def _ensure_job_keeper() -> None:
+    """Start the lease keeper thread; its first round recovers interrupted jobs."""
+    global _keeper
+    with _keeper_lock:
+        if _keeper is not None:
+            return
+        _keeper = threading.Thread(target=_job_keeper, daemon=True, name="mcp-job-keeper")
+        _keeper.start()
+
+
+# Jobs run on a fixed pool of workers fed by a bounded priority queue.
+_scheduler = JobScheduler(
+    _process_job,
+    workers=int(os.getenv("IMAGE_JOB_WORKERS", "4")),
+    max_queue=int(os.getenv("IMAGE_JOB_QUEUE_SIZE", "100")),
+    model_limits=parse_model_limits(os.getenv("IMAGE_JOB_MODEL_LIMITS", "")),
+    overflow=os.getenv("IMAGE_JOB_QUEUE_POLICY", "reject"),
+    defer_timeout=float(os.getenv("IMAGE_JOB_DEFER_TIMEOUT", "30")),
+)
 
 
 @mcp.tool()
-def image2image_async(
+async def image2image_async(
     model: str = "gpt",
     prompt: Optional[str] = None,
     image_base64: Optional[str] = None,
     image_path: Optional[str] = None,
+    bypass_cache: bool = False,
+    preprocess: Optional[bool] = None,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+    priority: int = 0,
 ) -> Dict[str, str]:
-    """Start an image2image job and return immediately with a job_id."""
+    """Start an image2image job and return immediately with a job_id.
+
+    Jobs with a higher ``priority`` are picked up first. If the job queue is
+    full the call fails (or, with ``IMAGE_JOB_QUEUE_POLICY=defer``, waits for
+    space up to ``IMAGE_JOB_DEFER_TIMEOUT`` seconds).
+    """
     model = (model or "gpt").lower()
     prompt = prompt or "update this image to be set in a pirate era"
 
@@ -153,28 +494,93 @@ def image2image_async(
         "status": "queued",
         "model": model,
         "prompt": prompt,
-        "image_base64": image_base64,
+        "image_ref": None,
         "image_path": image_path,
+        "bypass_cache": bypass_cache,
+        "preprocess": preprocess,
+        "output_format": output_format,
+        "output_quality": output_quality,
+        "priority": priority,
         "result_paths": [],
         "error": None,
     }
 
-    # persist and start processing immediately in a per-job thread
-    _start_job_thread(job)
-    LOG.info("Started job %s", job_id)
+    if image_base64:
+        # the upload is decoded and stored now; the worker reserves memory for the edit itself
+        admission = admit_request(model, image_base64, response=False)
+    else:
+        input_size(image_path=os.path.expanduser(image_path))
+        admission = nullcontext()
+    async with admission:
+        # store the input, persist and queue; decoding and deferral block, so keep them off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, _enqueue_job, job, priority, image_base64)
+    LOG.info("Queued job %s (priority %d)", job_id, priority)
     return {"job_id": job_id}
 
 
 @mcp.tool()
-def image2image_status(job_id: str) -> Dict[str, Any]:
-    """Return job status and results for a given job_id."""
-    job = _load_job(job_id)
-    if not job:
-        raise FileNotFoundError(f"Job not found: {job_id}")
+async def image2image_cancel(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued or running job.
+
+    A queued job is removed from the queue. A running job has its Foundry
+    request aborted and any files it already wrote removed. Returns the job's
+    resulting status: 'cancelled', or 'completed'/'failed' if it finished first.
+    """
+    return await asyncio.to_thread(_cancel_job, job_id)
+
+
+@mcp.tool()
+def image2image_list_jobs(
+    status: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    """List jobs, newest first, optionally filtered by internal status
+    ('queued', 'running', 'completed', 'failed', 'cancelled'), model and an ISO-8601
+    ``created_at`` range (``since`` inclusive, ``until`` exclusive)."""
+    jobs = _store.list_jobs(status=status, model=(model or None) and model.lower(), since=since, until=until, limit=limit)
+    return [
+        {key: job.get(key) for key in ("job_id", "status", "model", "prompt", "created_at", "updated_at", "result_paths", "error")}
+        for job in jobs
+    ]
+
+
+@mcp.tool()
+def image2image_queue_stats() -> Dict[str, Any]:
+    """Return job queue depth and worker utilization for the async worker pool."""
+    return _scheduler.stats()
+
+
+@mcp.tool()
+def server_stats(include_openmetrics: bool = False) -> Dict[str, Any]:
+    """Report latency percentiles and internal counters of this server.
+
+    Same as the main server's server_stats, plus 'queue_wait' (time from
+    submission until a worker starts the job) and 'job_run' latencies, the
+    job queue counters under 'job_queue', input blob store usage under
+    'input_blobs' and the jobs and image2image_wait callers held in memory
+    under 'live_jobs'. Queued jobs reserve from the 'admission' memory
+    budget only once a worker starts them.
+    """
+    stats = collect_server_stats()
+    stats["job_queue"] = _scheduler.stats()
+    stats["input_blobs"] = _blobs.stats()
+    stats["live_jobs"] = _live.stats()
+    if include_openmetrics:
+        gauges = server_stats_gauges(stats) + numeric_gauges("job_queue", stats["job_queue"]) + numeric_gauges("input_blobs", stats["input_blobs"])
+        gauges += numeric_gauges("live_jobs", stats["live_jobs"])
+        stats["openmetrics"] = latency.openmetrics(gauges=gauges)
+    return stats
+
+
+def _status_response(job: Dict[str, Any]) -> Dict[str, Any]:
     # Map internal statuses to the user-facing responses required:
     # - If the job is queued or running -> return status 'working'
     # - If completed -> return status 'completed' and include generated path(s)
     # - If failed -> return status 'failed' and include the error
+    # - If cancelled -> return status 'cancelled'
     internal_status = job.get("status")
     if internal_status in ("queued", "running"):
         return {
@@ -200,6 +606,17 @@ def image2image_status(job_id: str) -> Dict[str, Any]:
             "updated_at": job.get("updated_at"),
         }
 
+    if internal_status == "cancelled":
+        return {
+            "job_id": job.get("job_id"),
+            "status": "cancelled",
+            "path": None,
+            "result_paths": [],
+            "error": job.get("error"),
+            "created_at": job.get("created_at"),
+            "updated_at": job.get("updated_at"),
+        }
+
     # fallback (failed or unknown)
     return {
         "job_id": job.get("job_id"),
@@ -213,11 +630,61 @@ def image2image_status(job_id: str) -> Dict[str, Any]:
 
 
 @mcp.tool()
-def image2image_sync(
+def image2image_status(job_id: str) -> Dict[str, Any]:
+    """Return job status and results for a given job_id."""
+    job = _get_job(job_id)
+    if not job:
+        raise FileNotFoundError(f"Job not found: {job_id}")
+    return _status_response(job)
+
+
+# progress reported by image2image_wait for each internal status (out of 2)
+_STATUS_PROGRESS = {"queued": 0, "running": 1}
+
+
+@mcp.tool()
+async def image2image_wait(job_id: str, timeout: float = 30.0, ctx: Optional[Context] = None) -> Dict[str, Any]:
+    """Wait until a job finishes or ``timeout`` seconds pass, then return its status.
+
+    Returns the same fields as image2image_status; 'status' is still
+    'working' if the timeout expires first (the wait is capped at
+    IMAGE_JOB_WAIT_MAX seconds). A progress notification is sent whenever
+    the job changes state: queued (0/2), running (1/2) and finished (2/2).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(max(0.0, timeout), JOB_WAIT_MAX)
+    version = 0
+    reported = None
+    while True:
+        remaining = max(0.0, deadline - loop.time())
+        live = await _live.changed(job_id, version, remaining)
+        if live is None:
+            job = await asyncio.to_thread(_load_job, job_id)
+            if not job:
+                raise FileNotFoundError(f"Job not found: {job_id}")
+        else:
+            version, job = live
+        status = job.get("status")
+        if ctx is not None and status != reported:
+            reported = status
+            await ctx.report_progress(_STATUS_PROGRESS.get(status, 2), 2, message=status)
+        if status in FINISHED_STATUSES or remaining <= 0:
+            return _status_response(job)
+        if live is None:
+            # not live in this process, so no change notification will come
+            await asyncio.sleep(min(JOB_WAIT_POLL_INTERVAL, remaining))
+
+
+@mcp.tool()
+async def image2image_sync(
     model: str = "gpt",
     prompt: Optional[str] = None,
     image_base64: Optional[str] = None,
     image_path: Optional[str] = None,
+    bypass_cache: bool = False,
+    preprocess: Optional[bool] = None,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
 ) -> List[str]:
     """Synchronous image2image tool (re-implemented here so this server exposes both sync and async tools)."""
     model = (model or "gpt").lower()
@@ -225,39 +692,40 @@ def image2image_sync(
 
     LOG.info("image2image_sync called model=%s prompt=%s image_base64=%s image_path=%s", model, prompt, bool(image_base64), image_path)
 
-    tmp_created = False
-    img_path: Optional[str] = None
-
-    if image_base64:
-        img_path = save_base64_to_file(image_base64)
-        tmp_created = True
-    elif image_path:
-        candidate = Path(os.path.expanduser(image_path))
-        if not candidate.is_absolute():
-            candidate = Path.cwd() / candidate
-        if not candidate.is_file():
-            LOG.error("image_path not found: %s", candidate)
-            raise FileNotFoundError(f"image_path not found: {candidate}")
-        img_path = str(candidate)
-    else:
+    if not image_base64 and not image_path:
         LOG.error("No image provided to image2image_sync tool")
         raise ValueError("No image provided. Please provide 'image_base64' or 'image_path'.")
 
-    try:
-        LOG.debug("Calling call_foundry_edit (sync) with image=%s", img_path)
-        saved = call_foundry_edit(img_path, prompt, model=model)
-        LOG.info("image2image_sync completed, %d files saved", len(saved))
-        return saved
-    finally:
-        if tmp_created and img_path and Path(img_path).exists():
-            try:
-                Path(img_path).unlink()
-                LOG.debug("Removed temporary file: %s", img_path)
-            except Exception:
-                LOG.exception("Failed to remove temporary image file: %s", img_path)
+    async with admit_request(model, image_base64, None if image_base64 else os.path.expanduser(image_path)):
+        image: Any
+        if image_base64:
+            with latency.timed("decode_input", model):
+                image = decode_base64_image(image_base64)
+        else:
+            candidate = Path(os.path.expanduser(image_path))
+            if not candidate.is_absolute():
+                candidate = Path.cwd() / candidate
+            if not candidate.is_file():
+                LOG.error("image_path not found: %s", candidate)
+                raise FileNotFoundError(f"image_path not found: {candidate}")
+            image = str(candidate)
+
+        LOG.debug("Calling call_foundry_edit_async (sync) for model=%s", model)
+        saved = await call_foundry_edit_async(
+            image,
+            prompt,
+            model=model,
+            bypass_cache=bypass_cache,
+            preprocess=preprocess,
+            output_format=output_format,
+            output_quality=output_quality,
+        )
+    LOG.info("image2image_sync completed, %d files saved", len(saved))
+    return saved
 
 
 if __name__ == '__main__':
     # Validate environment and run the MCP server
     validate_env()
-    mcp.run()
+    _ensure_job_keeper()
+    serve(mcp, max_body_bytes=MAX_REQUEST_BODY_BYTES)
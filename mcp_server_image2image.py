@@ -1,16 +1,37 @@
 import os
+import json
+import asyncio
 import base64
-import requests
-from io import BytesIO
+import threading
+import time
+import uuid
+import httpx
+from contextlib import asynccontextmanager
 from datetime import datetime
-from PIL import Image
+from io import BytesIO
 from dotenv import load_dotenv
-from mcp.server.fastmcp import FastMCP
-import tempfile
+from mcp.server.fastmcp import FastMCP, Context
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Optional, List
+from typing import TYPE_CHECKING, Any, AsyncIterator, Optional, List, Dict, Tuple, Union, BinaryIO
+
+# PIL and requests are imported on first use so that a freshly spawned server
+# answers initialize/tools/list sooner; httpx and dotenv already come with mcp.
+if TYPE_CHECKING:
+    import requests
 
+from result_cache import ResultCache, cache_key
+from output_store import OutputStore
+from admission import MemoryBudget
+from cassette import MODES as CASSETTE_MODES, Cassette, fingerprint
+from singleflight import SingleFlight
+from rate_limit import DeploymentLimiter
+from backends import BackendPool, call_with_failover, call_with_failover_async, load_backends
+from metrics import Gauge, LatencyMetrics, numeric_gauges
+from transport import serve, transport_stats
+
+# .env must be applied before the settings below are read
 load_dotenv()
 
 # Configure basic logging. The level can be overridden with the MCP_SERVER_LOGLEVEL env var.
@@ -28,14 +49,126 @@ FOUNDRY_API_VERSION = os.getenv("FOUNDRY_API_VERSION")
 FLUX_DEPLOYMENT_NAME = os.getenv("FLUX_DEPLOYMENT_NAME")
 GPT_DEPLOYMENT_NAME = os.getenv("GPT_DEPLOYMENT_NAME")
 
+# Optional pool of endpoints/deployments per model (JSON or a JSON file path),
+# how attempts are routed across it, and its circuit breaker.
+FOUNDRY_BACKENDS = os.getenv("FOUNDRY_BACKENDS", "")
+FOUNDRY_ROUTING = os.getenv("FOUNDRY_ROUTING", "least_outstanding").lower()
+FOUNDRY_CIRCUIT_FAILURES = int(os.getenv("FOUNDRY_CIRCUIT_FAILURES", "5"))
+FOUNDRY_CIRCUIT_COOLDOWN = float(os.getenv("FOUNDRY_CIRCUIT_COOLDOWN", "30"))
+
+# HTTP connection pool settings shared by every Foundry call.
+FOUNDRY_POOL_SIZE = int(os.getenv("FOUNDRY_POOL_SIZE", "10"))
+FOUNDRY_POOL_KEEPALIVE = float(os.getenv("FOUNDRY_POOL_KEEPALIVE", "30"))
+FOUNDRY_CONNECT_TIMEOUT = float(os.getenv("FOUNDRY_CONNECT_TIMEOUT", "10"))
+FOUNDRY_READ_TIMEOUT = float(os.getenv("FOUNDRY_READ_TIMEOUT", "120"))
+
+# Client-side throttling and retries, applied per backend.
+FOUNDRY_RATE_LIMIT = float(os.getenv("FOUNDRY_RATE_LIMIT", "0"))
+FOUNDRY_RATE_BURST = float(os.getenv("FOUNDRY_RATE_BURST", "1"))
+FOUNDRY_MAX_CONCURRENCY = int(os.getenv("FOUNDRY_MAX_CONCURRENCY", str(FOUNDRY_POOL_SIZE)))
+FOUNDRY_MIN_CONCURRENCY = int(os.getenv("FOUNDRY_MIN_CONCURRENCY", "1"))
+FOUNDRY_MAX_RETRIES = int(os.getenv("FOUNDRY_MAX_RETRIES", "3"))
+FOUNDRY_RETRY_BASE = float(os.getenv("FOUNDRY_RETRY_BASE", "1"))
+FOUNDRY_RETRY_MAX = float(os.getenv("FOUNDRY_RETRY_MAX", "30"))
+
+# Record Foundry responses to a cassette file or replay them offline
+# (off, record, replay), and the share of the recorded latency a replayed
+# response waits (0 = none, 1 = as recorded).
+FOUNDRY_CASSETTE_MODE = os.getenv("FOUNDRY_CASSETTE_MODE", "off").lower()
+FOUNDRY_CASSETTE_PATH = Path(os.getenv("FOUNDRY_CASSETTE_PATH", str(Path.cwd() / "cassettes" / "foundry.cassette")))
+FOUNDRY_CASSETTE_LATENCY = float(os.getenv("FOUNDRY_CASSETTE_LATENCY", "0"))
+
+# On-disk result cache kept next to generated/.
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+IMAGE_CACHE_DIR = Path(os.getenv("IMAGE_CACHE_DIR", str(Path.cwd() / "cache")))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "1000"))
+
+# Optional input preprocessing before upload (downscale + re-encode).
+IMAGE_PREPROCESS = os.getenv("IMAGE_PREPROCESS", "0").lower() in ("1", "true", "yes")
+IMAGE_PREPROCESS_MAX_SIZE = int(os.getenv("IMAGE_PREPROCESS_MAX_SIZE", "1024"))
+IMAGE_PREPROCESS_FORMAT = os.getenv("IMAGE_PREPROCESS_FORMAT", "jpeg").lower()
+IMAGE_PREPROCESS_QUALITY = int(os.getenv("IMAGE_PREPROCESS_QUALITY", "85"))
+
+# Threads used to write generated images when a response holds several.
+IMAGE_OUTPUT_WRITERS = int(os.getenv("IMAGE_OUTPUT_WRITERS", "4"))
+
+# Generated images: directory and retention quota (0 = unlimited); the
+# oldest files are evicted first by a background pass at most every interval.
+IMAGE_OUTPUT_DIR = Path(os.getenv("IMAGE_OUTPUT_DIR", str(Path.cwd() / "generated")))
+IMAGE_OUTPUT_MAX_BYTES = int(os.getenv("IMAGE_OUTPUT_MAX_BYTES", "0"))
+IMAGE_OUTPUT_MAX_AGE = float(os.getenv("IMAGE_OUTPUT_MAX_AGE", "0"))
+IMAGE_OUTPUT_GC_INTERVAL = float(os.getenv("IMAGE_OUTPUT_GC_INTERVAL", "60"))
+
+# Tiled mode for large inputs: tiles match the 1024x1024 edit size and overlap
+# by IMAGE_TILE_OVERLAP pixels; at most IMAGE_TILE_CONCURRENCY tiles of one
+# call are in flight and inputs needing more than IMAGE_TILE_MAX are refused.
+IMAGE_TILE_SIZE = 1024
+IMAGE_TILE_OVERLAP = int(os.getenv("IMAGE_TILE_OVERLAP", "128"))
+IMAGE_TILE_CONCURRENCY = int(os.getenv("IMAGE_TILE_CONCURRENCY", "4"))
+IMAGE_TILE_MAX = int(os.getenv("IMAGE_TILE_MAX", "64"))
+
+# image2image_batch fan-out.
+IMAGE_BATCH_CONCURRENCY = int(os.getenv("IMAGE_BATCH_CONCURRENCY", "4"))
+IMAGE_BATCH_MAX_ITEMS = int(os.getenv("IMAGE_BATCH_MAX_ITEMS", "1000"))
+
+# Per-phase latency histograms reported by server_stats.
+IMAGE_METRICS_ENABLED = os.getenv("IMAGE_METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+IMAGE_METRICS_WINDOW = int(os.getenv("IMAGE_METRICS_WINDOW", "2048"))
+
+# Admission control for image payloads: estimated bytes held by requests in
+# flight (0 = unlimited, still reported), whether requests that do not fit
+# wait or fail, the largest accepted input and the allowance per request for
+# the Foundry response and decoded output.
+IMAGE_MEMORY_BUDGET = int(os.getenv("IMAGE_MEMORY_BUDGET", str(1024 * 1024 * 1024)))
+IMAGE_ADMISSION_POLICY = os.getenv("IMAGE_ADMISSION_POLICY", "queue").lower()
+IMAGE_ADMISSION_TIMEOUT = float(os.getenv("IMAGE_ADMISSION_TIMEOUT", "30"))
+IMAGE_MAX_INPUT_BYTES = int(os.getenv("IMAGE_MAX_INPUT_BYTES", str(50 * 1024 * 1024)))
+IMAGE_ADMISSION_RESPONSE_BYTES = int(os.getenv("IMAGE_ADMISSION_RESPONSE_BYTES", str(16 * 1024 * 1024)))
+# HTTP request body limit for network transports: a base64 upload of the
+# largest input allowed plus room for the rest of the tool call.
+MAX_REQUEST_BODY_BYTES = IMAGE_MAX_INPUT_BYTES * 4 // 3 + 1024 * 1024 if IMAGE_MAX_INPUT_BYTES else 0
+
+# Warm up in the background when the server starts: import PIL and open a
+# pooled connection to every Foundry endpoint before the first tool call.
+IMAGE_WARMUP = os.getenv("IMAGE_WARMUP", "0").lower() in ("1", "true", "yes")
+
+
+_warmup_started = False
+
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
+    """Run :func:`warm_up` in the background when ``IMAGE_WARMUP`` is on.
+
+    Network transports enter the lifespan once per client session; only the
+    first one warms up.
+    """
+    global _warmup_started
+    task = None
+    if IMAGE_WARMUP and not _warmup_started:
+        _warmup_started = True
+        task = asyncio.create_task(warm_up())
+    try:
+        yield {}
+    finally:
+        if task is not None:
+            task.cancel()
+
+
 # Create an MCP server
-mcp = FastMCP("Image2Image")
+mcp = FastMCP("Image2Image", lifespan=server_lifespan)
 
 
 def validate_env() -> None:
     """Validate required environment variables and log helpful messages for new users."""
     missing = []
-    for var in ("FOUNDRY_ENDPOINT", "FOUNDRY_API_KEY", "FOUNDRY_API_VERSION", "FLUX_DEPLOYMENT_NAME", "GPT_DEPLOYMENT_NAME"):
+    required = ("FOUNDRY_ENDPOINT", "FOUNDRY_API_KEY", "FOUNDRY_API_VERSION", "FLUX_DEPLOYMENT_NAME", "GPT_DEPLOYMENT_NAME")
+    if FOUNDRY_BACKENDS:
+        # endpoints and deployments come from the pool; parse it now so mistakes show up at startup
+        get_backend_pools()
+        required = ()
+    for var in required:
         if not os.getenv(var):
             missing.append(var)
     if missing:
@@ -47,20 +180,430 @@ def validate_env() -> None:
     else:
         logger.debug("All required environment variables appear to be set.")
 
-def call_foundry_edit(image_path: str, prompt: str, model: str = "gpt") -> List[str]:
-    """Call the Foundry images/edit endpoint with given image file path and prompt.
+_http_session: Optional["requests.Session"] = None
+_http_session_lock = threading.Lock()
+_async_clients: Dict[int, Tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+_output_store: Optional[OutputStore] = None
+_output_store_lock = threading.Lock()
+# Identical Foundry calls in flight at the same time share one upstream request.
+_inflight = SingleFlight()
+_rate_limiters: Dict[str, DeploymentLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+_backend_pools: Optional[Dict[str, BackendPool]] = None
+_backend_pools_lock = threading.Lock()
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+# Latency per request phase and model; the labs server records into it too.
+latency = LatencyMetrics(window=IMAGE_METRICS_WINDOW, enabled=IMAGE_METRICS_ENABLED)
 
-    Returns the list of generated image file paths.
+# Shared by every tool (and the labs job workers) in this process.
+memory_budget = MemoryBudget(IMAGE_MEMORY_BUDGET, IMAGE_ADMISSION_POLICY, IMAGE_ADMISSION_TIMEOUT)
+
+
+def get_http_session() -> "requests.Session":
+    """Return the shared keep-alive ``requests`` session used for Foundry calls.
+
+    The session is created on first use with a connection pool sized by
+    ``FOUNDRY_POOL_SIZE`` so concurrent calls reuse TCP/TLS connections.
     """
-    logger.info("Preparing request to Foundry for model=%s prompt='%s' image=%s", model, prompt, image_path)
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=FOUNDRY_POOL_SIZE, pool_maxsize=FOUNDRY_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers["Connection"] = "keep-alive"
+                _http_session = session
+                logger.debug("Created Foundry HTTP session (pool_size=%d)", FOUNDRY_POOL_SIZE)
+    return _http_session
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the shared ``httpx.AsyncClient`` for the running event loop.
+
+    Async clients are bound to the loop they were created on, so one client is
+    kept per loop. Pool size, keep-alive expiry and timeouts follow the same
+    settings as the sync session.
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(id(loop))
+    if entry is None or entry[0] is not loop or entry[1].is_closed:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=FOUNDRY_POOL_SIZE,
+                max_keepalive_connections=FOUNDRY_POOL_SIZE,
+                keepalive_expiry=FOUNDRY_POOL_KEEPALIVE,
+            ),
+            timeout=httpx.Timeout(FOUNDRY_READ_TIMEOUT, connect=FOUNDRY_CONNECT_TIMEOUT),
+        )
+        _async_clients[id(loop)] = (loop, client)
+        logger.debug("Created Foundry async HTTP client (pool_size=%d)", FOUNDRY_POOL_SIZE)
+        return client
+    return entry[1]
+
+
+def _warm_imports() -> None:
+    from PIL import Image
+
+    Image.preinit()
+
+
+async def warm_up() -> None:
+    """Load PIL and pre-open a pooled connection to each Foundry endpoint.
+
+    Runs on the server's event loop so the connections land in the async
+    client that the tools use. Failures are only logged.
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(_warm_imports)
+        if FOUNDRY_CASSETTE_MODE == "replay":
+            # replay never connects; open (and index) the cassette instead
+            await asyncio.to_thread(get_cassette)
+            endpoints = set()
+        else:
+            endpoints = {backend.endpoint for pool in get_backend_pools().values() for backend in pool.backends}
+        client = get_async_http_client()
+        results = await asyncio.gather(
+            *(client.head(endpoint, timeout=FOUNDRY_CONNECT_TIMEOUT) for endpoint in endpoints),
+            return_exceptions=True,
+        )
+    except Exception as exc:
+        logger.warning("Warm-up failed: %s", exc)
+        return
+    failed = [str(r) for r in results if isinstance(r, BaseException)]
+    if failed:
+        logger.warning("Warm-up could not reach %d endpoint(s): %s", len(failed), "; ".join(failed))
+    logger.info("Warm-up finished in %.0f ms (%d endpoints)", (time.perf_counter() - started) * 1000, len(endpoints))
+
+
+def close_http_clients() -> None:
+    """Close the shared sync session. Async clients are closed by ``aclose_http_client``."""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+
+async def aclose_http_client() -> None:
+    """Close the async client bound to the running event loop, if any."""
+    entry = _async_clients.pop(id(asyncio.get_running_loop()), None)
+    if entry is not None:
+        await entry[1].aclose()
+
+
+def get_rate_limiter(name: str) -> DeploymentLimiter:
+    """Return the rate limiter for a backend (by default named after its deployment), creating it on first use."""
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(name)
+        if limiter is None:
+            limiter = DeploymentLimiter(
+                name,
+                rate=FOUNDRY_RATE_LIMIT,
+                burst=FOUNDRY_RATE_BURST,
+                initial_concurrency=FOUNDRY_MAX_CONCURRENCY,
+                min_concurrency=FOUNDRY_MIN_CONCURRENCY,
+                max_concurrency=FOUNDRY_MAX_CONCURRENCY,
+                max_retries=FOUNDRY_MAX_RETRIES,
+                retry_base=FOUNDRY_RETRY_BASE,
+                retry_cap=FOUNDRY_RETRY_MAX,
+            )
+            _rate_limiters[name] = limiter
+        return limiter
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Retry, throttle-wait and effective concurrency counters per backend."""
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def get_backend_pools() -> Dict[str, BackendPool]:
+    """Return the backend pool of every logical model, built from ``FOUNDRY_BACKENDS`` on first use."""
+    global _backend_pools
+    if _backend_pools is None:
+        with _backend_pools_lock:
+            if _backend_pools is None:
+                defaults = {
+                    model: {"endpoint": FOUNDRY_ENDPOINT, "deployment": deployment, "api_key": FOUNDRY_API_KEY, "api_version": FOUNDRY_API_VERSION}
+                    for model, deployment in (("gpt", GPT_DEPLOYMENT_NAME), ("flux", FLUX_DEPLOYMENT_NAME))
+                }
+                _backend_pools = {
+                    model: BackendPool(
+                        model,
+                        backends,
+                        strategy=FOUNDRY_ROUTING,
+                        failure_threshold=FOUNDRY_CIRCUIT_FAILURES,
+                        cooldown=FOUNDRY_CIRCUIT_COOLDOWN,
+                    )
+                    for model, backends in load_backends(FOUNDRY_BACKENDS, defaults).items()
+                }
+                for model, pool in _backend_pools.items():
+                    logger.debug("Model %s routes to %s (%s)", model, [b.name for b in pool.backends], pool.strategy)
+    return _backend_pools
+
+
+def get_backend_pool(model: str) -> BackendPool:
+    """Return the pool for ``model``; like before, any model other than 'gpt' falls back to flux."""
+    pools = get_backend_pools()
+    pool = pools.get(model) or (pools.get("flux") if model != "gpt" else None)
+    if pool is None:
+        raise ValueError(f"No Foundry deployment configured for model '{model}'")
+    return pool
+
+
+def backend_stats() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Per-backend health, in-flight requests and smoothed latency for every model."""
+    pools = _backend_pools or {}
+    return {model: pool.stats() for model, pool in pools.items()}
+
+
+def _backend_limiter(backend: Any) -> DeploymentLimiter:
+    return get_rate_limiter(backend.name)
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the shared result cache, or ``None`` when ``IMAGE_CACHE_ENABLED`` is off."""
+    global _result_cache
+    if not IMAGE_CACHE_ENABLED:
+        return None
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_MAX_ENTRIES)
+    return _result_cache
+
 
-    deployment = GPT_DEPLOYMENT_NAME if model == "gpt" else FLUX_DEPLOYMENT_NAME
+def get_cassette() -> Optional[Cassette]:
+    """Return the cassette Foundry uploads go through, or ``None`` when ``FOUNDRY_CASSETTE_MODE`` is off."""
+    global _cassette
+    if FOUNDRY_CASSETTE_MODE == "off":
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                if FOUNDRY_CASSETTE_MODE not in CASSETTE_MODES:
+                    raise ValueError(f"Unknown FOUNDRY_CASSETTE_MODE '{FOUNDRY_CASSETTE_MODE}'. Use one of: {', '.join(CASSETTE_MODES)}")
+                _cassette = Cassette(FOUNDRY_CASSETTE_PATH, FOUNDRY_CASSETTE_MODE, FOUNDRY_CASSETTE_LATENCY)
+    return _cassette
 
-    base_path = f"openai/deployments/{deployment}/images"
-    params = f"?api-version={FOUNDRY_API_VERSION}"
-    edit_url = f"{FOUNDRY_ENDPOINT}{base_path}/edits{params}"
 
-    request_body = {
+def _through_cassette(send: Any, model: str, request_body: Dict[str, Union[str, int]], upload_data: bytes) -> Any:
+    """Route ``send(backend)`` through the cassette (recording or replaying it) when one is configured."""
+    cassette = get_cassette()
+    if cassette is None:
+        return send
+    key = fingerprint(model, request_body, upload_data)
+    return lambda backend: cassette.send(key, backend.edit_url, lambda: send(backend))
+
+
+def _through_cassette_async(send: Any, model: str, request_body: Dict[str, Union[str, int]], upload_data: bytes) -> Any:
+    """Async variant of :func:`_through_cassette`."""
+    cassette = get_cassette()
+    if cassette is None:
+        return send
+    key = fingerprint(model, request_body, upload_data)
+    return lambda backend: cassette.send_async(key, backend.edit_url, lambda: send(backend))
+
+
+def _cache_lookup(cache: ResultCache, key: str, model: str) -> Optional[List[str]]:
+    """Cached outputs for ``key``, linked into the output store so a later cache eviction cannot remove them."""
+    store = get_output_store()
+    paths = cache.get(key, lambda ext, count: store.allocate(model, ext, count))
+    if paths:
+        store.record(paths, model)
+    return paths
+
+
+def get_output_store() -> OutputStore:
+    """Return the shared store that names, indexes and evicts generated images."""
+    global _output_store
+    if _output_store is None:
+        with _output_store_lock:
+            if _output_store is None:
+                _output_store = OutputStore(IMAGE_OUTPUT_DIR, IMAGE_OUTPUT_MAX_BYTES, IMAGE_OUTPUT_MAX_AGE, IMAGE_OUTPUT_GC_INTERVAL)
+    return _output_store
+
+
+def collect_server_stats() -> Dict[str, Any]:
+    """Latency percentiles plus cache, output, coalescing and rate limiter counters."""
+    cache = get_result_cache()
+    return {
+        "latency_seconds": latency.snapshot(),
+        "result_cache": cache.stats() if cache else None,
+        "outputs": get_output_store().stats(),
+        "coalescing": _inflight.stats(),
+        "rate_limits": rate_limit_stats(),
+        "backends": backend_stats(),
+        "transport": transport_stats(),
+        "admission": memory_budget.stats(),
+        "cassette": _cassette.stats() if _cassette else None,
+    }
+
+
+def server_stats_gauges(stats: Dict[str, Any]) -> List[Gauge]:
+    """Numeric counters of :func:`collect_server_stats` as OpenMetrics gauges."""
+    gauges = numeric_gauges("result_cache", stats.get("result_cache") or {})
+    gauges += numeric_gauges("outputs", stats.get("outputs") or {})
+    gauges += numeric_gauges("coalescing", stats.get("coalescing") or {})
+    gauges += numeric_gauges("transport", stats.get("transport") or {})
+    gauges += numeric_gauges("admission", stats.get("admission") or {})
+    gauges += numeric_gauges("cassette", stats.get("cassette") or {})
+    for backend, limiter_stats in (stats.get("rate_limits") or {}).items():
+        gauges += numeric_gauges("rate_limit", limiter_stats, {"backend": backend})
+    for model, backends in (stats.get("backends") or {}).items():
+        for backend, backend_counters in backends.items():
+            gauges += numeric_gauges("backend", backend_counters, {"model": model, "backend": backend})
+    return gauges
+
+
+def _phase_tracer(model: str) -> Any:
+    """httpx trace hook splitting each attempt into upload, Foundry processing and download."""
+    marks: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        if event_name.endswith(".send_request_headers.started"):
+            marks["start"] = now
+        elif event_name.endswith(".send_request_body.complete"):
+            marks["sent"] = now
+            latency.observe("upload", model, now - marks.get("start", now))
+        elif event_name.endswith(".receive_response_headers.complete"):
+            marks["headers"] = now
+            latency.observe("foundry_processing", model, now - marks.get("sent", now))
+        elif event_name.endswith(".receive_response_body.complete"):
+            latency.observe("download", model, now - marks.get("headers", now))
+
+    return trace
+
+
+# An image to upload: a file path, raw bytes / memoryview, or a readable binary buffer.
+ImageSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# Supported output formats: name -> (Pillow format, file extension).
+OUTPUT_FORMATS = {"png": ("PNG", ".png"), "jpeg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+
+_output_executor: Optional[ThreadPoolExecutor] = None
+_output_executor_lock = threading.Lock()
+
+
+def _image_format(data: bytes) -> Optional[str]:
+    """Identify PNG, JPEG or WebP payloads from their leading magic bytes."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _image_upload_name(data: bytes) -> str:
+    return "image" + OUTPUT_FORMATS[_image_format(data) or "png"][1]
+
+
+def _read_image_source(image: ImageSource) -> Tuple[str, bytes]:
+    """Return ``(upload filename, bytes)`` for any supported image source.
+
+    In-memory sources are used as-is (``bytearray``/``memoryview`` are copied
+    once into ``bytes``); only path sources touch the disk.
+    """
+    if isinstance(image, bytes):
+        return _image_upload_name(image), image
+    if isinstance(image, (bytearray, memoryview)):
+        data = bytes(image)
+        return _image_upload_name(data), data
+    if hasattr(image, "read"):
+        data = image.read()
+        name = getattr(image, "name", None)
+        return (Path(name).name if isinstance(name, str) else _image_upload_name(data)), data
+    path = Path(image)
+    return path.name, path.read_bytes()
+
+
+def _describe_image_source(image: ImageSource) -> str:
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return f"<{len(image)} bytes in memory>"
+    if hasattr(image, "read"):
+        return "<buffer>"
+    return str(image)
+
+
+def preprocess_image(
+    data: bytes,
+    max_size: int = IMAGE_PREPROCESS_MAX_SIZE,
+    fmt: str = IMAGE_PREPROCESS_FORMAT,
+    quality: int = IMAGE_PREPROCESS_QUALITY,
+) -> Tuple[str, bytes]:
+    """Shrink an input image before it is uploaded to Foundry.
+
+    JPEGs are decoded in draft mode (DCT scaling) close to the target size,
+    the image is rotated per its EXIF orientation, fitted within
+    ``max_size`` x ``max_size`` and re-encoded as ``fmt`` ('jpeg', 'webp' or
+    'png') without metadata. Images with transparency are written as PNG
+    when ``fmt`` is 'jpeg'. If the result is not smaller than an input that
+    already fits, the original bytes are kept.
+
+    Returns ``(upload filename, bytes)``.
+    """
+    from PIL import Image, ImageOps
+
+    start = time.perf_counter()
+    with Image.open(BytesIO(data)) as src:
+        src_size = src.size
+        if src.format == "JPEG":
+            src.draft("RGB", (max_size, max_size))
+        img = ImageOps.exif_transpose(src)
+        has_alpha = img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info)
+        out_fmt = "png" if has_alpha and fmt in ("jpeg", "jpg") else fmt
+        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        if out_fmt in ("jpeg", "jpg"):
+            img = img.convert("RGB")
+            out_fmt = "jpeg"
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if has_alpha else "RGB")
+
+        buf = BytesIO()
+        save_kwargs: Dict[str, Union[int, bool]] = {"optimize": True} if out_fmt in ("jpeg", "png") else {}
+        if out_fmt in ("jpeg", "webp"):
+            save_kwargs["quality"] = quality
+        # no exif/icc_profile/pnginfo arguments: the encoded output carries no metadata
+        img.save(buf, format=out_fmt.upper(), **save_kwargs)
+        out = buf.getvalue()
+        out_size = img.size
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if len(out) >= len(data) and max(src_size) <= max_size:
+        logger.info("Preprocessing kept original input: %d bytes (%dx%d), re-encode gave %d bytes, %.1f ms", len(data), *src_size, len(out), elapsed_ms)
+        return _image_upload_name(data), data
+    logger.info(
+        "Preprocessed input: %d -> %d bytes (%dx%d -> %dx%d %s) in %.1f ms",
+        len(data), len(out), *src_size, *out_size, out_fmt, elapsed_ms,
+    )
+    return f"image.{'jpg' if out_fmt == 'jpeg' else out_fmt}", out
+
+
+def _preprocess_signature(preprocess: Optional[bool]) -> Optional[Dict[str, Union[str, int]]]:
+    """Return the preprocessing settings that apply to a call, or ``None`` when disabled."""
+    if not (IMAGE_PREPROCESS if preprocess is None else preprocess):
+        return None
+    return {"max_size": IMAGE_PREPROCESS_MAX_SIZE, "format": IMAGE_PREPROCESS_FORMAT, "quality": IMAGE_PREPROCESS_QUALITY}
+
+
+def _edit_request(prompt: str, model: str) -> Tuple[BackendPool, Dict[str, Union[str, int]]]:
+    """Return the backend pool and form fields for a Foundry images/edits call."""
+    pool = get_backend_pool(model)
+
+    request_body: Dict[str, Union[str, int]] = {
         "prompt": prompt,
         "n": 1,
         "size": "1024x1024",
@@ -72,68 +615,546 @@ def call_foundry_edit(image_path: str, prompt: str, model: str = "gpt") -> List[
     else:
         request_body["quality"] = "hd"
 
-    # Use context manager to ensure file is closed promptly
-    with open(image_path, "rb") as img_file:
-        files = {"image": (Path(image_path).name, img_file)}
-        logger.debug("POST %s headers=(Api-Key, x-ms-model-mesh-model-name=%s) data=%s files=%s", edit_url, deployment, {k: request_body[k] for k in request_body}, "<binary image>")
-        resp = requests.post(
-            edit_url,
-            headers={"Api-Key": FOUNDRY_API_KEY, "x-ms-model-mesh-model-name": deployment},
-            data=request_body,
-            files=files,
-        )
+    logger.debug("POST images/edits via %s data=%s files=%s", [b.name for b in pool.backends], request_body, "<binary image>")
+    return pool, request_body
+
+
+def _get_output_executor() -> ThreadPoolExecutor:
+    global _output_executor
+    if _output_executor is None:
+        with _output_executor_lock:
+            if _output_executor is None:
+                _output_executor = ThreadPoolExecutor(max_workers=IMAGE_OUTPUT_WRITERS, thread_name_prefix="mcp-output")
+    return _output_executor
+
+
+def _normalize_output_format(output_format: Optional[str]) -> str:
+    fmt = (output_format or "png").lower()
+    fmt = "jpeg" if fmt == "jpg" else fmt
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output_format '{output_format}'. Use one of: {', '.join(OUTPUT_FORMATS)}")
+    return fmt
+
+
+def _write_output_image(data: bytes, filename: Path, output_format: str, output_quality: Optional[int]) -> str:
+    """Write one generated image, transcoding only when the payload is not already in ``output_format``.
+
+    A lossy target with an explicit ``output_quality`` is always re-encoded.
+    """
+    lossy = output_format in ("jpeg", "webp")
+    # write next to the target and rename so an interrupted write never leaves a partial file
+    part = filename.with_name(f"{filename.name}.{uuid.uuid4().hex[:8]}.part")
+    # created here rather than at allocation so output GC cannot remove it in between
+    filename.parent.mkdir(parents=True, exist_ok=True)
     try:
-        resp.raise_for_status()
-    except Exception as exc:
-        logger.error("Foundry returned an error: %s - response: %s", exc, getattr(resp, "text", "<no body>"))
+        if _image_format(data) == output_format and not (lossy and output_quality is not None):
+            part.write_bytes(data)
+        else:
+            from PIL import Image
+
+            pil_format = OUTPUT_FORMATS[output_format][0]
+            with Image.open(BytesIO(data)) as image:
+                save_kwargs = {"quality": output_quality} if lossy and output_quality is not None else {}
+                if output_format == "jpeg" and image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                image.save(part, format=pil_format, **save_kwargs)
+        os.replace(part, filename)
+    except BaseException:
+        part.unlink(missing_ok=True)
         raise
+    logger.info("Saved generated image: %s", filename)
+    return str(filename)
+
+
+def _save_edit_response(
+    resp_json: Dict,
+    model: str,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+) -> List[str]:
+    """Write the ``b64_json`` entries of a Foundry response into the output store.
 
-    resp_json = resp.json()
+    Payloads already in ``output_format`` are written as-is; several results
+    are written in parallel on the output thread pool.
+    """
     logger.debug("Foundry response JSON keys: %s", list(resp_json.keys()))
 
-    # ensure output directory
-    out_dir = Path.cwd() / "generated"
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    saved_files: List[str] = []
-    for idx, item in enumerate(resp_json.get("data", [])):
-        b64_img = item.get("b64_json")
-        if not b64_img:
-            logger.warning("Response entry %d did not contain 'b64_json', skipping", idx)
-            continue
-        image = Image.open(BytesIO(base64.b64decode(b64_img)))
-        filename = out_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{model}_{idx+1}.png"
-        image.save(filename)
-        logger.info("Saved generated image: %s", filename)
-        saved_files.append(str(filename))
+    images: List[bytes] = []
+    with latency.timed("decode_output", model):
+        for idx, item in enumerate(resp_json.get("data", [])):
+            b64_img = item.get("b64_json")
+            if not b64_img:
+                logger.warning("Response entry %d did not contain 'b64_json', skipping", idx)
+                continue
+            images.append(base64.b64decode(b64_img))
+    return _save_images(images, model, output_format, output_quality)
+
+
+def _save_images(
+    images: List[bytes],
+    model: str,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+) -> List[str]:
+    """Write encoded images into the output store and return their paths."""
+    store = get_output_store()
+    filenames = store.allocate(model, OUTPUT_FORMATS[output_format][1], len(images))
+    jobs = list(zip(images, filenames))
+
+    write_started = time.perf_counter()
+    if len(jobs) > 1:
+        futures = [
+            _get_output_executor().submit(_write_output_image, data, filename, output_format, output_quality)
+            for data, filename in jobs
+        ]
+        # wait for every write before looking at errors so none finishes after cleanup
+        wait(futures)
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            _discard_outputs([f.result() for f in futures if f.exception() is None])
+            raise errors[0]
+        saved_files = [f.result() for f in futures]
+    else:
+        saved_files = [_write_output_image(data, filename, output_format, output_quality) for data, filename in jobs]
+    latency.observe("write_output", model, time.perf_counter() - write_started)
+    store.record(saved_files, model)
 
     if not saved_files:
         logger.warning("No generated images were returned from Foundry.")
 
     return saved_files
 
-def save_base64_to_file(b64_string: str) -> str:
-    """Decode base64 image content and write to a temporary file. Return the file path."""
+
+def _discard_outputs(paths: List[str]) -> None:
+    """Remove generated files that belong to an aborted call."""
+    for path in paths:
+        try:
+            Path(path).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.warning("Could not remove output %s: %s", path, exc)
+    get_output_store().forget(paths)
+    if paths:
+        logger.info("Discarded %d output file(s) of an aborted call", len(paths))
+
+
+async def _save_edit_response_async(
+    resp_json: Dict,
+    model: str,
+    output_format: str,
+    output_quality: Optional[int],
+) -> List[str]:
+    """Run :func:`_save_edit_response` on a thread without leaking files on cancellation."""
+    return await _run_save_async(_save_edit_response, resp_json, model, output_format, output_quality)
+
+
+async def _run_save_async(save_fn: Any, *args: Any) -> List[str]:
+    """Run a function writing output files on a thread; it returns their paths.
+
+    File writes cannot be interrupted. If the caller is cancelled meanwhile,
+    the writes are allowed to finish and their files are removed again.
+    """
+    save = asyncio.ensure_future(asyncio.to_thread(save_fn, *args))
+    try:
+        return await asyncio.shield(save)
+    except asyncio.CancelledError:
+        save.add_done_callback(lambda f: f.cancelled() or f.exception() or _discard_outputs(f.result()))
+        await asyncio.wait({save})
+        raise
+
+
+async def _cache_put_async(cache: ResultCache, key: str, saved: List[str]) -> None:
+    """Store ``saved`` in the result cache on a thread (it links files and updates the index).
+
+    If the caller is cancelled meanwhile, the store is allowed to finish and
+    the outputs are discarded like those of any other aborted call.
+    """
+    put = asyncio.ensure_future(asyncio.to_thread(cache.put, key, saved))
+    try:
+        await asyncio.shield(put)
+    except asyncio.CancelledError:
+        def _discard(f: "asyncio.Future[None]") -> None:
+            if not f.cancelled():
+                f.exception()
+            _discard_outputs(saved)
+
+        put.add_done_callback(_discard)
+        await asyncio.wait({put})
+        raise
+
+
+def _request_timeouts(timeout: Optional[float]) -> Tuple[float, float]:
+    """(connect, read) timeouts; an explicit ``timeout`` also bounds the connect phase."""
+    if not timeout:
+        return FOUNDRY_CONNECT_TIMEOUT, FOUNDRY_READ_TIMEOUT
+    return min(FOUNDRY_CONNECT_TIMEOUT, timeout), timeout
+
+
+def _cache_extra(
+    preprocess_settings: Optional[Dict[str, Union[str, int]]],
+    output_format: str,
+    output_quality: Optional[int],
+) -> Dict[str, Union[str, int, None]]:
+    """Settings besides the request body that change the output files."""
+    extra: Dict[str, Union[str, int, None]] = dict(preprocess_settings or {})
+    if output_format != "png" or output_quality is not None:
+        extra["output_format"] = output_format
+        extra["output_quality"] = output_quality
+    return extra
+
+
+def call_foundry_edit(
+    image: ImageSource,
+    prompt: str,
+    model: str = "gpt",
+    timeout: Optional[float] = None,
+    bypass_cache: bool = False,
+    preprocess: Optional[bool] = None,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+) -> List[str]:
+    """Call the Foundry images/edit endpoint with given image and prompt.
+
+    ``image`` may be a file path, raw bytes (or ``bytearray``/``memoryview``)
+    or a readable binary buffer; in-memory sources are uploaded directly
+    without a temporary file.
+
+    The request goes through the shared pooled session to a backend of the
+    model's pool (see ``FOUNDRY_BACKENDS``) under that backend's rate limiter.
+    429/5xx responses are retried on another healthy backend, or with backoff
+    when there is none. ``timeout``
+    overrides the read timeout (seconds) for each attempt and caps the connect
+    timeout. Results are served from and
+    stored in the result cache; ``bypass_cache`` skips the lookup but still
+    refreshes the cached entry. Identical calls that arrive while one is in
+    flight wait for it instead of calling Foundry again. ``preprocess``
+    (default ``IMAGE_PREPROCESS``) downscales and re-encodes the input with
+    :func:`preprocess_image` first. Results are written as ``output_format``
+    ('png', 'jpeg' or 'webp'), transcoding only when Foundry returned a
+    different format or an ``output_quality`` is requested for a lossy format.
+
+    Returns the list of generated image file paths.
+    """
+    import requests
+
+    logger.info("Preparing request to Foundry for model=%s prompt='%s' image=%s", model, prompt, _describe_image_source(image))
+
+    with latency.timed("edit_total", model):
+        pool, request_body = _edit_request(prompt, model)
+
+        with latency.timed("read_input", model):
+            image_name, image_data = _read_image_source(image)
+        output_format = _normalize_output_format(output_format)
+        preprocess_settings = _preprocess_signature(preprocess)
+        with latency.timed("cache_lookup", model):
+            key = cache_key(image_data, request_body, model, extra=_cache_extra(preprocess_settings, output_format, output_quality))
+            cache = get_result_cache()
+            cached = _cache_lookup(cache, key, model) if cache and not bypass_cache else None
+        if cached is not None:
+            return cached
+
+        def _upstream() -> List[str]:
+            upload_name, upload_data = image_name, image_data
+            if preprocess_settings:
+                with latency.timed("preprocess", model):
+                    upload_name, upload_data = preprocess_image(upload_data)
+
+            files = {"image": (upload_name, upload_data)}
+            foundry_started = time.perf_counter()
+            resp = call_with_failover(
+                pool,
+                _backend_limiter,
+                _through_cassette(
+                    lambda backend: get_http_session().post(
+                        backend.edit_url,
+                        headers=backend.headers,
+                        data=request_body,
+                        files=files,
+                        timeout=_request_timeouts(timeout),
+                    ),
+                    model, request_body, upload_data,
+                ),
+                retry_exceptions=(requests.ConnectionError,),
+            )
+            # the whole round trip including rate limiting and retries
+            latency.observe("foundry_request", model, time.perf_counter() - foundry_started)
+            try:
+                resp.raise_for_status()
+            except Exception as exc:
+                logger.error("Foundry returned an error: %s - response: %s", exc, getattr(resp, "text", "<no body>"))
+                raise
+
+            with latency.timed("parse_response", model):
+                resp_json = resp.json()
+            saved = _save_edit_response(resp_json, model, output_format, output_quality)
+            if cache:
+                cache.put(key, saved)
+            return saved
+
+        return list(_inflight.do(key, _upstream))
+
+
+async def call_foundry_edit_async(
+    image: ImageSource,
+    prompt: str,
+    model: str = "gpt",
+    timeout: Optional[float] = None,
+    bypass_cache: bool = False,
+    preprocess: Optional[bool] = None,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+) -> List[str]:
+    """Async variant of :func:`call_foundry_edit` using the pooled ``httpx`` client.
+
+    Cancelling the call aborts the upload and removes any output files it had
+    already written, so a caller can enforce a deadline with ``asyncio.wait_for``.
+    """
+    logger.info("Preparing async request to Foundry for model=%s prompt='%s' image=%s", model, prompt, _describe_image_source(image))
+
+    with latency.timed("edit_total", model):
+        pool, request_body = _edit_request(prompt, model)
+
+        with latency.timed("read_input", model):
+            # a path or buffer is read (and bytes hashed below) on a worker thread, not the event loop
+            image_name, image_data = await asyncio.to_thread(_read_image_source, image)
+        output_format = _normalize_output_format(output_format)
+        preprocess_settings = _preprocess_signature(preprocess)
+        with latency.timed("cache_lookup", model):
+            key = await asyncio.to_thread(
+                cache_key, image_data, request_body, model, _cache_extra(preprocess_settings, output_format, output_quality)
+            )
+            cache = get_result_cache()
+            cached = await asyncio.to_thread(_cache_lookup, cache, key, model) if cache and not bypass_cache else None
+        if cached is not None:
+            return cached
+
+        async def _upstream() -> List[str]:
+            upload_name, upload_data = image_name, image_data
+            if preprocess_settings:
+                # CPU-bound decode/resize/encode: keep it off the event loop
+                with latency.timed("preprocess", model):
+                    upload_name, upload_data = await asyncio.to_thread(preprocess_image, upload_data)
+
+            resp_json = await _post_edit_async(pool, request_body, model, upload_name, upload_data, timeout)
+            # decoding and file writes block; run them off the event loop
+            saved = await _save_edit_response_async(resp_json, model, output_format, output_quality)
+            if cache:
+                await _cache_put_async(cache, key, saved)
+            return saved
+
+        return list(await _inflight.do_async(key, _upstream))
+
+
+async def _post_edit_async(
+    pool: BackendPool,
+    request_body: Dict[str, Union[str, int]],
+    model: str,
+    upload_name: str,
+    upload_data: bytes,
+    timeout: Optional[float],
+) -> Dict:
+    """POST one image to images/edits through the backend pool and return the parsed JSON."""
+    files = {"image": (upload_name, upload_data)}
+    connect_timeout, read_timeout = _request_timeouts(timeout)
+    request_timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    trace = _phase_tracer(model)
+    foundry_started = time.perf_counter()
+    resp = await call_with_failover_async(
+        pool,
+        _backend_limiter,
+        _through_cassette_async(
+            lambda backend: get_async_http_client().post(
+                backend.edit_url,
+                headers=backend.headers,
+                data=request_body,
+                files=files,
+                timeout=request_timeout,
+                extensions={"trace": trace},
+            ),
+            model, request_body, upload_data,
+        ),
+        retry_exceptions=(httpx.ConnectError, httpx.ConnectTimeout),
+    )
+    latency.observe("foundry_request", model, time.perf_counter() - foundry_started)
+    try:
+        resp.raise_for_status()
+    except Exception as exc:
+        logger.error("Foundry returned an error: %s - response: %s", exc, resp.text)
+        raise
+
+    with latency.timed("parse_response", model):
+        return resp.json()
+
+
+async def call_foundry_edit_tiled_async(
+    image: ImageSource,
+    prompt: str,
+    model: str = "gpt",
+    timeout: Optional[float] = None,
+    bypass_cache: bool = False,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+    tile_overlap: Optional[int] = None,
+) -> List[str]:
+    """Edit a large image tile by tile and blend the edited tiles back together.
+
+    The input is cut into overlapping ``IMAGE_TILE_SIZE`` tiles (see
+    :mod:`tiling`); up to ``IMAGE_TILE_CONCURRENCY`` of them are edited at
+    once with the same prompt, and each tile is encoded right before its
+    upload and blended in as soon as its result arrives, so the CPU work
+    overlaps the requests. The stitched image keeps the input's resolution.
+    An input that fits in one tile is edited as usual by
+    :func:`call_foundry_edit_async`.
+
+    If any tile fails the remaining tiles are cancelled and the error is
+    raised; nothing is written. Results are cached like untiled calls.
+    """
+    import tiling
+
+    overlap = IMAGE_TILE_OVERLAP if tile_overlap is None else tile_overlap
+    logger.info("Preparing tiled request to Foundry for model=%s prompt='%s' image=%s", model, prompt, _describe_image_source(image))
+
+    with latency.timed("edit_total", model):
+        pool, request_body = _edit_request(prompt, model)
+
+        with latency.timed("read_input", model):
+            # a path or buffer is read (and bytes hashed below) on a worker thread, not the event loop
+            image_name, image_data = await asyncio.to_thread(_read_image_source, image)
+        output_format = _normalize_output_format(output_format)
+        with latency.timed("tile_split", model):
+            # only the header: the pixels are decoded once the tile count is accepted and memory reserved
+            width, height = await asyncio.to_thread(tiling.image_size, image_data)
+            tiles = tiling.plan_tiles(width, height, IMAGE_TILE_SIZE, overlap)
+        if len(tiles) == 1:
+            return await call_foundry_edit_async(
+                image_data, prompt, model=model, timeout=timeout, bypass_cache=bypass_cache,
+                preprocess=False, output_format=output_format, output_quality=output_quality,
+            )
+        if len(tiles) > IMAGE_TILE_MAX:
+            raise ValueError(f"Image of {width}x{height} needs {len(tiles)} tiles, more than IMAGE_TILE_MAX={IMAGE_TILE_MAX}")
+
+        extra = _cache_extra(None, output_format, output_quality)
+        extra.update({"tile_size": IMAGE_TILE_SIZE, "tile_overlap": overlap})
+        with latency.timed("cache_lookup", model):
+            key = await asyncio.to_thread(cache_key, image_data, request_body, model, extra)
+            cache = get_result_cache()
+            cached = await asyncio.to_thread(_cache_lookup, cache, key, model) if cache and not bypass_cache else None
+        if cached is not None:
+            return cached
+
+        async def _upstream() -> List[str]:
+            # the blend buffers (float32 RGB + weight) and the decoded source, on top of the
+            # reservation the caller holds for the input
+            async with memory_budget.extend(width * height * 19):
+                return await _edit_tiles()
+
+        async def _edit_tiles() -> List[str]:
+            with latency.timed("tile_split", model):
+                source = await asyncio.to_thread(tiling.load_image, image_data)
+            blender = tiling.TileBlender(width, height)
+            semaphore = asyncio.Semaphore(max(1, IMAGE_TILE_CONCURRENCY))
+
+            async def _edit_tile(tile: "tiling.Tile") -> None:
+                # encoding is not held to the request limit, so it overlaps uploads in flight
+                with latency.timed("tile_split", model):
+                    upload = await asyncio.to_thread(tiling.encode_tile, source, tile)
+                async with semaphore:
+                    resp_json = await _post_edit_async(pool, request_body, model, "tile.png", upload, timeout)
+                edited = next((item["b64_json"] for item in resp_json.get("data", []) if item.get("b64_json")), None)
+                if edited is None:
+                    raise RuntimeError(f"Foundry returned no image for the tile at ({tile.x}, {tile.y})")
+                with latency.timed("tile_blend", model):
+                    await asyncio.to_thread(blender.add, base64.b64decode(edited), tile)
+
+            logger.info("Editing %dx%d image as %d tiles (overlap %d, concurrency %d)",
+                        source.width, source.height, len(tiles), overlap, IMAGE_TILE_CONCURRENCY)
+            tasks = [asyncio.ensure_future(_edit_tile(tile)) for tile in tiles]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # on the first failure (or cancellation) stop the tiles still in flight
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            with latency.timed("tile_blend", model):
+                stitched = await asyncio.to_thread(blender.encode)
+            saved = await _run_save_async(_save_images, [stitched], model, output_format, output_quality)
+            if cache:
+                await _cache_put_async(cache, key, saved)
+            return saved
+
+        return list(await _inflight.do_async(key, _upstream))
+
+
+def estimate_request_bytes(input_bytes: int, base64_chars: int = 0, response: bool = True) -> int:
+    """Estimated peak memory of one request.
+
+    Counts the base64 string, the decoded input and its upload body, plus
+    ``IMAGE_ADMISSION_RESPONSE_BYTES`` when the request also receives and
+    writes a Foundry response.
+    """
+    return base64_chars + 2 * input_bytes + (IMAGE_ADMISSION_RESPONSE_BYTES if response else 0)
+
+
+def input_size(image_base64: Optional[str] = None, image_path: Optional[Union[str, Path]] = None) -> int:
+    """Size in bytes of an input without decoding it; refuses inputs over ``IMAGE_MAX_INPUT_BYTES``."""
+    if image_base64:
+        # a data URL header is short enough not to matter
+        size = len(image_base64) * 3 // 4
+    elif image_path:
+        try:
+            size = os.path.getsize(image_path)
+        except OSError:
+            # a missing file is reported by the caller with its usual error
+            return 0
+    else:
+        return 0
+    memory_budget.check_size(size, IMAGE_MAX_INPUT_BYTES)
+    return size
+
+
+@asynccontextmanager
+async def admit_request(
+    model: str,
+    image_base64: Optional[str] = None,
+    image_path: Optional[Union[str, Path]] = None,
+    response: bool = True,
+) -> AsyncIterator[None]:
+    """Hold the request's estimated memory in ``memory_budget`` for the ``async with`` body.
+
+    Oversized inputs are refused before anything is decoded. When the budget
+    is full the request waits or is rejected according to ``IMAGE_ADMISSION_POLICY``.
+    """
+    size = input_size(image_base64, image_path)
+    started = time.perf_counter()
+    async with memory_budget.reserve(estimate_request_bytes(size, len(image_base64 or ""), response)):
+        latency.observe("admission_wait", model, time.perf_counter() - started)
+        yield
+
+
+def decode_base64_image(b64_string: str) -> bytes:
+    """Decode base64 image content (raw or a data URL) into bytes."""
     header_sep = b64_string.find(",")
     if header_sep != -1:
         # remove data url prefix
         b64_string = b64_string[header_sep + 1 :]
-
-    data = base64.b64decode(b64_string)
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
-    tmp.write(data)
-    tmp.flush()
-    tmp.close()
-    logger.info("Wrote temporary image file: %s", tmp.name)
-    return tmp.name
+    return base64.b64decode(b64_string)
 
 
 @mcp.tool()
-def image2image(
+async def image2image(
     model: str = "gpt",
     prompt: Optional[str] = None,
     image_base64: Optional[str] = None,
     image_path: Optional[str] = None,
+    bypass_cache: bool = False,
+    preprocess: Optional[bool] = None,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+    tiled: bool = False,
+    tile_overlap: Optional[int] = None,
 ) -> List[str]:
     """MCP tool that converts an image using gpt or flux and the desired prompt.
 
@@ -142,6 +1163,13 @@ def image2image(
       - prompt: text prompt (default pirate style)
       - image_base64: base64-encoded image data OR
       - image_path: server-local path to an image file
+      - bypass_cache: skip the result cache lookup and call Foundry
+      - preprocess: downscale/re-encode the input before upload (default from IMAGE_PREPROCESS)
+      - output_format: 'png' (default), 'jpeg' or 'webp'
+      - output_quality: JPEG/WebP quality used when transcoding
+      - tiled: edit a large image as overlapping 1024px tiles and blend them back,
+        keeping its full resolution (preprocess is ignored)
+      - tile_overlap: overlap between tiles in pixels (default from IMAGE_TILE_OVERLAP)
 
     Returns a list of generated image file paths.
     """
@@ -150,37 +1178,215 @@ def image2image(
 
     logger.info("image2image called with model=%s prompt='%s' image_base64=%s image_path=%s", model, prompt, bool(image_base64), image_path)
 
-    tmp_created = False
-    img_path: Optional[str] = None
-
-    if image_base64:
-        img_path = save_base64_to_file(image_base64)
-        tmp_created = True
-    elif image_path:
-        candidate = Path(os.path.expanduser(image_path))
-        if not candidate.is_absolute():
-            candidate = Path.cwd() / candidate
-        if not candidate.is_file():
-            logger.error("image_path not found: %s", candidate)
-            raise FileNotFoundError(f"image_path not found: {candidate}")
-        img_path = str(candidate)
-    else:
+    if not image_base64 and not image_path:
         logger.error("No image provided to image2image tool")
         raise ValueError("No image provided. Please provide 'image_base64' or 'image_path'.")
 
-    try:
-        logger.debug("Calling Foundry edit with image=%s", img_path)
-        saved = call_foundry_edit(img_path, prompt, model=model)
-        logger.info("image2image completed, %d files saved", len(saved))
-        return saved
-    finally:
-        if tmp_created and img_path and Path(img_path).exists():
+    # refuse oversized inputs before decoding and wait for room in the memory budget
+    async with admit_request(model, image_base64, None if image_base64 else _resolve_image_path(image_path)):
+        image: ImageSource
+        if image_base64:
+            with latency.timed("decode_input", model):
+                image = decode_base64_image(image_base64)
+        else:
+            candidate = _resolve_image_path(image_path)
+            if not candidate.is_file():
+                logger.error("image_path not found: %s", candidate)
+                raise FileNotFoundError(f"image_path not found: {candidate}")
+            image = str(candidate)
+
+        logger.debug("Calling Foundry edit with image=%s", _describe_image_source(image))
+        if tiled:
+            saved = await call_foundry_edit_tiled_async(
+                image,
+                prompt,
+                model=model,
+                bypass_cache=bypass_cache,
+                output_format=output_format,
+                output_quality=output_quality,
+                tile_overlap=tile_overlap,
+            )
+        else:
+            saved = await call_foundry_edit_async(
+                image,
+                prompt,
+                model=model,
+                bypass_cache=bypass_cache,
+                preprocess=preprocess,
+                output_format=output_format,
+                output_quality=output_quality,
+            )
+    logger.info("image2image completed, %d files saved", len(saved))
+    return saved
+
+
+def _resolve_image_path(image_path: str) -> Path:
+    candidate = Path(os.path.expanduser(image_path))
+    if not candidate.is_absolute():
+        candidate = Path.cwd() / candidate
+    return candidate
+
+
+# File suffixes picked up from image_dir by image2image_batch.
+_BATCH_IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+
+
+def _batch_items(
+    items: Optional[List[Dict[str, Any]]],
+    image_dir: Optional[str],
+    pattern: str,
+    prompt: Optional[str],
+    model: str,
+) -> List[Dict[str, Any]]:
+    """Expand explicit items and/or a directory glob into normalized batch entries."""
+    entries: List[Dict[str, Any]] = []
+    for item in items or []:
+        entries.append({
+            "image_path": item.get("image_path"),
+            "image_base64": item.get("image_base64"),
+            "prompt": item.get("prompt") or prompt,
+            "model": (item.get("model") or model).lower(),
+        })
+    if image_dir is not None:
+        base = _resolve_image_path(image_dir)
+        if not base.is_dir():
+            raise FileNotFoundError(f"image_dir not found: {base}")
+        for path in sorted(p for p in base.glob(pattern) if p.is_file() and p.suffix.lower() in _BATCH_IMAGE_SUFFIXES):
+            entries.append({"image_path": str(path), "image_base64": None, "prompt": prompt, "model": model})
+    if not entries:
+        raise ValueError("No batch items. Provide 'items' and/or 'image_dir' (with an optional glob 'pattern').")
+    if len(entries) > IMAGE_BATCH_MAX_ITEMS:
+        raise ValueError(f"Batch has {len(entries)} items; the limit is {IMAGE_BATCH_MAX_ITEMS} (IMAGE_BATCH_MAX_ITEMS).")
+    return entries
+
+
+@mcp.tool()
+async def image2image_batch(
+    items: Optional[List[Dict[str, Any]]] = None,
+    image_dir: Optional[str] = None,
+    pattern: str = "*",
+    prompt: Optional[str] = None,
+    model: str = "gpt",
+    max_concurrency: Optional[int] = None,
+    bypass_cache: bool = False,
+    preprocess: Optional[bool] = None,
+    output_format: str = "png",
+    output_quality: Optional[int] = None,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """Run image2image over many images and/or prompts with bounded concurrency.
+
+    Parameters:
+      - items: list of objects with 'image_path' or 'image_base64', and optional
+        'prompt' and 'model' (one image with several prompts is just several items)
+      - image_dir: server-local directory whose image files matching 'pattern' are added
+      - pattern: glob relative to image_dir (default '*', use '**/*.jpg' to recurse)
+      - prompt / model: defaults for items that do not set their own
+      - max_concurrency: Foundry calls in flight at once (default IMAGE_BATCH_CONCURRENCY)
+      - bypass_cache, preprocess, output_format, output_quality: as for image2image
+
+    Each item is reported through progress notifications and log messages as
+    soon as it finishes. A failing item does not stop the rest of the batch.
+
+    Returns a summary with per-item 'status', 'result_paths' and 'error', in input order.
+    """
+    model = (model or "gpt").lower()
+    prompt = prompt or "update this image to be set in a pirate era"
+    output_format = _normalize_output_format(output_format)
+    entries = _batch_items(items, image_dir, pattern, prompt, model)
+    limit = max(1, max_concurrency or IMAGE_BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(limit)
+    total = len(entries)
+
+    logger.info("image2image_batch called with %d items, concurrency=%d", total, limit)
+
+    async def _run(index: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "index": index,
+            "image": entry["image_path"] or "<base64>",
+            "prompt": entry["prompt"],
+            "model": entry["model"],
+            "status": "failed",
+            "result_paths": [],
+            "error": None,
+        }
+        async with semaphore:
             try:
-                Path(img_path).unlink()
-                logger.debug("Removed temporary file: %s", img_path)
-            except Exception:
-                logger.exception("Failed to remove temporary image file: %s", img_path)
+                path = _resolve_image_path(entry["image_path"]) if entry["image_path"] and not entry["image_base64"] else None
+                async with admit_request(entry["model"], entry["image_base64"], path):
+                    if entry["image_base64"]:
+                        with latency.timed("decode_input", entry["model"]):
+                            image: ImageSource = decode_base64_image(entry["image_base64"])
+                    elif entry["image_path"]:
+                        candidate = _resolve_image_path(entry["image_path"])
+                        if not candidate.is_file():
+                            raise FileNotFoundError(f"image_path not found: {candidate}")
+                        image = str(candidate)
+                    else:
+                        raise ValueError("No image provided. Please provide 'image_base64' or 'image_path'.")
+                    result["result_paths"] = await call_foundry_edit_async(
+                        image,
+                        entry["prompt"],
+                        model=entry["model"],
+                        bypass_cache=bypass_cache,
+                        preprocess=preprocess,
+                        output_format=output_format,
+                        output_quality=output_quality,
+                    )
+                result["status"] = "completed"
+            except Exception as exc:
+                logger.warning("image2image_batch item %d failed: %s", index, exc)
+                result["error"] = str(exc)
+        return result
+
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    done = 0
+    for next_done in asyncio.as_completed([_run(i, entry) for i, entry in enumerate(entries)]):
+        result = await next_done
+        results[result["index"]] = result
+        done += 1
+        if ctx is not None:
+            message = json.dumps(result)
+            await ctx.report_progress(done, total, message=message)
+            await ctx.info(message)
+
+    succeeded = sum(1 for r in results if r and r["status"] == "completed")
+    logger.info("image2image_batch finished: %d/%d succeeded", succeeded, total)
+    return {"total": total, "succeeded": succeeded, "failed": total - succeeded, "results": results}
+
+
+@mcp.tool()
+def server_stats(include_openmetrics: bool = False) -> Dict[str, Any]:
+    """Report latency percentiles and internal counters of this server.
+
+    'latency_seconds' maps each request phase (decode_input, read_input,
+    cache_lookup, preprocess, upload, foundry_processing, download,
+    foundry_request, parse_response, decode_output, write_output, edit_total)
+    to per-model count, mean, p50, p95, p99 and max in seconds. Result cache,
+    generated output usage ('outputs'), request coalescing, per-backend rate
+    limiter counters and backend health
+    ('backends': circuit state, in-flight requests, smoothed latency) are
+    included as well. With include_openmetrics the same numbers are also returned as
+    OpenMetrics text under 'openmetrics'.
+    """
+    stats = collect_server_stats()
+    if include_openmetrics:
+        stats["openmetrics"] = latency.openmetrics(gauges=server_stats_gauges(stats))
+    return stats
+
+
+@mcp.tool()
+def list_outputs(model: Optional[str] = None, since: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+    """List generated images, newest first, from the output index.
+
+    Optionally filter by model and an ISO-8601 local ``since`` time. Each
+    entry has 'path', 'model', 'size' in bytes and 'created'. Files evicted
+    by the output quota are no longer listed.
+    """
+    since_ts = datetime.fromisoformat(since).timestamp() if since else None
+    return get_output_store().list_outputs(model=(model or None) and model.lower(), since=since_ts, limit=limit)
 
 
 if __name__ == '__main__':
-    mcp.run()    
\ No newline at end of file
+    # stdio by default; --transport streamable-http serves many clients from one process
+    serve(mcp, max_body_bytes=MAX_REQUEST_BODY_BYTES)
\ No newline at end of file
@@ -1,6 +1,6 @@
 """Image conversion tools for MCP (local shim compatible).
 
-This module provides two small utilities exposed as MCP tools:
+This module provides small utilities exposed as MCP tools:
 
 - `local_image_to_base64(image_path: str) -> str`:
     Convert a local image file to a base64-encoded data URL string.
@@ -8,6 +8,11 @@ This module provides two small utilities exposed as MCP tools:
 - `base64_to_image(base64_string: str, output_path: str) -> str`:
     Decode a base64 data URL or raw base64 string and write it to disk.
 
+- `convert_images_bulk(source: str, output_dir: str, ...) -> dict`:
+    Convert a whole directory or glob of images to JPEG (or base64 files)
+    on a process pool, skipping files that are already up to date. Also
+    available from the command line as the `bulk` subcommand.
+
 Parameters and conventions used by the tool functions
 - image_path: path to an existing image file. Can be relative or absolute.
     If relative, it is resolved against the current working directory.
@@ -29,16 +34,23 @@ Errors
 """
 
 import os
+import asyncio
 import base64
+import json
 import logging
+import uuid
 from pathlib import Path
-from typing import Optional
-import io
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from bulk_convert import FORMATS, available_cores, convert_all, encode_jpeg, mime_type, plan_conversion
+from transport import add_transport_arguments, run as run_server
 
 # FastMCP shim for local use if real package is not installed
 try:
-    from mcp.server.fastmcp import FastMCP
+    from mcp.server.fastmcp import Context, FastMCP
 except Exception:
+    Context = Any  # type: ignore[misc,assignment]
+
     class FastMCP:
         def __init__(self, name: str):
             self.name = name
@@ -48,7 +60,7 @@ except Exception:
                 return fn
             return decorator
 
-        def run(self):
+        def run(self, transport: str = "stdio", mount_path: Optional[str] = None):
             raise NotImplementedError("FastMCP.run() is not implemented in the local shim")
 
 
@@ -59,31 +71,103 @@ logger = logging.getLogger("image.tools")
 mcp = FastMCP("ImageTools")
 
 
-def _read_image_as_base64(path: Path) -> str:
+# Block sizes for the streaming codec. The encode block is a multiple of 3
+# bytes and the decode block a multiple of 4 characters so that every block
+# maps onto whole base64 quanta and the output matches a one-shot call.
+_ENCODE_BLOCK = 3 * 256 * 1024
+_DECODE_BLOCK = 4 * 256 * 1024
+
+# Every byte that base64.b64decode would silently discard (anything outside
+# the standard alphabet and "=").
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/="
+_B64_DISCARD = bytes(b for b in range(256) if b not in _B64_ALPHABET)
+
+
+def _iter_base64_blocks(path: Path) -> Iterator[bytes]:
+    """Yield the base64 encoding of ``path`` in fixed-size blocks."""
+    buf = bytearray(_ENCODE_BLOCK)
+    view = memoryview(buf)
     with path.open("rb") as f:
-        data = f.read()
-    b64 = base64.b64encode(data).decode("utf-8")
-    suffix = path.suffix.lower()
-    if suffix in (".jpg", ".jpeg"):
-        mime = "image/jpeg"
-    elif suffix == ".png":
-        mime = "image/png"
-    else:
-        mime = "application/octet-stream"
-    return f"data:{mime};base64,{b64}"
+        while True:
+            # fill a whole block so only the final one can carry padding
+            filled = 0
+            while filled < _ENCODE_BLOCK:
+                n = f.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+            if not filled:
+                return
+            yield base64.b64encode(view[:filled])
+            if filled < _ENCODE_BLOCK:
+                return
 
 
-def _save_base64_as_image(b64_string: str, out_path: Path) -> Path:
-    header_sep = b64_string.find(",")
-    if header_sep != -1:
-        b64_string = b64_string[header_sep + 1 :]
-    data = base64.b64decode(b64_string)
+def _read_image_as_base64(path: Path) -> str:
+    header = f"data:{mime_type(path)};base64,".encode("ascii")
+    size = path.stat().st_size
+    # Preallocate the exact output so the payload is built without intermediate copies.
+    out = bytearray(len(header) + 4 * ((size + 2) // 3))
+    out[: len(header)] = header
+    pos = len(header)
+    for block in _iter_base64_blocks(path):
+        out[pos : pos + len(block)] = block
+        pos += len(block)
+    # The file may have changed size between stat() and the last read.
+    del out[pos:]
+    return out.decode("ascii")
+
+
+def _iter_decoded_blocks(chunks: Iterable[str]) -> Iterator[bytes]:
+    """Decode an iterable of base64 text chunks block by block.
+
+    Produces exactly what ``base64.b64decode`` returns for the concatenated
+    input: ignored characters are dropped first, and everything from the first
+    padding character on is decoded in one final call.
+    """
+    carry = b""
+    padded = False
+    for chunk in chunks:
+        data = carry + chunk.encode("ascii").translate(None, _B64_DISCARD)
+        if padded or b"=" in data:
+            padded = True
+            carry = data
+            continue
+        whole = len(data) - len(data) % 4
+        if whole:
+            yield base64.b64decode(data[:whole])
+        carry = data[whole:]
+    if carry:
+        yield base64.b64decode(carry)
+
+
+def _iter_base64_payload(b64_string: str) -> Iterator[str]:
+    """Yield the payload of a data URL or raw base64 string in fixed-size slices."""
+    start = b64_string.find(",") + 1
+    for offset in range(start, len(b64_string), _DECODE_BLOCK):
+        yield b64_string[offset : offset + _DECODE_BLOCK]
+
+
+def _write_decoded(chunks: Iterable[str], out_path: Path) -> Path:
+    """Stream decoded base64 chunks into ``out_path`` atomically."""
     out_path.parent.mkdir(parents=True, exist_ok=True)
-    with out_path.open("wb") as f:
-        f.write(data)
+    # unique per call: two decodes to the same output must not share a temp file
+    part = out_path.with_name(f"{out_path.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with part.open("wb") as f:
+            for block in _iter_decoded_blocks(chunks):
+                f.write(block)
+        os.replace(part, out_path)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
     return out_path
 
 
+def _save_base64_as_image(b64_string: str, out_path: Path) -> Path:
+    return _write_decoded(_iter_base64_payload(b64_string), out_path)
+
+
 @mcp.tool()
 def convert_local_image_to_base64(image_path: str) -> str:
     """Convert a local image file to a base64 data URL string.
@@ -144,23 +228,7 @@ def convert_local_image_to_bytes(image_path: str, convert_to_jpg: bool = True) -
         return candidate.read_bytes()
 
     # Conversion requested: use Pillow to open and re-encode as JPEG
-    try:
-        from PIL import Image
-    except Exception as exc:
-        raise RuntimeError("Pillow (PIL) is required to convert images to JPEG. Install with 'pip install Pillow'") from exc
-
-    with Image.open(candidate) as img:
-        # Convert to RGB for JPEG if image has alpha or palette
-        if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
-            bg = Image.new("RGB", img.size, (255, 255, 255))
-            bg.paste(img, mask=img.split()[-1])
-            img = bg
-        else:
-            img = img.convert("RGB")
-
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG", quality=95)
-        return buf.getvalue()
+    return encode_jpeg(candidate, quality=95)
 
 
 @mcp.tool()
@@ -194,8 +262,76 @@ def base64_to_image(base64_string: str, output_path: str) -> str:
         return str(saved)
 
 
+def _resolve(path: str) -> Path:
+    candidate = Path(os.path.expanduser(path))
+    return candidate if candidate.is_absolute() else Path.cwd() / candidate
+
+
+@mcp.tool()
+async def convert_images_bulk(
+    source: str,
+    output_dir: str = "converted",
+    pattern: str = "**/*",
+    to: str = "jpg",
+    quality: int = 95,
+    workers: Optional[int] = None,
+    force: bool = False,
+    ctx: Optional[Context] = None,
+) -> Dict[str, Any]:
+    """Convert every image in a directory (or matching a glob) in parallel.
+
+    Parameters
+    - source (str): A directory, searched with `pattern`, or a glob such as
+      'photos/**/*.png'. Relative paths resolve against the current working directory.
+    - output_dir (str): Where outputs are written, mirroring the source layout
+      (default 'converted').
+    - pattern (str): Glob used when `source` is a directory (default '**/*').
+    - to (str): 'jpg' (re-encode like convert_local_image_to_bytes) or 'base64'
+      (a '.b64' data URL file per image).
+    - quality (int): JPEG quality (default 95).
+    - workers (int): Worker processes (default: one per available core).
+    - force (bool): Convert even files that are up to date.
+
+    Each file is reported through a progress notification as soon as it is
+    done. Files whose output exists and whose source is unchanged since the
+    last run (same size and mtime, or same content hash) are skipped.
+
+    Returns
+    - dict: counts per status and the per-file results ('path', 'status',
+      'bytes', 'output', 'error') in completion order.
+
+    Raises
+    - ValueError: for an unknown `to` format.
+    - FileNotFoundError: if `source` does not exist.
+    """
+    if not source:
+        raise ValueError("source must be provided")
+    out_dir = _resolve(output_dir)
+    items = await asyncio.to_thread(plan_conversion, str(_resolve(source)), out_dir, pattern, to)
+    logger.info("Bulk converting %d files from %s to %s", len(items), source, out_dir)
+
+    results = []
+    stream = convert_all(items, out_dir, to=to, quality=quality, workers=workers, force=force)
+    try:
+        while True:
+            # each step blocks until the next file is done; keep it off the event loop
+            result = await asyncio.to_thread(next, stream, None)
+            if result is None:
+                break
+            results.append(result)
+            if ctx is not None:
+                await ctx.report_progress(len(results), len(items), message=json.dumps(result))
+    finally:
+        await asyncio.to_thread(stream.close)
+
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("converted", "skipped", "failed")}
+    logger.info("Bulk conversion finished: %s", counts)
+    return {"total": len(items), **counts, "output_dir": str(out_dir), "results": results}
+
+
 if __name__ == "__main__":
     import argparse
+    import sys
 
     parser = argparse.ArgumentParser(description="Image tools: convert image <-> base64")
     sub = parser.add_subparsers(dest="cmd")
@@ -204,13 +340,56 @@ if __name__ == "__main__":
     p1.add_argument("image_path")
 
     p2 = sub.add_parser("from-base64", help="Convert base64 to image")
-    p2.add_argument("base64_string")
+    p2.add_argument("base64_string", help="Base64 payload or data URL; use '-' to stream it from stdin")
     p2.add_argument("output_path")
 
+    p3 = sub.add_parser("bulk", help="Convert a directory or glob of images in parallel")
+    p3.add_argument("source", help="Directory (searched with --pattern) or a glob such as 'photos/**/*.png'")
+    p3.add_argument("-o", "--output-dir", default="converted")
+    p3.add_argument("--pattern", default="**/*", help="Glob used when source is a directory")
+    p3.add_argument("--to", choices=sorted(FORMATS), default="jpg")
+    p3.add_argument("--quality", type=int, default=95)
+    p3.add_argument("--workers", type=int, default=None, help=f"Worker processes (default: {available_cores()})")
+    p3.add_argument("--force", action="store_true", help="Convert files that are already up to date")
+
+    p4 = sub.add_parser("serve", help="Run the MCP server (stdio, streamable-http or sse)")
+    add_transport_arguments(p4)
+
     args = parser.parse_args()
-    if args.cmd == "to-base64":
-        print(local_image_to_base64(args.image_path))
+    if args.cmd == "serve":
+        run_server(mcp, args.transport, args.host, args.port)
+    elif args.cmd == "to-base64":
+        # stream the data URL to stdout in blocks instead of building it in memory
+        image = Path(args.image_path)
+        if not image.is_file():
+            raise FileNotFoundError(f"image_path not found: {image}")
+        out = sys.stdout.buffer
+        out.write(f"data:{mime_type(image)};base64,".encode("ascii"))
+        for block in _iter_base64_blocks(image):
+            out.write(block)
+        out.write(b"\n")
     elif args.cmd == "from-base64":
-        print(base64_to_image(args.base64_string, args.output_path))
+        if args.base64_string == "-":
+            def _stdin_payload() -> Iterator[str]:
+                first = sys.stdin.read(_DECODE_BLOCK)
+                yield first[first.find(",") + 1 :]
+                yield from iter(lambda: sys.stdin.read(_DECODE_BLOCK), "")
+
+            out = Path(args.output_path)
+            if not out.is_absolute():
+                out = Path.cwd() / out
+            print(_write_decoded(_stdin_payload(), out))
+        else:
+            print(base64_to_image(args.base64_string, args.output_path))
+    elif args.cmd == "bulk":
+        # one JSON line per file as it finishes, a summary on stderr
+        out_dir = _resolve(args.output_dir)
+        items = plan_conversion(str(_resolve(args.source)), out_dir, args.pattern, args.to)
+        counts = {"converted": 0, "skipped": 0, "failed": 0}
+        for result in convert_all(items, out_dir, to=args.to, quality=args.quality, workers=args.workers, force=args.force):
+            counts[result["status"]] += 1
+            print(json.dumps(result), flush=True)
+        print(f"{len(items)} files: " + ", ".join(f"{n} {status}" for status, n in counts.items()), file=sys.stderr)
+        sys.exit(1 if counts["failed"] else 0)
     else:
         parser.print_help()
@@ -0,0 +1,147 @@
+"""Latency histograms for the image2image servers.
+
+Every phase of a request (input decode, upload, Foundry processing,
+response parse, output writes, queue wait, ...) is recorded per model in a
+``LatencyHistogram``. Each histogram keeps:
+
+- cumulative buckets, count and sum for the OpenMetrics text format, and
+- a window of the most recent samples from which p50/p95/p99 are computed.
+
+Use ``LatencyMetrics.timed(phase, model)`` around a block, or ``observe``
+when the duration is already known.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Bucket upper bounds in seconds, from fast local work to slow Foundry calls.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# (metric name, labels, value) for gauges exported next to the histograms.
+Gauge = Tuple[str, Dict[str, str], float]
+
+
+class LatencyHistogram:
+    """Bucketed latency histogram plus a window of recent samples for quantiles."""
+
+    def __init__(self, window: int = 2048):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        idx = 0
+        while idx < len(BUCKETS) and seconds > BUCKETS[idx]:
+            idx += 1
+        self.counts[idx] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean, max and nearest-rank quantiles of the recent samples."""
+        ordered = sorted(self.recent)
+        result: Dict[str, Any] = {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+        }
+        for q in QUANTILES:
+            rank = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+            result[f"p{round(q * 100)}"] = round(ordered[rank], 6) if ordered else None
+        result["max"] = round(self.max, 6)
+        return result
+
+
+class LatencyMetrics:
+    """Thread-safe registry of latency histograms keyed by (phase, model)."""
+
+    def __init__(self, window: int = 2048, enabled: bool = True):
+        self.window = window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+
+    def observe(self, phase: str, model: Optional[str], seconds: float) -> None:
+        if not self.enabled:
+            return
+        key = (phase, model or "all")
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram(self.window)
+            hist.observe(seconds)
+
+    @contextmanager
+    def timed(self, phase: str, model: Optional[str] = None) -> Iterator[None]:
+        """Record how long the ``with`` block takes, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, model, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Return ``{phase: {model: {count, mean, p50, p95, p99, max}}}`` in seconds."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (phase, model), hist in items:
+                result.setdefault(phase, {})[model] = hist.summary()
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def openmetrics(self, prefix: str = "image2image", gauges: Iterable[Gauge] = ()) -> str:
+        """Render the histograms, and any extra gauges, in the OpenMetrics text format."""
+        name = f"{prefix}_phase_seconds"
+        lines: List[str] = [
+            f"# TYPE {name} histogram",
+            f"# UNIT {name} seconds",
+            f"# HELP {name} Latency of each request phase by model.",
+        ]
+        with self._lock:
+            for (phase, model), hist in sorted(self._histograms.items()):
+                labels = f'phase="{_escape(phase)}",model="{_escape(model)}"'
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (math.inf,), hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+                lines.append(f"{name}_sum{{{labels}}} {hist.sum!r}")
+
+        typed = set()
+        # samples of one metric family must be contiguous
+        for metric, labels, value in sorted(gauges, key=lambda g: g[0]):
+            metric = f"{prefix}_{metric}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} gauge")
+                typed.add(metric)
+            label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in sorted(labels.items()))
+            lines.append(f"{metric}{{{label_text}}} {float(value)!r}" if label_text else f"{metric} {float(value)!r}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def numeric_gauges(section: str, stats: Dict[str, Any], labels: Optional[Dict[str, str]] = None) -> List[Gauge]:
+    """Turn the numeric values of a stats dict into gauges named ``<section>_<key>``."""
+    gauges: List[Gauge] = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        gauges.append((f"{section}_{key}", dict(labels or {}), value))
+    return gauges
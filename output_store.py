@@ -0,0 +1,221 @@
+"""Managed directory for generated images.
+
+Files get collision-free names and live in a sharded layout::
+
+    generated/20250101/3f/20250101_120000_gpt_3f9c0a1b2c4d_1.png
+              ^ day    ^ shard (first two hex digits of the token)
+
+The timestamp and model keep names readable; the random token makes them
+unique even for requests finishing in the same second or in different
+processes. Every file is recorded in a small SQLite index (WAL mode, shared
+by all server processes using the directory), so totals, listings and
+eviction never scan the directory tree.
+
+With a size and/or age quota, a background thread evicts the oldest files
+first. Files written by older versions straight into ``generated/`` are
+indexed once when the index is created, so they count towards the quota.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("mcp.image2image.outputs")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,
+    model TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_created ON outputs (created);
+"""
+
+# Suffixes picked up when indexing files written before the index existed.
+_LEGACY_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp"}
+
+# Empty shard and day directories are only removed once they are this many
+# seconds old, so GC never pulls a directory out from under a pending write.
+_DIR_GRACE = 300.0
+
+
+class OutputStore:
+    """Sharded output directory with an index and an optional size/age quota."""
+
+    def __init__(self, root: Path, max_bytes: int = 0, max_age: float = 0.0, gc_interval: float = 60.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.gc_interval = gc_interval
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self._local = threading.local()
+        self._gc_lock = threading.Lock()
+        self._gc_running = False
+        self._last_gc = 0.0
+        self.root.mkdir(parents=True, exist_ok=True)
+        fresh = not self._index_path.exists()
+        self._conn().executescript(_SCHEMA)
+        if fresh:
+            self._index_legacy_files()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.root / ".index.sqlite3"
+
+    @property
+    def quota_enabled(self) -> bool:
+        return self.max_bytes > 0 or self.max_age > 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._index_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _index_legacy_files(self) -> None:
+        rows = []
+        for path in self.root.iterdir():
+            if path.suffix.lower() in _LEGACY_SUFFIXES and path.is_file():
+                stat = path.stat()
+                rows.append((str(path), None, stat.st_size, stat.st_mtime))
+        if rows:
+            self._conn().executemany("INSERT OR IGNORE INTO outputs (path, model, size, created) VALUES (?, ?, ?, ?)", rows)
+            logger.info("Indexed %d existing files in %s", len(rows), self.root)
+
+    def allocate(self, model: str, ext: str, count: int) -> List[Path]:
+        """Return ``count`` unused paths for the images of one response.
+
+        Directories are not created here; the writer creates the parent right
+        before it writes.
+        """
+        now = datetime.now()
+        token = uuid.uuid4().hex[:12]
+        shard = self.root / now.strftime("%Y%m%d") / token[:2]
+        stamp = now.strftime("%Y%m%d_%H%M%S")
+        return [shard / f"{stamp}_{model}_{token}_{idx + 1}{ext}" for idx in range(count)]
+
+    def record(self, paths: Iterable[str], model: Optional[str] = None) -> None:
+        """Index files that were written and start a GC pass when one is due."""
+        now = time.time()
+        rows = []
+        for path in paths:
+            try:
+                rows.append((str(path), model, os.path.getsize(path), now))
+            except FileNotFoundError:
+                continue
+        if rows:
+            self._conn().executemany("INSERT OR REPLACE INTO outputs (path, model, size, created) VALUES (?, ?, ?, ?)", rows)
+        self._maybe_gc()
+
+    def forget(self, paths: Iterable[str]) -> None:
+        """Drop index rows of files that were removed."""
+        self._conn().executemany("DELETE FROM outputs WHERE path = ?", [(str(p),) for p in paths])
+
+    def list_outputs(self, model: Optional[str] = None, since: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Indexed outputs, newest first."""
+        clauses: List[str] = []
+        params: List[Any] = []
+        if model is not None:
+            clauses.append("model = ?")
+            params.append(model)
+        if since is not None:
+            clauses.append("created >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT path, model, size, created FROM outputs {where} ORDER BY created DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [{"path": p, "model": m, "size": s, "created": datetime.fromtimestamp(c).isoformat()} for p, m, s, c in rows]
+
+    def _maybe_gc(self) -> None:
+        if not self.quota_enabled:
+            return
+        with self._gc_lock:
+            if self._gc_running or time.monotonic() - self._last_gc < self.gc_interval:
+                return
+            self._gc_running = True
+        threading.Thread(target=self._gc_thread, daemon=True, name="mcp-output-gc").start()
+
+    def _gc_thread(self) -> None:
+        try:
+            self.gc()
+        except Exception:
+            logger.exception("Output GC failed")
+        finally:
+            with self._gc_lock:
+                self._gc_running = False
+                self._last_gc = time.monotonic()
+
+    def gc(self) -> int:
+        """Evict files older than ``max_age``, then oldest first until under ``max_bytes``.
+
+        Returns the number of files removed.
+        """
+        conn = self._conn()
+        victims: List[Any] = []
+        if self.max_age > 0:
+            victims += conn.execute("SELECT path, size FROM outputs WHERE created < ? ORDER BY created", (time.time() - self.max_age,)).fetchall()
+        if self.max_bytes > 0:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM outputs").fetchone()[0] - sum(size for _, size in victims)
+            if total > self.max_bytes:
+                skip = {path for path, _ in victims}
+                for path, size in conn.execute("SELECT path, size FROM outputs ORDER BY created"):
+                    if total <= self.max_bytes:
+                        break
+                    if path in skip:
+                        continue
+                    victims.append((path, size))
+                    total -= size
+        removed = 0
+        freed = 0
+        gone: List[str] = []
+        for path, size in victims:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                logger.warning("Could not evict output %s: %s", path, exc)
+                continue
+            else:
+                removed += 1
+                freed += size
+            gone.append(path)
+        self.forget(gone)
+        # drop shard and day directories left empty, unless a write may be about to land in them
+        cutoff = time.time() - _DIR_GRACE
+        for directory in {Path(path).parent for path in gone}:
+            for candidate in (directory, directory.parent):
+                if candidate != self.root and self.root in candidate.parents:
+                    try:
+                        if candidate.stat().st_mtime < cutoff:
+                            candidate.rmdir()
+                    except OSError:
+                        pass
+        if removed:
+            logger.info("Evicted %d generated files (%.1f MB) from %s", removed, freed / 1e6, self.root)
+        self.evicted += removed
+        self.evicted_bytes += freed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        files, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM outputs").fetchone()
+        return {
+            "files": files,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "max_age_seconds": self.max_age,
+            "evicted": self.evicted,
+            "evicted_bytes": self.evicted_bytes,
+        }
@@ -0,0 +1,356 @@
+"""Client-side rate limiting and retries for Foundry deployments.
+
+Each deployment gets a ``DeploymentLimiter`` made of three parts:
+
+- ``TokenBucket``: caps the request rate (tokens per second with a burst).
+- ``AdaptiveConcurrency``: an AIMD limit on requests in flight. Every
+  success raises the limit by about one per window; a 429/503 halves it
+  (at most once per ``decrease_interval`` so a burst of throttles counts as
+  one signal).
+- jittered exponential retry on 429/5xx and connection errors, honouring
+  ``Retry-After`` / ``retry-after-ms`` when the service sends them.
+
+The limiter works for both threads and asyncio tasks, and keeps counters
+for retries, throttling and wait times.
+"""
+
+import asyncio
+import email.utils
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Mapping, NamedTuple, Optional, Tuple, Type
+
+logger = logging.getLogger("mcp.image2image.ratelimit")
+
+# Status codes that are retried. 429 and 503 also shrink the concurrency limit.
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+THROTTLE_STATUSES = frozenset((429, 503))
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Return the server-requested delay in seconds, if any."""
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+def retry_delay(attempt: int, retry_after: Optional[float], base: float, cap: float) -> float:
+    """Delay before retry number ``attempt`` (0-based).
+
+    Uses ``Retry-After`` plus a little jitter when present, otherwise full
+    jitter exponential backoff capped at ``cap``. The server's delay is never
+    shortened, so it can be above ``cap``; callers give up rather than wait
+    that long (see :meth:`DeploymentLimiter.gives_up`).
+    """
+    if retry_after is not None:
+        # the jitter never takes a delay that fits under the cap over it
+        return retry_after + random.uniform(0, min(base / 2, max(0.0, cap - retry_after)))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; ``rate <= 0`` disables it."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # a negative balance queues callers fairly behind each other
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit shared by threads and asyncio tasks."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int, decrease_factor: float = 0.5, decrease_interval: float = 1.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        # Waiters are threading.Event objects or (loop, future) pairs.
+        self._waiters: Deque[Any] = deque()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < max(self.minimum, math.floor(self.limit))
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            self.in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, fut = waiter
+                loop.call_soon_threadsafe(self._grant, fut)
+
+    def _return_slot(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self._wake()
+
+    def _grant(self, fut: "asyncio.Future[None]") -> None:
+        if fut.cancelled():
+            # the waiter gave up after the slot was handed over
+            self._return_slot()
+        else:
+            fut.set_result(None)
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self._has_slot() and not self._waiters:
+                self.in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event)
+        event.wait()
+
+    async def acquire_async(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._has_slot() and not self._waiters:
+                self.in_flight += 1
+                return
+            fut: "asyncio.Future[None]" = loop.create_future()
+            entry = (loop, fut)
+            self._waiters.append(entry)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                queued = entry in self._waiters
+                if queued:
+                    self._waiters.remove(entry)
+            if not queued and fut.done() and not fut.cancelled():
+                # granted and then cancelled before we resumed
+                self._return_slot()
+            raise
+
+    def release(self, outcome: str = "success") -> None:
+        """Return a slot and adapt the limit. ``outcome`` is 'success', 'throttled' or 'error'."""
+        with self._lock:
+            self.in_flight -= 1
+            if outcome == "success":
+                self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            elif outcome == "throttled":
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.limit = max(float(self.minimum), self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    logger.info("Throttled: concurrency limit lowered to %.1f", self.limit)
+            self._wake()
+
+
+class Attempt(NamedTuple):
+    """Result of one limited request: the response or retryable error, and what to do next."""
+
+    response: Any
+    error: Optional[BaseException]
+    # 'success', 'throttled' or 'error'
+    outcome: str
+    # seconds to wait before retrying, or None when the attempt is final
+    backoff: Optional[float]
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        return parse_retry_after(self.response.headers) if self.response is not None else None
+
+    def unwrap(self) -> Any:
+        """Return the response, or raise the error of a failed attempt."""
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+
+class DeploymentLimiter:
+    """Token bucket + adaptive concurrency + retries for one deployment."""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 0.0,
+        burst: float = 1.0,
+        initial_concurrency: int = 10,
+        min_concurrency: int = 1,
+        max_concurrency: int = 10,
+        max_retries: int = 3,
+        retry_base: float = 1.0,
+        retry_cap: float = 30.0,
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, min_concurrency, max_concurrency)
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttle_wait_seconds = 0.0
+        self.retry_wait_seconds = 0.0
+
+    def _count(self, **deltas: float) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def _next_step(self, attempt: int, resp: Any = None) -> Tuple[str, Optional[float]]:
+        """Classify a finished attempt into (release outcome, retry delay or None)."""
+        if resp is None:
+            outcome, retry_after = "error", None
+        else:
+            status = resp.status_code
+            if status not in RETRY_STATUSES:
+                return "success" if status < 400 else "error", None
+            outcome = "throttled" if status in THROTTLE_STATUSES else "error"
+            retry_after = parse_retry_after(resp.headers)
+            if status == 429:
+                self._count(throttled=1)
+        if attempt >= self.max_retries:
+            return outcome, None
+        return outcome, retry_delay(attempt, retry_after, self.retry_base, self.retry_cap)
+
+    def attempt(
+        self,
+        send: Callable[[], Any],
+        attempt: int = 0,
+        retry_exceptions: Tuple[Type[BaseException], ...] = (),
+    ) -> Attempt:
+        """Make one attempt under the limits without retrying.
+
+        ``attempt`` is the 0-based retry number used to size the backoff.
+        """
+        waited = time.monotonic()
+        delay = self.bucket.reserve()
+        if delay:
+            time.sleep(delay)
+        self.concurrency.acquire()
+        self._count(requests=1, throttle_wait_seconds=time.monotonic() - waited)
+        try:
+            resp = send()
+        except retry_exceptions as exc:
+            outcome, backoff = self._next_step(attempt)
+            self.concurrency.release(outcome)
+            return Attempt(None, exc, outcome, backoff)
+        except BaseException:
+            self.concurrency.release("error")
+            raise
+        outcome, backoff = self._next_step(attempt, resp)
+        self.concurrency.release(outcome)
+        return Attempt(resp, None, outcome, backoff)
+
+    async def attempt_async(
+        self,
+        send: Callable[[], Awaitable[Any]],
+        attempt: int = 0,
+        retry_exceptions: Tuple[Type[BaseException], ...] = (),
+    ) -> Attempt:
+        """Async variant of :meth:`attempt`."""
+        waited = time.monotonic()
+        delay = self.bucket.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        await self.concurrency.acquire_async()
+        self._count(requests=1, throttle_wait_seconds=time.monotonic() - waited)
+        try:
+            resp = await send()
+        except retry_exceptions as exc:
+            outcome, backoff = self._next_step(attempt)
+            self.concurrency.release(outcome)
+            return Attempt(None, exc, outcome, backoff)
+        except BaseException:
+            self.concurrency.release("error")
+            raise
+        outcome, backoff = self._next_step(attempt, resp)
+        self.concurrency.release(outcome)
+        return Attempt(resp, None, outcome, backoff)
+
+    def gives_up(self, backoff: Optional[float]) -> bool:
+        """Whether a retry after ``backoff`` seconds is not made at all.
+
+        A ``Retry-After`` above ``retry_cap`` is not waited out: retrying
+        earlier than the server allows would only be throttled again.
+        """
+        return backoff is None or backoff > self.retry_cap
+
+    def note_retry(self, result: Attempt, backoff: float) -> None:
+        """Log and count a retry of ``result`` after ``backoff`` seconds."""
+        if result.error is not None:
+            logger.warning("%s: request failed (%s); retrying in %.1fs", self.name, result.error, backoff)
+        else:
+            logger.warning("%s: HTTP %d; retrying in %.1fs", self.name, result.response.status_code, backoff)
+        self._count(retries=1, retry_wait_seconds=backoff)
+
+    def call(self, send: Callable[[], Any], retry_exceptions: Tuple[Type[BaseException], ...] = ()) -> Any:
+        """Run ``send`` under the limits, retrying throttled/failed attempts. Returns the last response."""
+        attempt = 0
+        while True:
+            result = self.attempt(send, attempt, retry_exceptions)
+            if self.gives_up(result.backoff):
+                return result.unwrap()
+            self.note_retry(result, result.backoff)
+            if result.response is not None:
+                result.response.close()
+            time.sleep(result.backoff)
+            attempt += 1
+
+    async def call_async(self, send: Callable[[], Awaitable[Any]], retry_exceptions: Tuple[Type[BaseException], ...] = ()) -> Any:
+        """Async variant of :meth:`call`."""
+        attempt = 0
+        while True:
+            result = await self.attempt_async(send, attempt, retry_exceptions)
+            if self.gives_up(result.backoff):
+                return result.unwrap()
+            self.note_retry(result, result.backoff)
+            if result.response is not None:
+                await result.response.aclose()
+            await asyncio.sleep(result.backoff)
+            attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+                "retry_wait_seconds": round(self.retry_wait_seconds, 3),
+                "concurrency_limit": round(self.concurrency.limit, 2),
+                "in_flight": self.concurrency.in_flight,
+                "rate_per_second": self.bucket.rate,
+            }
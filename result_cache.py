@@ -0,0 +1,238 @@
+"""Content-addressed, size-bounded cache of image2image results.
+
+A cache key is the SHA-256 of the input image bytes combined with the
+request fields that influence the output (prompt, model, size, quality).
+Each entry keeps its own link (or copy) of the generated files so that
+entries survive cleanup of ``generated/``, and a hit links the cached files
+back into the output directory, so paths handed to a client are never
+removed by a later cache eviction.
+
+Entries are evicted least-recently-used first once either the total size
+or the number of entries exceeds the configured bounds. The index is a
+SQLite database in WAL mode, shared by every server process using the
+cache directory. Hits refresh an entry's recency at most once per
+``TOUCH_INTERVAL`` seconds, so a hit is normally a read only.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+logger = logging.getLogger("mcp.image2image.cache")
+
+# Request fields that change the generated output and therefore the key.
+KEY_FIELDS = ("prompt", "model", "size", "quality")
+
+# Seconds between recency updates of one entry; LRU order is that coarse.
+TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    files TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+
+def cache_key(
+    image_data: Union[bytes, bytearray, memoryview],
+    request_body: Mapping[str, Any],
+    model: str,
+    extra: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """Return the cache key for an input image and its request fields.
+
+    ``extra`` holds any other settings that change the output (for example
+    input preprocessing); it only affects the key when non-empty.
+    """
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(image_data).digest())
+    fields = {name: request_body.get(name) for name in KEY_FIELDS}
+    fields["model"] = model
+    if extra:
+        fields["extra"] = dict(extra)
+    digest.update(json.dumps(fields, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hardlink ``src`` to ``dest`` (copying across filesystems), replacing ``dest`` atomically."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = dest.with_name(f"{dest.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        try:
+            os.link(src, part)
+        except OSError as exc:
+            if isinstance(exc, FileNotFoundError):
+                raise
+            shutil.copyfile(src, part)
+        os.replace(part, dest)
+    except BaseException:
+        try:
+            part.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _unlink_all(paths: List[Path]) -> None:
+    for path in paths:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ResultCache:
+    """LRU cache mapping request keys to stored output files."""
+
+    def __init__(self, root: Path, max_bytes: int, max_entries: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+        self._import_json_index()
+
+    @property
+    def _index_path(self) -> Path:
+        return self.root / ".index.sqlite3"
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._index_path), timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _entry_paths(self, key: str, names: List[str]) -> List[Path]:
+        return [self.root / key[:2] / name for name in names]
+
+    def _import_json_index(self) -> None:
+        """Take over the entries of the JSON index used by earlier versions."""
+        legacy = self.root / "index.json"
+        try:
+            with open(legacy, "r", encoding="utf-8") as fh:
+                raw = json.load(fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.exception("Ignoring unreadable cache index: %s", legacy)
+            return
+        rows = [
+            (key, json.dumps(entry["files"]), entry.get("size", 0), entry.get("last_access", 0))
+            for key, entry in raw.items()
+            if all(p.is_file() for p in self._entry_paths(key, entry["files"]))
+        ]
+        self._conn().executemany("INSERT OR IGNORE INTO entries (key, files, size, last_access) VALUES (?, ?, ?, ?)", rows)
+        legacy.unlink(missing_ok=True)
+        logger.info("Imported %d result cache entries from %s", len(rows), legacy)
+
+    def _count(self, **counters: int) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def get(self, key: str, allocate: Callable[[str, int], List[Path]]) -> Optional[List[str]]:
+        """Link the stored outputs for ``key`` to new paths and return them, or ``None`` on a miss.
+
+        ``allocate(suffix, count)`` returns the destination paths, normally in
+        the output directory.
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT files, last_access FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(misses=1)
+            return None
+        sources = self._entry_paths(key, json.loads(row[0]))
+        dests = allocate(sources[0].suffix, len(sources)) if sources else []
+        try:
+            for src, dest in zip(sources, dests):
+                _link_or_copy(src, dest)
+        except FileNotFoundError:
+            # removed behind our back or evicted by another process meanwhile; forget the entry
+            _unlink_all(dests)
+            conn.execute("DELETE FROM entries WHERE key = ? AND files = ?", (key, row[0]))
+            self._count(misses=1)
+            return None
+        now = time.time()
+        if now - row[1] >= TOUCH_INTERVAL:
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        self._count(hits=1)
+        logger.info("Result cache hit for key %s", key[:12])
+        return [str(p) for p in dests]
+
+    def put(self, key: str, output_paths: List[str]) -> List[str]:
+        """Store links to ``output_paths`` under ``key`` and return the cached paths."""
+        if not output_paths:
+            return []
+        names = [f"{key}_{idx + 1}{Path(src).suffix}" for idx, src in enumerate(output_paths)]
+        paths = self._entry_paths(key, names)
+        for src, dest in zip(output_paths, paths):
+            _link_or_copy(Path(src), dest)
+        size = sum(p.stat().st_size for p in paths)
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, files, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(names), size, time.time()),
+            )
+            victims = self._select_victims(conn)
+            conn.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _ in victims])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        for victim, files in victims:
+            _unlink_all(self._entry_paths(victim, files))
+            logger.debug("Evicted result cache entry %s", victim[:12])
+        self._count(evictions=len(victims))
+        return [str(p) for p in paths]
+
+    def _select_victims(self, conn: sqlite3.Connection) -> List[Tuple[str, List[str]]]:
+        """Least recently used entries to drop to get back within the bounds."""
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        victims: List[Tuple[str, List[str]]] = []
+        if count <= self.max_entries and total <= self.max_bytes:
+            return victims
+        for key, files, size in conn.execute("SELECT key, files, size FROM entries ORDER BY last_access"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key, json.loads(files)))
+            count -= 1
+            total -= size
+        return victims
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current occupancy."""
+        entries, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": total,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+            }
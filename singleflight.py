@@ -0,0 +1,103 @@
+"""Coalesce concurrent identical calls into a single upstream call.
+
+The first caller for a key (the leader) runs the work; callers that arrive
+while it is in flight (followers) wait for the leader's outcome instead of
+starting their own. Synchronous and asyncio callers share the same in-flight
+table because each call is tracked with a ``concurrent.futures.Future``.
+
+If the leader is cancelled, waiting followers retry and one of them becomes
+the new leader, so a cancelled client never fails the others.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+logger = logging.getLogger("mcp.image2image.singleflight")
+
+
+class _LeaderCancelled(Exception):
+    """Set on the shared future when the leading call was cancelled."""
+
+
+class SingleFlight:
+    """Per-key in-flight call deduplication with counters."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    def _begin(self, key: str) -> Tuple[Future, bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.coalesced += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            self.upstream_calls += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is fut:
+                del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` once for all concurrent callers with the same ``key``."""
+        while True:
+            fut, leader = self._begin(key)
+            if not leader:
+                logger.info("Coalesced request onto in-flight call %s", key[:12])
+                try:
+                    return fut.result()
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = fn()
+            except BaseException as exc:
+                fut.set_exception(exc if isinstance(exc, Exception) else _LeaderCancelled())
+                raise
+            else:
+                fut.set_result(result)
+                return result
+            finally:
+                self._finish(key, fut)
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of :meth:`do`; followers may be sync or async callers."""
+        while True:
+            fut, leader = self._begin(key)
+            if not leader:
+                logger.info("Coalesced request onto in-flight call %s", key[:12])
+                try:
+                    # shield so a cancelled follower does not cancel the shared future
+                    return await asyncio.shield(asyncio.wrap_future(fut))
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                fut.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as exc:
+                fut.set_exception(exc if isinstance(exc, Exception) else _LeaderCancelled())
+                raise
+            else:
+                fut.set_result(result)
+                return result
+            finally:
+                self._finish(key, fut)
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many upstream calls ran and how many were saved by coalescing."""
+        with self._lock:
+            return {
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
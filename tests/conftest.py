@@ -0,0 +1,42 @@
+"""Shared fixtures: import paths, the mock Foundry endpoint and the server module."""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+for path in (ROOT, ROOT / "benchmarks", ROOT / "labs"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+@pytest.fixture(scope="session")
+def mock_foundry():
+    from mock_foundry import start_mock_foundry
+
+    mock = start_mock_foundry(latency="0", image_size=1024)
+    yield mock
+    mock.shutdown()
+
+
+@pytest.fixture(scope="session")
+def server(mock_foundry):
+    """``mcp_server_image2image`` pointed at the mock, writing into a temporary directory."""
+    tmp = Path(tempfile.mkdtemp(prefix="image2image-tests-"))
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in (
+            ("FOUNDRY_ENDPOINT", mock_foundry.url),
+            ("FOUNDRY_API_KEY", "test"),
+            ("FOUNDRY_API_VERSION", "2025-04-01-preview"),
+            ("GPT_DEPLOYMENT_NAME", "gpt-image-1"),
+            ("FLUX_DEPLOYMENT_NAME", "flux"),
+            ("IMAGE_CACHE_ENABLED", "0"),
+            ("IMAGE_CACHE_DIR", str(tmp / "cache")),
+            ("IMAGE_OUTPUT_DIR", str(tmp / "generated")),
+        ):
+            patch.setenv(name, value)
+        import mcp_server_image2image
+
+        yield mcp_server_image2image
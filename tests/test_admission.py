@@ -0,0 +1,100 @@
+"""Memory budget admission, including the reservation a tiled call adds part way through."""
+
+import asyncio
+import os
+from io import BytesIO
+
+import pytest
+
+from admission import AdmissionRejected, MemoryBudget
+
+MB = 1_000_000
+
+
+def test_oversized_request_runs_when_idle():
+    budget = MemoryBudget(100 * MB, "reject", timeout=1)
+
+    async def run():
+        async with budget.reserve(150 * MB):
+            assert budget.stats()["in_use_bytes"] == 150 * MB
+
+    asyncio.run(run())
+    assert budget.stats()["in_use_bytes"] == 0
+
+
+def test_reject_policy_refuses_when_full():
+    budget = MemoryBudget(100 * MB, "reject", timeout=1)
+
+    async def run():
+        async with budget.reserve(80 * MB):
+            with pytest.raises(AdmissionRejected):
+                async with budget.reserve(30 * MB):
+                    pass
+
+    asyncio.run(run())
+    assert budget.stats()["rejected"] == 1
+
+
+def test_extend_past_budget_on_idle_server():
+    budget = MemoryBudget(100 * MB, "queue", timeout=0.5)
+
+    async def run():
+        async with budget.reserve(17 * MB):
+            async with budget.extend(102 * MB):
+                assert budget.stats()["in_use_bytes"] == 119 * MB
+            assert budget.stats()["in_use_bytes"] == 17 * MB
+
+    asyncio.run(run())
+    stats = budget.stats()
+    assert (stats["in_use_bytes"], stats["inflight"], stats["admitted"], stats["rejected"]) == (0, 0, 1, 0)
+
+
+def test_concurrent_extends_do_not_block_each_other():
+    budget = MemoryBudget(100 * MB, "queue", timeout=2)
+
+    async def request():
+        async with budget.reserve(17 * MB):
+            await asyncio.sleep(0.01)
+            async with budget.extend(60 * MB):
+                await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(request(), request())
+
+    asyncio.run(run())
+    stats = budget.stats()
+    assert (stats["in_use_bytes"], stats["inflight"], stats["rejected"]) == (0, 0, 0)
+
+
+def test_failed_extend_releases_the_request():
+    budget = MemoryBudget(100 * MB, "reject", timeout=1)
+
+    async def run():
+        async with budget.reserve(50 * MB):
+            async with budget.reserve(20 * MB):
+                with pytest.raises(AdmissionRejected):
+                    async with budget.extend(60 * MB):
+                        pass
+            assert budget.stats()["in_use_bytes"] == 50 * MB
+
+    asyncio.run(run())
+    assert (budget.stats()["in_use_bytes"], budget.stats()["inflight"]) == (0, 0)
+
+
+def test_tiled_input_larger_than_budget_on_idle_server(server, monkeypatch, tmp_path):
+    from PIL import Image
+
+    budget = MemoryBudget(100 * MB, "queue", timeout=2)
+    monkeypatch.setattr(server, "memory_budget", budget)
+    path = tmp_path / "large.png"
+    buf = BytesIO()
+    Image.new("RGB", (2500, 2500), (40, 90, 160)).save(buf, format="PNG")
+    path.write_bytes(buf.getvalue())
+
+    saved = asyncio.run(server.image2image(image_path=str(path), tiled=True))
+    assert len(saved) == 1 and os.path.exists(saved[0])
+    with Image.open(saved[0]) as result:
+        assert result.size == (2500, 2500)
+    stats = budget.stats()
+    assert (stats["in_use_bytes"], stats["rejected"]) == (0, 0)
+    assert stats["largest_request_bytes"] > 100 * MB
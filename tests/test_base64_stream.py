@@ -0,0 +1,47 @@
+"""Streaming base64 encode/decode of the image tools server."""
+
+import base64
+import os
+import threading
+
+import pytest
+
+import mcp_server_image_tools as tools
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, 1000, tools._ENCODE_BLOCK + 7])
+def test_encode_matches_b64encode(tmp_path, size):
+    path = tmp_path / "image.png"
+    data = os.urandom(size)
+    path.write_bytes(data)
+    assert tools._read_image_as_base64(path) == "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 5, 4096])
+def test_decode_matches_b64decode(chunk):
+    text = base64.b64encode(os.urandom(10_001)).decode("ascii")
+    # line breaks and whitespace are dropped the same way b64decode drops them
+    text = "\n".join(text[i : i + 76] for i in range(0, len(text), 76)) + " "
+    chunks = [text[i : i + chunk] for i in range(0, len(text), chunk)]
+    assert b"".join(tools._iter_decoded_blocks(chunks)) == base64.b64decode(text)
+
+
+def test_concurrent_decodes_to_one_output(tmp_path):
+    out = tmp_path / "out.png"
+    payloads = [base64.b64encode(bytes([n]) * 300_000).decode("ascii") for n in range(4)]
+    errors = []
+
+    def decode(payload):
+        try:
+            tools._save_base64_as_image("data:image/png;base64," + payload, out)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=decode, args=(payload,)) for payload in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert out.read_bytes() in [base64.b64decode(payload) for payload in payloads]
+    assert [path.name for path in tmp_path.iterdir()] == ["out.png"]
@@ -0,0 +1,28 @@
+"""Bulk conversion on the process pool and the manifest that lets reruns skip files."""
+
+from pathlib import Path
+
+import bulk_convert
+
+
+def _sources(root: Path, count: int) -> Path:
+    from PIL import Image
+
+    source = root / "in"
+    source.mkdir()
+    for index in range(count):
+        Image.new("RGB", (64, 48), (index * 40, 80, 120)).save(source / f"{index}.png")
+    return source
+
+
+def test_convert_on_pool_then_skip_unchanged(tmp_path):
+    source = _sources(tmp_path, 4)
+    output = tmp_path / "out"
+    items = bulk_convert.plan_conversion(str(source), output)
+    first = list(bulk_convert.convert_all(items, output, workers=2))
+    assert sorted(r["status"] for r in first) == ["converted"] * 4
+    assert len(list(output.glob("*.jpg"))) == 4
+
+    items = bulk_convert.plan_conversion(str(source), output)
+    second = list(bulk_convert.convert_all(items, output, workers=2))
+    assert sorted(r["status"] for r in second) == ["skipped"] * 4
@@ -0,0 +1,74 @@
+"""Both job store backends: claiming under a lease, recovery, listing and purging."""
+
+import json
+
+import pytest
+
+from job_store import FileJobStore, SqliteJobStore, open_job_store
+
+
+def _job(job_id, status="queued", priority=0, created_at="2026-01-01T00:00:00", **fields):
+    job = {"job_id": job_id, "status": status, "model": "gpt", "priority": priority,
+           "created_at": created_at, "updated_at": created_at}
+    job.update(fields)
+    return job
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def store(request, tmp_path):
+    store = open_job_store(request.param, tmp_path / "jobs")
+    yield store
+    store.close()
+
+
+def test_queue_order_claim_and_transition(store):
+    store.save(_job("low", created_at="2026-01-01T00:00:00"))
+    store.save(_job("high", priority=5, created_at="2026-01-02T00:00:00"))
+    store.save(_job("done", status="completed"))
+    assert [job["job_id"] for job in store.queued_jobs()] == ["high", "low"]
+
+    claimed = store.claim("high", "owner-a", lease_seconds=30)
+    assert claimed["status"] == "running" and claimed["attempts"] == 1
+    assert store.claim("high", "owner-b", lease_seconds=30) is None
+    assert store.transition("high", "completed", expected=("running",), owner="owner-b") is None
+    assert store.transition("high", "completed", expected=("running",), owner="owner-a")["status"] == "completed"
+    assert store.statuses(["high", "low", "missing"]) == {"high": "completed", "low": "queued", "missing": None}
+
+
+def test_requeue_expired_lease(store):
+    store.save(_job("a"))
+    store.claim("a", "owner-a", lease_seconds=-1)
+    assert [job["job_id"] for job in store.requeue_expired(max_attempts=3)] == ["a"]
+    assert store.load("a")["status"] == "queued"
+
+    store.claim("a", "owner-a", lease_seconds=30)
+    assert store.requeue_expired(max_attempts=3) == []
+    assert store.requeue_expired(max_attempts=1, owner_dead=lambda owner: True)[0]["status"] == "failed"
+
+
+def test_list_purge_and_image_refs(store):
+    store.save(_job("old", status="completed", image_ref="r1"))
+    store.save(_job("new", status="queued", image_ref="r2", created_at="2026-02-01T00:00:00"))
+    assert [job["job_id"] for job in store.list_jobs()] == ["new", "old"]
+    assert [job["job_id"] for job in store.list_jobs(status="completed")] == ["old"]
+    assert store.image_refs() == {"r1", "r2"}
+    assert store.purge(ttl_seconds=60) == 1
+    assert store.load("old") is None and store.image_refs() == {"r2"}
+
+
+def test_file_store_writes_whole_files(tmp_path):
+    store = FileJobStore(tmp_path)
+    store.save(_job("a"))
+    store.transition("a", "running")
+    assert json.loads((tmp_path / "a.json").read_text())["status"] == "running"
+    assert [path.name for path in tmp_path.iterdir()] == ["a.json"]
+
+
+def test_sqlite_store_imports_json_jobs_on_open(tmp_path):
+    jobs_dir = tmp_path / "jobs"
+    FileJobStore(jobs_dir).save(_job("legacy", status="completed"))
+    store = open_job_store("sqlite", jobs_dir)
+    assert isinstance(store, SqliteJobStore)
+    assert store.load("legacy")["status"] == "completed"
+    assert not list(jobs_dir.glob("*.json"))
+    assert (jobs_dir / "migrated" / "legacy.json").exists()
@@ -0,0 +1,66 @@
+"""Retry timing: Retry-After is honoured in full, or the response is returned."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from backends import Backend, BackendPool, call_with_failover
+from rate_limit import DeploymentLimiter, parse_retry_after, retry_delay
+
+
+def _response(status, **headers):
+    return SimpleNamespace(status_code=status, headers=headers, close=lambda: None)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after({"retry-after-ms": "1500"}) == 1.5
+    assert parse_retry_after({"retry-after": "7"}) == 7.0
+    assert parse_retry_after({}) is None
+
+
+@pytest.mark.parametrize("retry_after", [0.0, 2.0, 29.9, 30.0])
+def test_retry_after_under_cap_is_never_shortened(retry_after):
+    for _ in range(100):
+        delay = retry_delay(0, retry_after, base=1.0, cap=30.0)
+        assert retry_after <= delay <= 30.0
+
+
+def test_retry_after_over_cap_is_not_shortened():
+    assert retry_delay(0, 45.0, base=1.0, cap=30.0) >= 45.0
+    assert 0 <= retry_delay(10, None, base=1.0, cap=30.0) <= 30.0
+
+
+def test_long_retry_after_returns_the_throttled_response():
+    limiter = DeploymentLimiter("test", retry_base=0.01, retry_cap=1.0)
+    sent = []
+
+    def send():
+        sent.append(1)
+        return _response(429, **{"retry-after": "60"})
+
+    assert limiter.call(send).status_code == 429
+    assert len(sent) == 1 and limiter.stats()["retries"] == 0
+
+
+def test_short_retry_after_is_waited_out():
+    limiter = DeploymentLimiter("test", retry_base=0.01, retry_cap=1.0)
+    replies = [_response(429, **{"retry-after-ms": "20"}), _response(200)]
+    assert limiter.call(lambda: replies.pop(0)).status_code == 200
+    assert limiter.stats()["retries"] == 1
+
+
+def test_long_retry_after_still_fails_over():
+    backends = [Backend("a", "http://a/", "d", "k", "v"), Backend("b", "http://b/", "d", "k", "v")]
+    # "a" looks faster, so it takes the first attempt
+    backends[0].ewma_latency, backends[1].ewma_latency = 0.01, 1.0
+    pool = BackendPool("gpt", backends, strategy="latency")
+    limiters = {}
+
+    def limiter_for(backend):
+        return limiters.setdefault(backend.name, DeploymentLimiter(backend.name, retry_base=0.01, retry_cap=1.0))
+
+    def send(backend):
+        return _response(429, **{"retry-after": "60"}) if backend.name == "a" else _response(200)
+
+    assert call_with_failover(pool, limiter_for, send).status_code == 200
+    assert limiters["a"].stats()["throttled"] == 1
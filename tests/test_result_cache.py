@@ -0,0 +1,84 @@
+"""Result cache: hits link outputs into place, evictions never touch handed-out files."""
+
+import asyncio
+import threading
+from pathlib import Path
+
+from result_cache import ResultCache, cache_key
+
+
+def _outputs(directory: Path, name: str, data: bytes):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / name
+    path.write_bytes(data)
+    return [str(path)]
+
+
+def _allocator(directory: Path):
+    counter = iter(range(1_000_000))
+
+    def allocate(suffix, count):
+        directory.mkdir(parents=True, exist_ok=True)
+        return [directory / f"hit-{next(counter)}{suffix}" for _ in range(count)]
+
+    return allocate
+
+
+def test_key_depends_on_every_input():
+    base = cache_key(b"image", {"prompt": "p"}, "gpt", {"output_format": "png"})
+    assert base == cache_key(b"image", {"prompt": "p"}, "gpt", {"output_format": "png"})
+    assert base != cache_key(b"other", {"prompt": "p"}, "gpt", {"output_format": "png"})
+    assert base != cache_key(b"image", {"prompt": "q"}, "gpt", {"output_format": "png"})
+    assert base != cache_key(b"image", {"prompt": "p"}, "flux", {"output_format": "png"})
+    assert base != cache_key(b"image", {"prompt": "p"}, "gpt", {"output_format": "jpeg"})
+
+
+def test_hits_survive_eviction_and_a_second_process(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_bytes=10**9, max_entries=2)
+    generated = tmp_path / "generated"
+    allocate = _allocator(generated)
+
+    assert cache.get("a" * 64, allocate) is None
+    cache.put("a" * 64, _outputs(generated, "a.png", b"A"))
+    hit = cache.get("a" * 64, allocate)
+    assert Path(hit[0]).parent == generated and Path(hit[0]).read_bytes() == b"A"
+
+    # another process on the same directory sees the entry
+    assert ResultCache(tmp_path / "cache", 10**9, 2).get("a" * 64, allocate) is not None
+
+    cache.put("b" * 64, _outputs(generated, "b.png", b"B"))
+    cache.put("c" * 64, _outputs(generated, "c.png", b"C"))
+    assert cache.get("a" * 64, allocate) is None
+    assert Path(hit[0]).read_bytes() == b"A"
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"]) == (2, 1)
+
+
+def test_cancelled_cache_store_discards_outputs(server, tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+
+    class SlowCache:
+        def put(self, key, paths):
+            started.set()
+            release.wait(5)
+
+    store = server.get_output_store()
+    saved = [str(p) for p in store.allocate("gpt", ".png", 1)]
+    for path in saved:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_bytes(b"out")
+    store.record(saved, "gpt")
+
+    async def run():
+        task = asyncio.ensure_future(server._cache_put_async(SlowCache(), "k" * 64, saved))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        release.set()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(run())
+    assert not any(Path(path).exists() for path in saved)
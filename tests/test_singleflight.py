@@ -0,0 +1,66 @@
+"""Coalescing of identical calls in flight."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", work))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["result"] * 5 and len(calls) == 1
+    assert flight.stats() == {"upstream_calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream failed")
+
+    async def run():
+        return await asyncio.gather(*(flight.do_async("k", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.stats()["upstream_calls"] == 1
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do_async("k", work))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.do_async("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(run()) == 2
+    assert flight.stats()["in_flight"] == 0
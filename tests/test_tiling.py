@@ -0,0 +1,54 @@
+"""Tile planning and the cross-faded blend."""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import tiling
+
+
+def _png(image):
+    buf = BytesIO()
+    image.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("size", [(1024, 1024), (2000, 1500), (2500, 2500), (1025, 3000)])
+def test_tiles_cover_the_image_with_the_overlap(size):
+    width, height = size
+    tiles = tiling.plan_tiles(width, height, 1024, 128)
+    covered = np.zeros((height, width), dtype=bool)
+    for t in tiles:
+        assert t.width <= 1024 and t.height <= 1024
+        covered[t.y:t.y + t.height, t.x:t.x + t.width] = True
+    assert covered.all()
+    for a, b in zip(tiles, tiles[1:]):
+        if a.y == b.y:
+            assert a.x + a.width - b.x >= 128
+
+
+def test_invalid_overlap_is_refused():
+    with pytest.raises(ValueError):
+        tiling.plan_tiles(2000, 2000, 1024, 1024)
+
+
+def test_blending_unchanged_tiles_gives_back_the_source():
+    rng = np.random.default_rng(0)
+    source = Image.fromarray(rng.integers(0, 256, (1500, 2000, 3), dtype=np.uint8), "RGB")
+    blender = tiling.TileBlender(2000, 1500)
+    for t in tiling.plan_tiles(2000, 1500, 1024, 128):
+        blender.add(tiling.encode_tile(source, t), t)
+    result = np.asarray(blender.image(), dtype=np.int16)
+    assert np.abs(result - np.asarray(source, dtype=np.int16)).max() <= 1
+
+
+def test_image_size_reads_the_header_upright():
+    image = Image.new("RGB", (300, 200))
+    exif = image.getexif()
+    exif[0x0112] = 6  # rotated 90 degrees
+    buf = BytesIO()
+    image.save(buf, format="JPEG", exif=exif)
+    assert tiling.image_size(buf.getvalue()) == (200, 300)
+    assert tiling.image_size(_png(image)) == (300, 200)
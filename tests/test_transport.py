@@ -0,0 +1,78 @@
+"""Network transport limits and Host header checks."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+import transport
+from transport import ToolCallLimiter, allowed_hosts, install_limits
+
+
+def _server():
+    from mcp.server.fastmcp import Context, FastMCP
+
+    mcp = FastMCP("test")
+    threads = []
+
+    @mcp.tool()
+    def blocking(seconds: float) -> str:
+        """Sleep on a worker thread."""
+        threads.append(threading.current_thread() is threading.main_thread())
+        time.sleep(seconds)
+        return "slept"
+
+    @mcp.tool()
+    async def echo(text: str, ctx: Context) -> str:
+        """Echo ``text`` back."""
+        return text
+
+    return mcp, threads
+
+
+def test_limits_keep_schemas_and_validation():
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    mcp, threads = _server()
+    limiter = ToolCallLimiter(max_inflight=4, client_max_inflight=1)
+    install_limits(mcp, limiter, sync_workers=2)
+
+    async def run():
+        async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+            tools = {tool.name: tool for tool in (await client.list_tools()).tools}
+            assert set(tools) == {"blocking", "echo"}
+            assert tools["echo"].description == "Echo ``text`` back."
+            assert list(tools["echo"].inputSchema["properties"]) == ["text"]
+
+            assert (await client.call_tool("echo", {"text": "hi"})).content[0].text == "hi"
+            assert (await client.call_tool("echo", {"text": ["not", "a", "string"]})).isError
+
+            # this client is limited to one call in flight
+            first, second = await asyncio.gather(
+                client.call_tool("blocking", {"seconds": 0.3}),
+                client.call_tool("blocking", {"seconds": 0.3}),
+            )
+            assert sorted([first.isError, second.isError]) == [False, True]
+
+    asyncio.run(run())
+    assert threads == [False]
+    assert limiter.stats()["rejected"] == 1 and limiter.stats()["running"] == 0
+
+
+def test_host_check_stays_on_for_network_binds():
+    settings = allowed_hosts("192.168.1.5", ["mcp.example", "proxy:9000"])
+    assert settings.enable_dns_rebinding_protection
+    for name in ("192.168.1.5:8000", "mcp.example", "mcp.example:8000", "proxy:9000", "localhost:8000"):
+        assert name in settings.allowed_hosts or name.rpartition(":")[0] + ":*" in settings.allowed_hosts
+    assert "evil.example:8000" not in settings.allowed_hosts and "evil.example:*" not in settings.allowed_hosts
+    assert "[fe80::1]:*" in allowed_hosts("fe80::1", []).allowed_hosts
+    assert not allowed_hosts("0.0.0.0", ["*"]).enable_dns_rebinding_protection
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "::"])
+def test_wildcard_bind_admits_this_machine(host, monkeypatch):
+    monkeypatch.setattr(transport.socket, "gethostname", lambda: "box")
+    monkeypatch.setattr(transport.socket, "getfqdn", lambda: "box.lan")
+    hosts = allowed_hosts(host, []).allowed_hosts
+    assert {"box:*", "box.lan:*"} <= set(hosts) and "0.0.0.0:*" not in hosts
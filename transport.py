@@ -0,0 +1,267 @@
+"""Serve a FastMCP server over stdio or over the network.
+
+By default every server runs on stdio, so each MCP client spawns its own
+process. With ``--transport streamable-http`` (or ``sse``) one long-lived
+process serves many clients at once and they share its connection pool,
+result cache, job queue and rate limiters.
+
+Network transports add two limits on tool calls:
+
+- ``MCP_MAX_INFLIGHT`` tool calls run at once across all clients; further
+  calls wait for a slot.
+- A client session with ``MCP_CLIENT_MAX_INFLIGHT`` calls in flight has
+  further calls rejected right away, so one busy client cannot fill the
+  server's queue.
+
+Synchronous tools would block the event loop every client shares, so on a
+network transport they run on a pool of ``MCP_SYNC_WORKERS`` threads.
+
+DNS rebinding protection stays on for every bind address: requests must
+carry a ``Host`` header naming the bind host, this machine or one of
+``MCP_ALLOWED_HOSTS``.
+
+The ``mcp`` package is imported lazily so that ``mcp_server_image_tools``
+keeps working with its local FastMCP shim.
+"""
+
+import argparse
+import asyncio
+import functools
+import logging
+import os
+import socket
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional
+
+logger = logging.getLogger("mcp.image2image.transport")
+
+TRANSPORTS = ("stdio", "streamable-http", "sse")
+
+# Transport used when no --transport is given, and where network transports listen.
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").lower()
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", "8000"))
+
+# Network transports only: tool calls running at once (0 = unlimited), calls
+# one client session may have in flight (0 = unlimited) and threads for
+# synchronous tools.
+MCP_MAX_INFLIGHT = int(os.getenv("MCP_MAX_INFLIGHT", "64"))
+MCP_CLIENT_MAX_INFLIGHT = int(os.getenv("MCP_CLIENT_MAX_INFLIGHT", "8"))
+MCP_SYNC_WORKERS = int(os.getenv("MCP_SYNC_WORKERS", "8"))
+
+# Extra names (optionally name:port) clients may use in the Host header of a
+# network transport, comma separated. "*" turns the Host/Origin check off.
+MCP_ALLOWED_HOSTS = [h.strip() for h in os.getenv("MCP_ALLOWED_HOSTS", "").split(",") if h.strip()]
+
+_LOCAL_HOSTS = ("127.0.0.1", "localhost", "::1")
+_WILDCARD_HOSTS = ("0.0.0.0", "::", "")
+
+
+class ClientLimitError(RuntimeError):
+    """A client already has the maximum number of tool calls in flight."""
+
+
+class ToolCallLimiter:
+    """Server-wide and per-client bounds on tool calls in flight.
+
+    Used from the server's event loop only, so the counters need no lock.
+    """
+
+    def __init__(self, max_inflight: int = 0, client_max_inflight: int = 0):
+        self.max_inflight = max_inflight
+        self.client_max_inflight = client_max_inflight
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_clients = 0
+        self._clients: Dict[Hashable, int] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self, client: Hashable) -> AsyncIterator[None]:
+        """Hold a slot for one tool call of ``client`` (waiting for one if the server is full)."""
+        inflight = self._clients.get(client, 0)
+        if self.client_max_inflight and inflight >= self.client_max_inflight:
+            self.rejected += 1
+            raise ClientLimitError(
+                f"Too many requests in flight for this client (limit {self.client_max_inflight}, "
+                "MCP_CLIENT_MAX_INFLIGHT); retry when one of them has finished"
+            )
+        self._clients[client] = inflight + 1
+        self.peak_clients = max(self.peak_clients, len(self._clients))
+        try:
+            if self.max_inflight:
+                if self._semaphore is None:
+                    self._semaphore = asyncio.Semaphore(self.max_inflight)
+                self.waiting += 1
+                try:
+                    await self._semaphore.acquire()
+                finally:
+                    self.waiting -= 1
+            self.running += 1
+            try:
+                yield
+            finally:
+                self.running -= 1
+                self.completed += 1
+                if self.max_inflight:
+                    self._semaphore.release()
+        finally:
+            remaining = self._clients[client] - 1
+            if remaining:
+                self._clients[client] = remaining
+            else:
+                del self._clients[client]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_inflight": self.max_inflight,
+            "client_max_inflight": self.client_max_inflight,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "active_clients": len(self._clients),
+            "peak_clients": self.peak_clients,
+        }
+
+
+# Set by serve() when a network transport is used.
+_limiter: Optional[ToolCallLimiter] = None
+_transport = "stdio"
+
+
+def transport_stats() -> Dict[str, Any]:
+    """Transport in use and, for network transports, the tool call limiter counters."""
+    stats: Dict[str, Any] = {"transport": _transport}
+    if _limiter is not None:
+        stats.update(_limiter.stats())
+    return stats
+
+
+def _limited(mcp: Any, fn: Any, is_async: bool, limiter: ToolCallLimiter, workers: Any) -> Any:
+    """Wrap a tool function so each call holds a slot of ``limiter``; sync functions run on ``workers``."""
+    import anyio
+
+    @functools.wraps(fn)
+    async def run(**kwargs: Any) -> Any:
+        # one ServerSession per connected client (per MCP session on streamable HTTP)
+        client = mcp.get_context().request_context.session
+        async with limiter.slot(client):
+            if is_async:
+                return await fn(**kwargs)
+            return await anyio.to_thread.run_sync(functools.partial(fn, **kwargs), limiter=workers)
+
+    return run
+
+
+def install_limits(mcp: Any, limiter: ToolCallLimiter, sync_workers: int = MCP_SYNC_WORKERS) -> None:
+    """Route every tool call of ``mcp`` through ``limiter`` and move synchronous tools to threads.
+
+    Each tool is registered again with ``add_tool`` around a wrapper with
+    the same signature, so FastMCP still builds its schema and validates the
+    arguments as before. Call after all tools are registered.
+    """
+    import anyio
+
+    workers = anyio.CapacityLimiter(max(1, sync_workers))
+    # FastMCP has no public accessor for the registered functions
+    for tool in mcp._tool_manager.list_tools():
+        mcp.remove_tool(tool.name)
+        mcp.add_tool(
+            _limited(mcp, tool.fn, tool.is_async, limiter, workers),
+            name=tool.name,
+            title=tool.title,
+            description=tool.description,
+            annotations=tool.annotations,
+            icons=tool.icons,
+            meta=tool.meta,
+            structured_output=tool.fn_metadata.output_schema is not None,
+        )
+
+
+def allowed_hosts(host: str, extra: Optional[List[str]] = None) -> Any:
+    """Transport security settings admitting the bind host, this machine and ``extra``.
+
+    ``extra`` defaults to ``MCP_ALLOWED_HOSTS``; a ``*`` entry turns the check off.
+    """
+    from mcp.server.transport_security import TransportSecuritySettings
+
+    extra = MCP_ALLOWED_HOSTS if extra is None else extra
+    if "*" in extra:
+        return TransportSecuritySettings(enable_dns_rebinding_protection=False)
+    names = list(_LOCAL_HOSTS)
+    if host not in _WILDCARD_HOSTS:
+        names.append(host)
+    else:
+        # listening everywhere: clients reach us under this machine's names
+        names.extend((socket.gethostname(), socket.getfqdn()))
+    hosts: List[str] = []
+    for name in dict.fromkeys(names + extra):
+        if name.count(":") > 1 and not name.startswith("["):
+            name = f"[{name}]"  # a bare IPv6 address
+        if name.rpartition(":")[2].isdigit():
+            hosts.append(name)
+        else:
+            # without a port when clients use the scheme's default one
+            hosts.extend((name, f"{name}:*"))
+    origins = [f"{scheme}://{name}" for name in hosts for scheme in ("http", "https")]
+    return TransportSecuritySettings(enable_dns_rebinding_protection=True, allowed_hosts=hosts, allowed_origins=origins)
+
+
+def add_transport_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--transport", choices=TRANSPORTS, default=MCP_TRANSPORT, help="default from MCP_TRANSPORT (stdio)")
+    parser.add_argument("--host", default=MCP_HOST, help="Listen address for network transports (MCP_HOST)")
+    parser.add_argument("--port", type=int, default=MCP_PORT, help="Listen port for network transports (MCP_PORT)")
+
+
+def run(
+    mcp: Any,
+    transport: str = MCP_TRANSPORT,
+    host: str = MCP_HOST,
+    port: int = MCP_PORT,
+    max_body_bytes: int = 0,
+) -> None:
+    """Run ``mcp`` on ``transport``; network transports get the tool call limits.
+
+    ``max_body_bytes`` raises the HTTP request body limit (4 MiB by default)
+    so that tool calls carrying large base64 images are accepted.
+    """
+    global _limiter, _transport
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport '{transport}'. Use one of: {', '.join(TRANSPORTS)}")
+    _transport = transport
+    if transport == "stdio":
+        mcp.run()
+        return
+
+    mcp.settings.host = host
+    mcp.settings.port = port
+    if max_body_bytes:
+        mcp.settings.max_request_body_size = max(mcp.settings.max_request_body_size, max_body_bytes)
+    if host not in _LOCAL_HOSTS or MCP_ALLOWED_HOSTS:
+        # FastMCP's default Host header check only admits localhost names
+        mcp.settings.transport_security = allowed_hosts(host)
+        if not mcp.settings.transport_security.enable_dns_rebinding_protection:
+            logger.warning("MCP_ALLOWED_HOSTS=* turns off the Host header check")
+        else:
+            logger.info("Accepting Host headers: %s", ", ".join(mcp.settings.transport_security.allowed_hosts))
+    if host not in _LOCAL_HOSTS:
+        logger.warning("Listening on %s without authentication; expose it only on a trusted network", host)
+    _limiter = ToolCallLimiter(MCP_MAX_INFLIGHT, MCP_CLIENT_MAX_INFLIGHT)
+    install_limits(mcp, _limiter)
+    path = mcp.settings.streamable_http_path if transport == "streamable-http" else mcp.settings.sse_path
+    logger.info(
+        "Serving %s on http://%s:%d%s (max in flight %s, per client %s, sync workers %d)",
+        transport, host, port, path, MCP_MAX_INFLIGHT or "unlimited", MCP_CLIENT_MAX_INFLIGHT or "unlimited", MCP_SYNC_WORKERS,
+    )
+    mcp.run(transport=transport)
+
+
+def serve(mcp: Any, argv: Optional[List[str]] = None, max_body_bytes: int = 0) -> None:
+    """Parse ``--transport/--host/--port`` from the command line and run ``mcp``."""
+    parser = argparse.ArgumentParser(description=f"Run the {mcp.name} MCP server")
+    add_transport_arguments(parser)
+    args = parser.parse_args(argv)
+    run(mcp, args.transport, args.host, args.port, max_body_bytes)